@@ -5,6 +5,7 @@ from aiogram.filters import Command, CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 import asyncio
+import time
 from aiogram.types import (
     Message, ReplyKeyboardMarkup, KeyboardButton, 
     ReplyKeyboardRemove, InlineKeyboardMarkup, InlineKeyboardButton,
@@ -12,14 +13,28 @@ from aiogram.types import (
 )
 from asgiref.sync import sync_to_async
 from dotenv import load_dotenv
+from .notifications import (
+    ORDERS_PAGE_SIZE, STATUS_TEXT, get_order_payload, render_active_orders,
+)
+from .couriers import courier_cache, get_active_couriers
+from .instrumentation import HandlerMetricsMiddleware
+from .middlewares import CourierContextMiddleware
+from .sender import get_sender
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 courier_router = Router(name="courier_bot")
+# Kuryer har bir update'da bir marta (keshdan) aniqlanib handler'ga `courier` bo'lib keladi
+courier_router.message.outer_middleware(CourierContextMiddleware())
+courier_router.callback_query.outer_middleware(CourierContextMiddleware())
+# Har bir handler: vaqt, ORM so'rovlari/DB vaqti, Bot API kechikishi (bot/instrumentation.py)
+courier_router.message.middleware(HandlerMetricsMiddleware())
+courier_router.callback_query.middleware(HandlerMetricsMiddleware())
 
 
 REGION_MAPPING = {
+    'Toshkent': 'tashkent',
     'Toshkent shahri': 'tashkent',
     'Toshkent viloyati': 'tashkent',
     'Samarqand': 'samarkand',
@@ -55,15 +70,6 @@ class CourierRegistration(StatesGroup):
 
 
 # ──────── ASYNC ORM FUNKSIYALARI ────────
-@sync_to_async
-def get_courier_by_telegram_id(telegram_id):
-    from store.models import Courier
-    try:
-        return Courier.objects.get(telegram_id=telegram_id)
-    except Courier.DoesNotExist:
-        return None
-
-
 @sync_to_async
 def get_token(token_str):
     from store.models import CourierToken
@@ -75,17 +81,27 @@ def get_token(token_str):
 
 @sync_to_async
 def create_courier(data):
-    """Create courier and mark token as used"""
-    from store.models import Courier
+    """
+    Create courier and mark token as used.
+    Token FSM ma'lumotida satr sifatida saqlanadi; bu yerda shartli UPDATE bilan
+    band qilinadi - ikki marta ishlatib bo'lmaydi. Token yaroqsiz bo'lsa None.
+    """
+    from store.models import Courier, CourierToken
+    from django.db import transaction
     from django.utils import timezone
     
-    token_obj = data.pop("token_obj")
-    courier = Courier.objects.create(**data)
-    
-    token_obj.is_used = True
-    token_obj.used_by = courier
-    token_obj.used_at = timezone.now()
-    token_obj.save()
+    token_str = data.pop("token")
+    now = timezone.now()
+    # Kuryer va token bitta tranzaksiyada; post_save signali kuryerlar indeksini yangilaydi
+    with transaction.atomic():
+        courier = Courier.objects.create(**data)
+        
+        claimed = CourierToken.objects.filter(
+            token=token_str, is_used=False, expires_at__gt=now
+        ).update(is_used=True, used_by=courier, used_at=now)
+        if not claimed:
+            transaction.set_rollback(True)
+            return None
     
     return courier
 
@@ -101,47 +117,99 @@ def get_order_by_id(order_id):
 
 
 @sync_to_async
-def accept_order(order_id, courier_id):
-    """Kuryer buyurtmani qabul qiladi"""
-    from store.models import Order, Courier
+def prepare_new_order(order):
+    """
+    Yangi buyurtma xabari va mos kuryerlar - bitta thread hop'da.
+    order.items outbox tomonidan prefetch qilingan; payload keshda bo'lsa qatorlarga tegilmaydi.
+    Kuryerlar xotiradagi indeksdan (bot/couriers.py).
+    Buyurtma endi 'pending' bo'lmasa (kechikkan outbox urinishi - admin biriktirgan,
+    kuryer qabul qilgan yoki bekor qilingan) None - taklif yuborilmaydi.
+    """
+    from store.models import Order
+    
+    status = Order.objects.filter(pk=order.pk).values_list('status', flat=True).first()
+    if status != 'pending':
+        return None
+    
+    payload = get_order_payload('new', order)
+    region_code = REGION_MAPPING.get(order.region, order.region)
+    return payload, region_code, get_active_couriers(region_code)
+
+
+@sync_to_async
+def accept_order(order_id, courier):
+    """
+    Kuryer buyurtmani qabul qiladi.
+    Bitta shartli UPDATE ... WHERE status='pending': bir vaqtda bosgan kuryerlardan
+    faqat bittasi yutadi, qolganlari javobni qo'shimcha o'qishsiz oladi.
+    Yutgan kuryerning total_orders hisoblagichi shu tranzaksiyada oshadi.
+    """
+    from store.models import Courier, Order
+    from django.db import transaction
     from django.utils import timezone
     
+    if courier is None:
+        return None, "Siz ro'yxatdan o'tmagansiz!"
+    
     try:
-        order = Order.objects.get(order_id=order_id)
-        courier = Courier.objects.get(telegram_id=courier_id)
-        
-        if order.status != 'pending':
-            return None, "Bu buyurtma allaqachon qabul qilingan!"
-        
-        order.courier = courier
-        order.status = 'accepted'
-        order.accepted_at = timezone.now()
-        order.save()
+        # savepoint=False: yutqazgan kuryer uchun ham faqat bitta UPDATE
+        with transaction.atomic(savepoint=False):
+            accepted = Order.objects.filter(order_id=order_id, status='pending').update(
+                status='accepted',
+                courier=courier,
+                accepted_at=timezone.now(),
+            )
+            if not accepted:
+                return None, "Bu buyurtma allaqachon qabul qilingan!"
+            
+            Courier.count_order_status(courier.pk, 'pending', 'accepted')
+            forget_courier(courier.telegram_id)
         
-        return order, None
-    except Order.DoesNotExist:
-        return None, "Buyurtma topilmadi!"
+        # Faqat yutgan kuryer - xabar matni uchun
+        return Order.objects.get(order_id=order_id), None
     except Exception as e:
         logger.error(f"Accept order error: {e}")
         return None, "Xatolik yuz berdi!"
 
 
+def forget_courier(telegram_id):
+    """Hisoblagichlar UPDATE bilan o'zgardi (signal yo'q) - handler keshidagi kuryer commit'dan keyin eskirgan"""
+    from django.db import transaction
+    
+    transaction.on_commit(lambda: courier_cache.invalidate(telegram_id))
+
+
 @sync_to_async
 def update_order_status(order_id, new_status):
-    """Buyurtma statusini yangilash"""
-    from store.models import Order
+    """
+    Buyurtma statusini yangilash: faqat o'zgargan maydonlar yoziladi, kuryer
+    hisoblagichi (yetkazilgan) shu tranzaksiyada F() bilan oshadi.
+    Qayta bosilgan tugma (status o'zgarmagan) hech narsa yozmaydi.
+    """
+    from store.models import Courier, Order
+    from django.db import transaction
     from django.utils import timezone
     
+    changes = {'status': new_status}
+    if new_status == 'delivering':
+        changes['delivering_at'] = timezone.now()
+    elif new_status == 'delivered':
+        changes['delivered_at'] = timezone.now()
+    
     try:
-        order = Order.objects.get(order_id=order_id)
-        order.status = new_status
-        
-        if new_status == 'delivering':
-            order.delivering_at = timezone.now()
-        elif new_status == 'delivered':
-            order.delivered_at = timezone.now()
+        with transaction.atomic():
+            order = Order.objects.select_for_update().select_related('courier').get(order_id=order_id)
+            old_status = order.status
+            if old_status == new_status:
+                return order, None
+            
+            for field, value in changes.items():
+                setattr(order, field, value)
+            order.save(update_fields=[*changes, 'updated_at'])
+            
+            if Courier.count_order_status(order.courier_id, old_status, new_status):
+                forget_courier(order.courier.telegram_id)
         
-        order.save()
         return order, None
     except Order.DoesNotExist:
         return None, "Buyurtma topilmadi!"
@@ -150,12 +218,11 @@ def update_order_status(order_id, new_status):
 
 
 @sync_to_async
-def get_courier_orders(telegram_id, status=None):
+def get_courier_orders(courier, status=None):
     """Kuryer buyurtmalarini olish"""
-    from store.models import Order, Courier
+    from store.models import Order
     
     try:
-        courier = Courier.objects.get(telegram_id=telegram_id)
         orders = Order.objects.filter(courier=courier)
         
         if status:
@@ -167,6 +234,76 @@ def get_courier_orders(telegram_id, status=None):
         return []
 
 
+@sync_to_async
+def get_active_orders(courier, page=0):
+    """
+    Faol (qabul qilingan / yo'lda) buyurtmalar sahifasi - bitta so'rov (store_order_courier_idx).
+    Keyingi sahifa bormi - bitta ortiqcha qator bilan aniqlanadi. (orders, page, has_next)
+    """
+    from store.models import Order
+    
+    queryset = Order.objects.filter(courier=courier, status__in=['accepted', 'delivering']).order_by('-created_at')
+    start = page * ORDERS_PAGE_SIZE
+    orders = list(queryset[start:start + ORDERS_PAGE_SIZE + 1])
+    if not orders and page > 0:
+        # Sahifadagi buyurtmalar yakunlangan - birinchi sahifaga
+        page = 0
+        orders = list(queryset[:ORDERS_PAGE_SIZE + 1])
+    return orders[:ORDERS_PAGE_SIZE], page, len(orders) > ORDERS_PAGE_SIZE
+
+
+@sync_to_async
+def get_courier_stats(courier):
+    """Statistika ekrani raqamlari - bitta agregat so'rov (store_order_courier_idx)"""
+    from store.models import Order
+    from django.db.models import Count, Q
+    from django.utils import timezone
+    from datetime import timedelta
+    
+    today_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    week_start = today_start - timedelta(days=7)
+    
+    return Order.objects.filter(courier=courier).aggregate(
+        today=Count('id', filter=Q(created_at__gte=today_start)),
+        week=Count('id', filter=Q(created_at__gte=week_start)),
+        today_delivered=Count('id', filter=Q(status='delivered', delivered_at__gte=today_start)),
+    )
+
+
+@sync_to_async
+def record_offers(order, sent):
+    """
+    Yuborilgan takliflarni (chat_id, message_id) yozish.
+    Buyurtma yuborish davomida qabul qilingan bo'lsa - qabul qilgan kuryerning
+    chat_id'si qaytadi (takliflar darhol qaytarib olinadi), aks holda None.
+    """
+    from store.models import Order, OrderOffer
+    
+    OrderOffer.objects.bulk_create([
+        OrderOffer(order=order, chat_id=chat_id, message_id=message_id) for chat_id, message_id in sent
+    ])
+    row = Order.objects.filter(pk=order.pk).values_list('status', 'courier__telegram_id').first()
+    if row is None or row[0] == 'pending':
+        return None
+    return row[1]
+
+
+@sync_to_async
+def take_offers(order, keep_chat_id):
+    """Buyurtmaning barcha takliflarini olib o'chirish; keep_chat_id'dagidan tashqari qaytariladi"""
+    from store.models import OrderOffer
+    from django.db import transaction
+    
+    with transaction.atomic():
+        offers = list(
+            OrderOffer.objects.select_for_update()
+            .filter(order=order)
+            .values_list('id', 'chat_id', 'message_id')
+        )
+        OrderOffer.objects.filter(id__in=[offer_id for offer_id, _, _ in offers]).delete()
+    return [(chat_id, message_id) for _, chat_id, message_id in offers if chat_id != keep_chat_id]
+
+
 # ──────── KEYBOARD YARATISH ────────
 def get_main_menu_keyboard():
     """Asosiy menyu klaviaturasi"""
@@ -178,40 +315,9 @@ def get_main_menu_keyboard():
     return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
 
 
-def get_order_action_keyboard(order_id):
-    """Buyurtma amallar klaviaturasi"""
-    keyboard = [
-        [
-            InlineKeyboardButton(text="✅ Qabul qilish", callback_data=f"accept_{order_id}"),
-            InlineKeyboardButton(text="❌ Rad etish", callback_data=f"reject_{order_id}")
-        ]
-    ]
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
-
-
-def get_order_status_keyboard(order_id, current_status):
-    """Buyurtma status o'zgartirish klaviaturasi"""
-    keyboard = []
-    
-    if current_status == 'accepted':
-        keyboard.append([
-            InlineKeyboardButton(text="🚚 Yo'lda", callback_data=f"status_{order_id}_delivering")
-        ])
-    elif current_status == 'delivering':
-        keyboard.append([
-            InlineKeyboardButton(text="✅ Yetkazildi", callback_data=f"status_{order_id}_delivered")
-        ])
-    
-    keyboard.append([
-        InlineKeyboardButton(text="🔙 Orqaga", callback_data=f"back_to_orders")
-    ])
-    
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
-
-
 # ──────── START HANDLER ────────
 @courier_router.message(CommandStart())
-async def cmd_start(message: Message, state: FSMContext):
+async def cmd_start(message: Message, state: FSMContext, courier=None):
     """Handle /start command with token"""
     user = message.from_user
     args = message.text.split()
@@ -220,8 +326,6 @@ async def cmd_start(message: Message, state: FSMContext):
     logger.info(f"Start command from user {user.id}, token: {token_str}")
 
     try:
-        courier = await get_courier_by_telegram_id(user.id)
-        
         if courier:
             if courier.status != "active":
                 await message.answer(
@@ -260,8 +364,9 @@ async def cmd_start(message: Message, state: FSMContext):
             await message.answer("❌ Token muddati o'tgan!")
             return
 
+        # FSM ma'lumoti DB da JSON - model obyekti emas, token satri saqlanadi
         await state.update_data(
-            token_obj=token_obj,
+            token=token_obj.token,
             telegram_id=user.id,
             username=user.username or ""
         )
@@ -395,10 +500,16 @@ async def process_region(message: Message, state: FSMContext):
             "telegram_username": data["username"],
             "region": code,
             "status": "active",
-            "token_obj": data["token_obj"],
+            "token": data["token"],
         }
 
         courier = await create_courier(courier_data)
+        if courier is None:
+            await message.answer(
+                "❌ Token ishlatilgan yoki muddati o'tgan!", reply_markup=ReplyKeyboardRemove()
+            )
+            await state.clear()
+            return
 
         await message.answer(
             f"✅ Tabriklayman, {courier.first_name}!\n\n"
@@ -418,40 +529,17 @@ async def process_region(message: Message, state: FSMContext):
 
 # ──────── MENU HANDLERS ────────
 @courier_router.message(F.text == "📦 Mening buyurtmalarim")
-async def show_my_orders(message: Message):
+async def show_my_orders(message: Message, courier=None):
     """Faol buyurtmalarni ko'rsatish"""
     try:
-        courier = await get_courier_by_telegram_id(message.from_user.id)
         if not courier:
             await message.answer("❌ Siz ro'yxatdan o'tmagansiz!")
             return
         
-        orders = await get_courier_orders(message.from_user.id, status='accepted')
-        orders += await get_courier_orders(message.from_user.id, status='delivering')
-        
-        if not orders:
-            await message.answer("📭 Sizda faol buyurtmalar yo'q.")
-            return
-        
-        for order in orders:
-            status_emoji = "🟡" if order.status == 'accepted' else "🔵"
-            status_text = "Qabul qilingan" if order.status == 'accepted' else "Yo'lda"
-            
-            text = (
-                f"{status_emoji} <b>Buyurtma #{order.order_id}</b>\n\n"
-                f"👤 Mijoz: <b>{order.full_name}</b>\n"
-                f"📱 Telefon: <a href='tel:{order.phone}'>{order.phone}</a>\n"
-                f"📍 Manzil: {order.address}\n"
-                f"💰 Summa: {order.total_price:,} so'm\n"
-                f"💳 To'lov: {order.get_payment_method_display()}\n"
-                f"📊 Status: <b>{status_text}</b>"
-            )
-            
-            await message.answer(
-                text,
-                parse_mode="HTML",
-                reply_markup=get_order_status_keyboard(order.order_id, order.status)
-            )
+        # Bitta so'rov va bitta xabar (sahifalab)
+        orders, page, has_next = await get_active_orders(courier)
+        payload = render_active_orders(orders, page, has_next)
+        await message.answer(payload.text, parse_mode="HTML", reply_markup=payload.reply_markup)
     
     except Exception as e:
         logger.error(f"Show orders error: {e}")
@@ -459,19 +547,14 @@ async def show_my_orders(message: Message):
 
 
 @courier_router.message(F.text == "👤 Mening profilim")
-async def show_profile(message: Message):
+async def show_profile(message: Message, courier=None):
     """Profil ma'lumotlari"""
     try:
-        courier = await get_courier_by_telegram_id(message.from_user.id)
         if not courier:
             await message.answer("❌ Siz ro'yxatdan o'tmagansiz!")
             return
         
-        # Statistika
-        from store.models import Order
-        total_orders = await sync_to_async(Order.objects.filter(courier=courier).count)()
-        delivered = await sync_to_async(Order.objects.filter(courier=courier, status='delivered').count)()
-        
+        # Hisoblagichlar kuryer yozuvida - buyurtmalar jadvali o'qilmaydi
         text = (
             f"👤 <b>Profil ma'lumotlari</b>\n\n"
             f"👨‍💼 Ism: {courier.first_name} {courier.last_name}\n"
@@ -479,8 +562,9 @@ async def show_profile(message: Message):
             f"📍 Viloyat: {courier.get_region_display()}\n"
             f"📊 Status: {courier.get_status_display()}\n\n"
             f"📈 <b>Statistika:</b>\n"
-            f"📦 Jami buyurtmalar: {total_orders}\n"
-            f"✅ Yetkazilgan: {delivered}\n"
+            f"📦 Jami buyurtmalar: {courier.total_orders}\n"
+            f"✅ Yetkazilgan: {courier.completed_orders}\n"
+            f"❌ Bekor qilingan: {courier.cancelled_orders}\n"
             f"📅 Ro'yxatdan: {courier.created_at.strftime('%d.%m.%Y')}"
         )
         
@@ -492,40 +576,21 @@ async def show_profile(message: Message):
 
 
 @courier_router.message(F.text == "📊 Statistika")
-async def show_statistics(message: Message):
+async def show_statistics(message: Message, courier=None):
     """Kunlik/haftalik statistika"""
     try:
-        courier = await get_courier_by_telegram_id(message.from_user.id)
         if not courier:
             return
         
-        from store.models import Order
-        from django.utils import timezone
-        from datetime import timedelta
-        
-        now = timezone.now()
-        today = now.date()
-        week_ago = today - timedelta(days=7)
-        
-        today_orders = await sync_to_async(
-            Order.objects.filter(courier=courier, created_at__date=today).count
-        )()
-        
-        week_orders = await sync_to_async(
-            Order.objects.filter(courier=courier, created_at__date__gte=week_ago).count
-        )()
-        
-        today_delivered = await sync_to_async(
-            Order.objects.filter(courier=courier, status='delivered', delivered_at__date=today).count
-        )()
+        stats = await get_courier_stats(courier)
         
         text = (
             f"📊 <b>Statistika</b>\n\n"
             f"📅 <b>Bugun:</b>\n"
-            f"  📦 Buyurtmalar: {today_orders}\n"
-            f"  ✅ Yetkazildi: {today_delivered}\n\n"
+            f"  📦 Buyurtmalar: {stats['today']}\n"
+            f"  ✅ Yetkazildi: {stats['today_delivered']}\n\n"
             f"📆 <b>Oxirgi 7 kun:</b>\n"
-            f"  📦 Buyurtmalar: {week_orders}"
+            f"  📦 Buyurtmalar: {stats['week']}"
         )
         
         await message.answer(text, parse_mode="HTML")
@@ -536,14 +601,13 @@ async def show_statistics(message: Message):
 
 
 @courier_router.message(F.text == "📜 Buyurtmalar tarixi")
-async def show_order_history(message: Message):
+async def show_order_history(message: Message, courier=None):
     """Buyurtmalar tarixi"""
     try:
-        courier = await get_courier_by_telegram_id(message.from_user.id)
         if not courier:
             return
         
-        orders = await get_courier_orders(message.from_user.id)
+        orders = await get_courier_orders(courier)
         
         if not orders:
             await message.answer("📭 Buyurtmalar tarixi bo'sh.")
@@ -575,41 +639,60 @@ async def show_order_history(message: Message):
 
 # ──────── CALLBACK HANDLERS ────────
 @courier_router.callback_query(F.data.startswith("accept_"))
-async def accept_order_callback(callback: CallbackQuery):
+async def accept_order_callback(callback: CallbackQuery, courier=None):
     """Buyurtmani qabul qilish"""
     try:
         order_id = callback.data.split("_")[1]
-        order, error = await accept_order(order_id, callback.from_user.id)
+        order, error = await accept_order(order_id, courier)
         
         if error:
             await callback.answer(error, show_alert=True)
             return
         
+        payload = get_order_payload('accepted', order)
         await callback.message.edit_text(
-            f"✅ <b>Buyurtma qabul qilindi!</b>\n\n"
-            f"🆔 ID: <code>{order.order_id}</code>\n"
-            f"👤 Mijoz: <b>{order.full_name}</b>\n"
-            f"📱 Telefon: <a href='tel:{order.phone}'>{order.phone}</a>\n"
-            f"📍 Manzil: {order.address}\n"
-            f"💰 Summa: {order.total_price:,} so'm",
+            payload.text,
             parse_mode="HTML",
-            reply_markup=get_order_status_keyboard(order.order_id, 'accepted')
+            reply_markup=payload.reply_markup
         )
         
         await callback.answer("✅ Buyurtma qabul qilindi!")
+        
+        # Boshqa kuryerlardagi taklif tugmalari - javobni kutdirmasdan fonda
+        run_in_background(retract_offers(callback.bot, order, callback.from_user.id))
     
     except Exception as e:
         logger.error(f"Accept callback error: {e}")
         await callback.answer("❌ Xatolik yuz berdi!")
 
 
+@courier_router.callback_query(F.data.startswith("my_orders_"))
+async def my_orders_page_callback(callback: CallbackQuery, courier=None):
+    """Faol buyurtmalar ro'yxatining boshqa sahifasi - o'sha xabar tahrirlanadi"""
+    try:
+        if not courier:
+            await callback.answer("❌ Siz ro'yxatdan o'tmagansiz!", show_alert=True)
+            return
+        
+        orders, page, has_next = await get_active_orders(courier, int(callback.data.rsplit("_", 1)[1]))
+        payload = render_active_orders(orders, page, has_next)
+        await callback.message.edit_text(payload.text, parse_mode="HTML", reply_markup=payload.reply_markup)
+        await callback.answer()
+    
+    except Exception as e:
+        logger.error(f"Orders page error: {e}")
+        await callback.answer("❌ Xatolik yuz berdi!")
+
+
 @courier_router.callback_query(F.data.startswith("status_"))
-async def update_status_callback(callback: CallbackQuery):
+async def update_status_callback(callback: CallbackQuery, courier=None):
     """Buyurtma statusini yangilash"""
     try:
         parts = callback.data.split("_")
         order_id = parts[1]
         new_status = parts[2]
+        # "Mening buyurtmalarim" ro'yxatidan kelgan bo'lsa - sahifa raqami
+        page = int(parts[3]) if len(parts) > 3 else None
         
         # Vaqt chegarasi qo'shing
         order, error = await asyncio.wait_for(
@@ -621,21 +704,19 @@ async def update_status_callback(callback: CallbackQuery):
             await callback.answer(error, show_alert=True)
             return
         
-        status_text = {
-            'delivering': '🚚 Yo\'lda',
-            'delivered': '✅ Yetkazildi'
-        }.get(new_status, new_status)
+        status_text = STATUS_TEXT.get(new_status, new_status)
         
         # Message'ni yangilash
         try:
+            if page is not None and courier:
+                orders, page, has_next = await get_active_orders(courier, page)
+                payload = render_active_orders(orders, page, has_next)
+            else:
+                payload = get_order_payload('status', order)
             await callback.message.edit_text(
-                f"{status_text}\n\n"
-                f"🆔 ID: <code>{order.order_id}</code>\n"
-                f"👤 Mijoz: <b>{order.full_name}</b>\n"
-                f"💰 Summa: {order.total_price:,} so'm",
+                payload.text,
                 parse_mode="HTML",
-                reply_markup=get_order_status_keyboard(order.order_id, new_status) 
-                if new_status != 'delivered' else None
+                reply_markup=payload.reply_markup
             )
         except Exception as e:
             # Agar message yangilanishi muvaffaqiyatsiz bo'lsa, yangi xabar yuboring
@@ -664,111 +745,111 @@ async def back_to_orders(callback: CallbackQuery):
 
 
 # ──────── YANGI BUYURTMA XABAR ────────
+_background_tasks = set()
+
+
+def run_in_background(coro):
+    """Fon vazifasi (tugaguncha havola saqlanadi)"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def retract_offers(bot, order, keep_chat_id):
+    """
+    Qabul qilingan buyurtmaning boshqa kuryerlardagi takliflarini tahrirlash
+    (tugma olib tashlanadi) - parallel, sender limitlari ichida.
+    """
+    try:
+        offers = await take_offers(order, keep_chat_id)
+        if not offers:
+            return 0
+        
+        payload = get_order_payload('taken', order)
+        sender = get_sender(bot)
+        results = await asyncio.gather(
+            *(
+                sender.call(chat_id, lambda chat_id=chat_id, message_id=message_id: bot.edit_message_text(
+                    text=payload.text, chat_id=chat_id, message_id=message_id, parse_mode="HTML"
+                ))
+                for chat_id, message_id in offers
+            ),
+            return_exceptions=True
+        )
+        
+        failed = sum(isinstance(result, BaseException) for result in results)
+        logger.info(f"🔒 Buyurtma #{order.order_id}: {len(offers) - failed}/{len(offers)} ta taklif qaytarib olindi")
+        return len(offers) - failed
+    
+    except Exception as e:
+        logger.error(f"❌ Takliflarni qaytarib olish xatosi: {e}", exc_info=True)
+        return 0
+
+
 async def notify_couriers_about_order(order):
     """Yangi buyurtma haqida kuryerlarga xabar yuborish"""
-    from store.models import Courier
-    
-    # Bot'ni views.py dan olish
-    from store.views import get_bot_and_dispatcher
+    # Joriy jarayondagi bot (runbot yoki BOT_EMBEDDED rejimida web worker)
+    from .runtime import get_bot_and_dispatcher
     bot, _ = get_bot_and_dispatcher()
 
-    # Region mapping
-    REGION_MAPPING = {
-        'Toshkent shahri': 'tashkent',
-        'Toshkent viloyati': 'tashkent',
-        'Samarqand': 'samarkand',
-        'Buxoro': 'bukhara',
-        'Andijon': 'andijan',
-        'Farg\'ona': 'fergana',
-        'Namangan': 'namangan',
-        'Sirdaryo': 'syrdarya',
-        'Jizzax': 'jizzakh',
-        'Surxondaryo': 'surkhandarya',
-        'Qashqadaryo': 'kashkadarya',
-        'Navoiy': 'navoiy',
-        'Xorazm': 'khorezm',
-        'Qoraqalpog\'iston': 'karakalpakstan',
-    }
-    
-    region_code = REGION_MAPPING.get(order.region, order.region)
-    
     logger.info(f"🔔 Buyurtma: {order.order_id}")
-    logger.info(f"📍 Region: '{order.region}' → '{region_code}'")
 
     try:
-        # Mahsulotlarni olish
-        order_items = await sync_to_async(list)(
-            order.products.all()
-        )
-        
-        # Mahsulotlar ro'yxatini tayyorlash
-        products_text = ""
-        for item in order_items:
-            products_text += f"  • {item.name} -  {item.product} x {item.price:,} so'm\n"
-        
-        if not products_text:
-            products_text = "  • Ma'lumot yo'q\n"
-
-        # Kuryerlarni topish
-        couriers = await sync_to_async(list)(
-            Courier.objects.filter(
-                region=region_code,
-                status="active", 
-                telegram_id__isnull=False
-            )
-        )
+        # Matn/klaviatura (keshdan yoki bir marta qurib) va kuryerlar - bitta thread hop
+        prepared = await prepare_new_order(order)
+        if prepared is None:
+            logger.info(f"⏭️ Buyurtma #{order.order_id} endi kutilmayapti - taklif yuborilmadi")
+            return
+        payload, region_code, couriers = prepared
 
+        logger.info(f"📍 Region: '{order.region}' → '{region_code}'")
         logger.info(f"📊 Topilgan kurierlar: {len(couriers)}")
 
         if not couriers:
             logger.warning(f"⚠️ {region_code} da faol kuryer yo'q")
             return
 
-        # Xabar matni
-        text = (
-            f"🆕 <b>Yangi buyurtma!</b>\n\n"
-            f"🆔 ID: <code>{order.order_id}</code>\n"
-            f"👤 Mijoz: <b>{order.full_name}</b>\n"
-            f"📱 Telefon: <a href='tel:{order.phone}'>{order.phone}</a>\n"
-            f"📍 Manzil: {order.address}\n\n"
-            f"🛒 <b>Mahsulotlar:</b>\n{products_text}\n"
-            f"💰 <b>Jami:</b> {order.total_price:,} so'm\n"
-            f"💳 To'lov: {order.get_payment_method_display()}"
+        # Parallel yuborish - Telegram limitlari sender ichida hisobga olinadi
+        sender = get_sender(bot)
+        started = time.perf_counter()
+        results = await sender.fan_out(
+            [courier.telegram_id for courier in couriers],
+            payload.text,
+            parse_mode="HTML",
+            reply_markup=payload.reply_markup,
+            disable_web_page_preview=True
         )
 
-        success_count = 0
-        
-        # Har bir kuryerga xabar yuborish
-        for courier in couriers:
+        sent = []
+        for courier, result in zip(couriers, results):
+            if isinstance(result, BaseException):
+                logger.error(f"❌ {courier.first_name} ga yuborilmadi: {result}")
+            else:
+                sent.append((result.chat.id, result.message_id))
+        success_count = len(sent)
+
+        stats = sender.stats()
+        logger.info(
+            f"⏱️ Fan-out {time.perf_counter() - started:.2f} s, "
+            f"kechikish p50/p95: {stats['latency_p50_ms']}/{stats['latency_p95_ms']} ms"
+        )
+        logger.info(f"📨 {success_count}/{len(couriers)} ta kuryerga yuborildi")
+
+        # Qabul qilinganda boshqalardan qaytarib olish uchun. Xabarlar yetib bo'lgan -
+        # bu yerdagi xato qayta urinishga olib kelmasin (hammaga yana yuborilardi)
+        if sent:
             try:
-                await bot.send_message(
-                    chat_id=courier.telegram_id,
-                    text=text,
-                    parse_mode="HTML",
-                    reply_markup=get_order_action_keyboard(order.order_id),
-                    disable_web_page_preview=True
-                )
-                success_count += 1
-                logger.info(f"✅ {courier.first_name} ga yuborildi")
-                
-                # Rate limit uchun biroz kutish
-                await asyncio.sleep(0.05)
-                
+                accepted_by = await record_offers(order, sent)
+                if accepted_by is not None:
+                    await retract_offers(bot, order, accepted_by)
             except Exception as e:
-                logger.error(f"❌ {courier.first_name} ga yuborilmadi: {e}")
+                logger.error(f"⚠️ #{order.order_id} takliflari yozilmadi: {e}", exc_info=True)
 
-        logger.info(f"📨 {success_count}/{len(couriers)} ta kuryerga yuborildi")
+        # Outbox qayta urinishi uchun - birorta ham kuryerga yetmagan bo'lsa
+        if success_count == 0:
+            raise RuntimeError(f"Buyurtma #{order.order_id} hech bir kuryerga yuborilmadi")
 
     except Exception as e:
         logger.error(f"🔥 Notification xatosi: {e}", exc_info=True)
-
-
-def get_order_action_keyboard(order_id):
-    """Buyurtma amallar klaviaturasi"""
-    keyboard = [
-        [
-            InlineKeyboardButton(text="✅ Qabul qilish", callback_data=f"accept_{order_id}"),
-            InlineKeyboardButton(text="❌ Rad etish", callback_data=f"reject_{order_id}")
-        ]
-    ]
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+        raise
@@ -0,0 +1,135 @@
+# bot/couriers.py
+"""
+Viloyat -> faol kuryerlar indeksi (dispatch uchun).
+
+Indeks jarayon xotirasida saqlanadi va kuryerlar versiyasi o'zgargandagina
+qayta quriladi: Courier saqlanganda/o'chirilganda versiya DB da oshiriladi
+(store/signals.py), shuning uchun ikkala gunicorn worker ham o'zgarishni
+COURIER_INDEX_CHECK_INTERVAL soniya ichida ko'radi. Buyurtma yuborishda kuryer
+so'rovi yo'q.
+
+Bot handler'lari uchun telegram_id -> Courier keshi (courier_cache) ham shu
+yerda: yozuvlar COURIER_CONTEXT_TTL soniya yashaydi, shu jarayonda kuryer
+saqlansa darhol, boshqa jarayonda indeks maydonlari o'zgarsa versiya orqali
+tozalanadi.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from django.conf import settings
+
+from store.versions import COURIERS, VersionedSnapshot
+
+CHECK_INTERVAL = getattr(settings, 'COURIER_INDEX_CHECK_INTERVAL', 1.0)
+CONTEXT_TTL = getattr(settings, 'COURIER_CONTEXT_TTL', 30)
+CONTEXT_CACHE_SIZE = 1000
+
+# Indeksga ta'sir qiladigan maydonlar - boshqalari (statistika) saqlanganda versiya oshmaydi
+INDEXED_FIELDS = frozenset({'region', 'status', 'telegram_id', 'first_name'})
+
+
+class DispatchCourier(NamedTuple):
+    id: int
+    telegram_id: int
+    first_name: str
+
+
+def build_courier_index():
+    from store.models import Courier
+
+    index = {}
+    rows = (
+        Courier.objects
+        .filter(status='active', telegram_id__isnull=False)
+        .order_by('id')
+        .values_list('region', 'id', 'telegram_id', 'first_name')
+    )
+    for region, courier_id, telegram_id, first_name in rows:
+        index.setdefault(region, []).append(DispatchCourier(courier_id, telegram_id, first_name))
+    return {region: tuple(couriers) for region, couriers in index.items()}
+
+
+courier_snapshot = VersionedSnapshot(COURIERS, build_courier_index, check_interval=CHECK_INTERVAL)
+
+
+def get_active_couriers(region_code):
+    """Viloyatdagi faol kuryerlar (telegram_id bor) - xotiradan"""
+    return courier_snapshot.get().get(region_code, ())
+
+
+# ──────── HANDLER KONTEKSTI ────────
+class CourierCache:
+    """telegram_id -> Courier (ro'yxatdan o'tmagan bo'lsa None), TTL + LRU"""
+
+    def __init__(self, ttl=CONTEXT_TTL, size=CONTEXT_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, telegram_id):
+        """(topildi, courier)"""
+        with self._lock:
+            entry = self._items.get(telegram_id)
+            if entry is None or entry[1] < time.monotonic():
+                self.misses += 1
+                return False, None
+            self._items.move_to_end(telegram_id)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, telegram_id, courier):
+        with self._lock:
+            self._items[telegram_id] = (courier, time.monotonic() + self.ttl)
+            self._items.move_to_end(telegram_id)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def sync_version(self, version):
+        """Kuryerlar versiyasi o'zgargan bo'lsa (boshqa jarayonda saqlangan) - hammasi eskirgan"""
+        with self._lock:
+            if version != self._version:
+                self._items.clear()
+                self._version = version
+
+    @property
+    def version(self):
+        return self._version
+
+    def invalidate(self, telegram_id):
+        with self._lock:
+            self._items.pop(telegram_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._version = None
+
+
+courier_cache = CourierCache()
+
+
+def cached_courier(telegram_id):
+    """Keshdan (DB ga murojaatsiz) - versiya tekshiruvi vaqti kelmagan bo'lsagina"""
+    if not courier_snapshot.is_fresh() or courier_cache.version != courier_snapshot.version:
+        return False, None
+    return courier_cache.get(telegram_id)
+
+
+def resolve_courier(telegram_id):
+    """Kuryer (yoki None): versiya tekshiruvi, keyin kesh yoki bitta SELECT"""
+    from store.models import Courier
+
+    courier_snapshot.get()
+    courier_cache.sync_version(courier_snapshot.version)
+
+    found, courier = courier_cache.get(telegram_id)
+    if not found:
+        courier = Courier.objects.filter(telegram_id=telegram_id).first()
+        courier_cache.put(telegram_id, courier)
+    return courier
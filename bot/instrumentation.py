@@ -0,0 +1,216 @@
+# bot/instrumentation.py
+"""
+courier_router handler'lari ko'rsatkichlari.
+
+HandlerMetricsMiddleware har bir handler chaqiruvi uchun (update turi:handler nomi) yozadi:
+- umumiy vaqt
+- ORM so'rovlari soni va DB vaqti - sync_to_async ichidagilari ham
+  (contextvar + har bir ulanishdagi connection.execute_wrapper)
+- Bot API chaqiruvlari soni va kechikishi (bot session middleware)
+Qiymatlar oxirgi WINDOW ta chaqiruv bo'yicha rolling histogram'larda saqlanadi;
+p50/p95/p99 runbot'ning /bot/metrics/ manzilida va `python manage.py bot_metrics` da.
+"""
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+WINDOW = 1000
+
+_current = ContextVar('bot_handler_sample', default=None)
+
+
+class Sample:
+    """Bitta handler chaqiruvi davomida yig'iladigan qiymatlar"""
+
+    __slots__ = ('queries', 'db_time', 'api_calls', 'api_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.api_calls = 0
+        self.api_time = 0.0
+
+
+def percentile(values, q):
+    """Saralangan ro'yxatdan q-kvantil"""
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class RollingHistogram:
+    """Oxirgi size ta qiymat"""
+
+    def __init__(self, size=WINDOW):
+        self._values = deque(maxlen=size)
+
+    def add(self, value):
+        self._values.append(value)
+
+    def summary(self, scale=1, digits=1):
+        values = sorted(self._values)
+        return {
+            name: round(percentile(values, q) * scale, digits)
+            for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('max', 1))
+        }
+
+
+class HandlerStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.wall = RollingHistogram()
+        self.queries = RollingHistogram()
+        self.db_time = RollingHistogram()
+        self.api_calls = RollingHistogram()
+        self.api_time = RollingHistogram()
+
+    def record(self, sample, wall, failed):
+        self.calls += 1
+        self.errors += failed
+        self.wall.add(wall)
+        self.queries.add(sample.queries)
+        self.db_time.add(sample.db_time)
+        self.api_calls.add(sample.api_calls)
+        self.api_time.add(sample.api_time)
+
+    def summary(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'wall_ms': self.wall.summary(1000),
+            'db_ms': self.db_time.summary(1000),
+            'queries': self.queries.summary(digits=0),
+            'api_ms': self.api_time.summary(1000),
+            'api_calls': self.api_calls.summary(digits=0),
+        }
+
+
+class ApiStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = RollingHistogram()
+
+    def summary(self):
+        return {'calls': self.calls, 'errors': self.errors, 'latency_ms': self.latency.summary(1000)}
+
+
+class Registry:
+    """Jarayon bo'yicha: handler -> HandlerStats, Bot API metodi -> ApiStats"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handlers = {}
+        self._api = {}
+
+    def record_handler(self, key, sample, wall, failed):
+        with self._lock:
+            stats = self._handlers.get(key)
+            if stats is None:
+                stats = self._handlers[key] = HandlerStats()
+            stats.record(sample, wall, failed)
+
+    def record_api(self, method, latency, failed):
+        with self._lock:
+            stats = self._api.get(method)
+            if stats is None:
+                stats = self._api[method] = ApiStats()
+            stats.calls += 1
+            stats.errors += failed
+            stats.latency.add(latency)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'handlers': {key: stats.summary() for key, stats in sorted(self._handlers.items())},
+                'api': {method: stats.summary() for method, stats in sorted(self._api.items())},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._handlers.clear()
+            self._api.clear()
+
+
+registry = Registry()
+
+
+def get_metrics():
+    return registry.snapshot()
+
+
+# ──────── DB ────────
+def record_query(execute, sql, params, many, context):
+    """connection.execute_wrapper: joriy handler bo'lsa so'rov soni va vaqtini yozadi"""
+    sample = _current.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.queries += 1
+        sample.db_time += time.perf_counter() - started
+
+
+def _add_query_hook(sender=None, connection=None, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install_query_hook():
+    """Jarayondagi har bir DB ulanishiga (sync_to_async thread'laridagilariga ham)"""
+    connection_created.connect(_add_query_hook, dispatch_uid='bot_instrumentation')
+    for connection in connections.all(initialized_only=True):
+        _add_query_hook(connection=connection)
+
+
+# ──────── BOT API ────────
+class ApiLatencyMiddleware(BaseRequestMiddleware):
+    """Bot session middleware: har bir Bot API so'rovining kechikishi"""
+
+    async def __call__(self, make_request, bot, method):
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = await make_request(bot, method)
+            failed = False
+            return response
+        finally:
+            latency = time.perf_counter() - started
+            registry.record_api(type(method).__name__, latency, failed)
+            sample = _current.get()
+            if sample is not None:
+                sample.api_calls += 1
+                sample.api_time += latency
+
+
+# ──────── HANDLER ────────
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Ichki middleware: filtrlar o'tgach, aniq handler uchun o'lchaydi"""
+
+    async def __call__(self, handler, event, data):
+        handler_object = data.get('handler')
+        name = getattr(getattr(handler_object, 'callback', None), '__name__', 'unknown')
+        update = data.get('event_update')
+        key = f"{update.event_type if update is not None else type(event).__name__}:{name}"
+
+        sample = Sample()
+        token = _current.set(sample)
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = await handler(event, data)
+            failed = False
+            return result
+        finally:
+            _current.reset(token)
+            registry.record_handler(key, sample, time.perf_counter() - started, failed)
@@ -0,0 +1,24 @@
+# bot/middlewares.py
+"""
+courier_router middleware'lari.
+
+CourierContextMiddleware: kuryer har bir update uchun bir marta aniqlanadi
+(bot/couriers.py dagi keshdan) va handler'larga `courier` sifatida beriladi -
+handler'lar o'zi Courier so'rovini qilmaydi.
+"""
+from aiogram import BaseMiddleware
+from asgiref.sync import sync_to_async
+
+from .couriers import cached_courier, resolve_courier
+
+
+class CourierContextMiddleware(BaseMiddleware):
+    async def __call__(self, handler, event, data):
+        user = data.get('event_from_user')
+        courier = None
+        if user is not None:
+            found, courier = cached_courier(user.id)
+            if not found:
+                courier = await sync_to_async(resolve_courier)(user.id)
+        data['courier'] = courier
+        return await handler(event, data)
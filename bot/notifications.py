@@ -0,0 +1,226 @@
+# bot/notifications.py
+"""
+Buyurtma xabarlari (matn + inline klaviatura).
+
+Har bir xabar turi buyurtmaning (order_id, status) versiyasi uchun bir marta
+quriladi va LRU keshda saqlanadi - qayta yuborish (outbox retry), eskalatsiya
+va tahrirlar DB ga qaytmasdan tayyor payload'dan foydalanadi.
+"""
+import threading
+from collections import OrderedDict
+from html import escape
+from typing import NamedTuple, Optional
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+CACHE_SIZE = 512
+
+
+class OrderPayload(NamedTuple):
+    text: str
+    reply_markup: Optional[InlineKeyboardMarkup]
+
+
+def get_order_action_keyboard(order_id):
+    """Buyurtma amallar klaviaturasi"""
+    keyboard = [
+        [
+            InlineKeyboardButton(text="✅ Qabul qilish", callback_data=f"accept_{order_id}"),
+            InlineKeyboardButton(text="❌ Rad etish", callback_data=f"reject_{order_id}")
+        ]
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def get_order_status_keyboard(order_id, current_status):
+    """Buyurtma status o'zgartirish klaviaturasi"""
+    keyboard = []
+
+    if current_status == 'accepted':
+        keyboard.append([
+            InlineKeyboardButton(text="🚚 Yo'lda", callback_data=f"status_{order_id}_delivering")
+        ])
+    elif current_status == 'delivering':
+        keyboard.append([
+            InlineKeyboardButton(text="✅ Yetkazildi", callback_data=f"status_{order_id}_delivered")
+        ])
+
+    keyboard.append([
+        InlineKeyboardButton(text="🔙 Orqaga", callback_data=f"back_to_orders")
+    ])
+
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+# ──────── RENDER ────────
+def render_new_order(order):
+    """Yangi buyurtma - kuryerlarga. order.items oldindan prefetch qilingan bo'lishi kerak"""
+    products_text = ""
+    for item in order.items.all():
+        products_text += f"  • {escape(item.product_name, quote=False)} - {item.quantity} x {item.unit_price:,} so'm\n"
+
+    if not products_text:
+        products_text = "  • Ma'lumot yo'q\n"
+
+    text = (
+        f"🆕 <b>Yangi buyurtma!</b>\n\n"
+        f"🆔 ID: <code>{order.order_id}</code>\n"
+        f"👤 Mijoz: <b>{escape(order.full_name, quote=False)}</b>\n"
+        f"📱 Telefon: <a href='tel:{escape(order.phone)}'>{escape(order.phone, quote=False)}</a>\n"
+        f"📍 Manzil: {escape(order.address or '', quote=False)}\n\n"
+        f"🛒 <b>Mahsulotlar:</b>\n{products_text}\n"
+        f"💰 <b>Jami:</b> {order.total_price:,} so'm\n"
+        f"💳 To'lov: {order.get_payment_method_display()}"
+    )
+    return OrderPayload(text, get_order_action_keyboard(order.order_id))
+
+
+def render_accepted(order):
+    """Kuryer qabul qilgan buyurtma - xabar shu ko'rinishga tahrirlanadi"""
+    text = (
+        f"✅ <b>Buyurtma qabul qilindi!</b>\n\n"
+        f"🆔 ID: <code>{order.order_id}</code>\n"
+        f"👤 Mijoz: <b>{escape(order.full_name, quote=False)}</b>\n"
+        f"📱 Telefon: <a href='tel:{escape(order.phone)}'>{escape(order.phone, quote=False)}</a>\n"
+        f"📍 Manzil: {escape(order.address or '', quote=False)}\n"
+        f"💰 Summa: {order.total_price:,} so'm"
+    )
+    return OrderPayload(text, get_order_status_keyboard(order.order_id, 'accepted'))
+
+
+def render_taken(order):
+    """Boshqa kuryer qabul qilgan taklif - tugmasiz"""
+    text = f"🔒 <b>Buyurtma #{order.order_id}</b> boshqa kuryer tomonidan qabul qilindi."
+    return OrderPayload(text, None)
+
+
+STATUS_TEXT = {
+    'delivering': '🚚 Yo\'lda',
+    'delivered': '✅ Yetkazildi',
+}
+
+
+def render_status(order):
+    """Status o'zgarganidan keyingi xabar (yo'lda / yetkazildi)"""
+    text = (
+        f"{STATUS_TEXT.get(order.status, order.status)}\n\n"
+        f"🆔 ID: <code>{order.order_id}</code>\n"
+        f"👤 Mijoz: <b>{escape(order.full_name, quote=False)}</b>\n"
+        f"💰 Summa: {order.total_price:,} so'm"
+    )
+    reply_markup = None
+    if order.status != 'delivered':
+        reply_markup = get_order_status_keyboard(order.order_id, order.status)
+    return OrderPayload(text, reply_markup)
+
+
+ORDERS_PAGE_SIZE = 5
+
+ACTIVE_STATUS = {
+    'accepted': ('🟡', 'Qabul qilingan'),
+    'delivering': ('🔵', "Yo'lda"),
+}
+
+# Faol buyurtma -> keyingi status tugmasi
+NEXT_STATUS = {
+    'accepted': ('delivering', "🚚 Yo'lda"),
+    'delivering': ('delivered', '✅ Yetkazildi'),
+}
+
+
+def render_active_orders(orders, page, has_next):
+    """
+    "Mening buyurtmalarim" - bitta xabar: sahifadagi buyurtmalar, har biriga
+    status tugmasi (callback'da sahifa raqami - ro'yxat joyida yangilanadi) va sahifalash.
+    """
+    if not orders:
+        return OrderPayload("📭 Sizda faol buyurtmalar yo'q.", None)
+
+    blocks = []
+    keyboard = []
+    for order in orders:
+        emoji, label = ACTIVE_STATUS.get(order.status, ('❓', order.status))
+        blocks.append(
+            f"{emoji} <b>Buyurtma #{order.order_id}</b> - {label}\n"
+            f"👤 {escape(order.full_name, quote=False)}\n"
+            f"📱 <a href='tel:{escape(order.phone)}'>{escape(order.phone, quote=False)}</a>\n"
+            f"📍 {escape(order.address or '', quote=False)}\n"
+            f"💰 {order.total_price:,} so'm | 💳 {order.get_payment_method_display()}"
+        )
+        next_status = NEXT_STATUS.get(order.status)
+        if next_status:
+            new_status, button_text = next_status
+            keyboard.append([InlineKeyboardButton(
+                text=f"{button_text} #{order.order_id}",
+                callback_data=f"status_{order.order_id}_{new_status}_{page}"
+            )])
+
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton(text="⬅️ Oldingi", callback_data=f"my_orders_{page - 1}"))
+    if has_next:
+        navigation.append(InlineKeyboardButton(text="Keyingi ➡️", callback_data=f"my_orders_{page + 1}"))
+    if navigation:
+        keyboard.append(navigation)
+
+    text = f"📦 <b>Faol buyurtmalar</b> ({page + 1}-sahifa)\n\n" + "\n\n".join(blocks)
+    return OrderPayload(text, InlineKeyboardMarkup(inline_keyboard=keyboard) if keyboard else None)
+
+
+RENDERERS = {
+    'new': render_new_order,
+    'accepted': render_accepted,
+    'taken': render_taken,
+    'status': render_status,
+}
+
+
+# ──────── KESH ────────
+class PayloadCache:
+    """(tur, order_id, status) -> OrderPayload, eng eskisi birinchi chiqariladi"""
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            payload = self._items.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key, payload):
+        with self._lock:
+            self._items[key] = payload
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+payload_cache = PayloadCache()
+
+
+def get_order_payload(kind, order):
+    """
+    Tayyor payload (keshdan yoki bir marta qurib). 'new' turi uchun
+    order.items prefetch qilinmagan bo'lsa DB ga murojaat qiladi - sync kontekstda chaqiring.
+    Kalitda updated_at: admin manzil/telefon/qatorlarni o'zgartirsa eski matn qayta yuborilmaydi.
+    """
+    key = (kind, order.order_id, order.status, order.updated_at)
+    payload = payload_cache.get(key)
+    if payload is None:
+        payload = RENDERERS[kind](order)
+        payload_cache.put(key, payload)
+    return payload
+
@@ -0,0 +1,131 @@
+# bot/queues.py
+"""
+Update'lar navbati: webhook update'ni tekshirib navbatga qo'yadi va darhol
+200 qaytaradi, qayta ishlash chat_id bo'yicha shard'langan worker'larda.
+
+- bitta chat (kuryer) update'lari doim bitta shard'ga tushadi va ketma-ket
+  bajariladi - tartib saqlanadi
+- turli shard'lar parallel ishlaydi (SHARDS ta worker)
+- shard navbati to'lsa submit() False qaytaradi: webhook 503 beradi va
+  Telegram update'ni keyinroq qayta yuboradi (polling esa put() da kutadi)
+Navbat chuqurligi va kechikishi (navbatda kutilgan vaqt) stats() da.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SHARDS = getattr(settings, 'BOT_UPDATE_SHARDS', 8)
+QUEUE_SIZE = getattr(settings, 'BOT_UPDATE_QUEUE_SIZE', 100)
+LAG_WINDOW = 1000
+
+
+def update_chat_id(update):
+    """Update qaysi chatga tegishli (tartib shu kalit bo'yicha saqlanadi)"""
+    try:
+        event = update.event
+    except Exception:
+        return 0
+
+    chat = getattr(event, 'chat', None)
+    if chat is None:
+        chat = getattr(getattr(event, 'message', None), 'chat', None)
+    if chat is not None:
+        return chat.id
+
+    user = getattr(event, 'from_user', None)
+    return user.id if user is not None else 0
+
+
+class UpdateQueuePool:
+    """handle(update) coroutine'ini chat bo'yicha tartibda, chatlar orasida parallel bajaradi"""
+
+    def __init__(self, handle, shards=SHARDS, maxsize=QUEUE_SIZE):
+        self.handle = handle
+        self._queues = [asyncio.Queue(maxsize) for _ in range(shards)]
+        self._workers = []
+        self._lags = deque(maxlen=LAG_WINDOW)
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._work(queue), name=f'updates-{index}')
+                for index, queue in enumerate(self._queues)
+            ]
+
+    def _queue_for(self, update):
+        return self._queues[update_chat_id(update) % len(self._queues)]
+
+    def submit(self, update):
+        """Kutmasdan navbatga qo'yish; shard to'lgan bo'lsa False"""
+        try:
+            self._queue_for(update).put_nowait((update, time.monotonic()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    async def put(self, update):
+        """Navbatga qo'yish - shard to'lgan bo'lsa bo'shashini kutadi"""
+        await self._queue_for(update).put((update, time.monotonic()))
+        self.enqueued += 1
+
+    async def _work(self, queue):
+        while True:
+            update, enqueued_at = await queue.get()
+            self._lags.append(time.monotonic() - enqueued_at)
+            try:
+                await self.handle(update)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"❌ Update {update.update_id} xatosi: {e}", exc_info=True)
+            else:
+                self.processed += 1
+            finally:
+                queue.task_done()
+
+    async def stop(self, timeout=10):
+        """Navbatdagilarni timeout gacha tugatib, worker'larni to'xtatish"""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues)), timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ {self.depth()} ta update qayta ishlanmay qoldi")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def depth(self):
+        return sum(queue.qsize() for queue in self._queues)
+
+    def stats(self):
+        lags = sorted(self._lags)
+        if lags:
+            p50 = lags[len(lags) // 2]
+            p95 = lags[min(len(lags) - 1, int(len(lags) * 0.95))]
+            lag_max = lags[-1]
+        else:
+            p50 = p95 = lag_max = 0.0
+        return {
+            'depth': self.depth(),
+            'depth_max_shard': max(queue.qsize() for queue in self._queues),
+            'shards': len(self._queues),
+            'enqueued': self.enqueued,
+            'processed': self.processed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'lag_p50_ms': round(p50 * 1000, 1),
+            'lag_p95_ms': round(p95 * 1000, 1),
+            'lag_max_ms': round(lag_max * 1000, 1),
+        }
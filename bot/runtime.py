@@ -0,0 +1,214 @@
+# bot/runtime.py
+"""
+Bot jarayoni: Dispatcher, courier_router va xabar yuboruvchi shu yerda.
+
+`python manage.py runbot` alohida jarayon sifatida ishlaydi:
+- polling: update'lar getUpdates bilan offset bo'yicha paketlab olinadi
+- webhook: aiohttp server update'ni qabul qilib darhol 200 qaytaradi
+Update'lar chat bo'yicha shard'langan navbatda qayta ishlanadi (bot/queues.py).
+Ikkala rejimda ham outbox navbati (yangi buyurtma xabarlari) shu jarayonda
+yuboriladi - web worker'lar faqat hodisani DB ga yozadi va aiogram'ni
+yuklamaydi. BOT_EMBEDDED=true bo'lsa eski yo'l (web worker ichidagi
+background loop) ishlatiladi.
+"""
+import asyncio
+import logging
+import os
+import signal
+
+from aiogram import Bot, Dispatcher
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .instrumentation import ApiLatencyMiddleware, get_metrics, install_query_hook
+from .queues import UpdateQueuePool
+
+logger = logging.getLogger(__name__)
+
+BOT_TOKEN = os.getenv("BOT_TOKEN", 'DefaultToken')
+WEBHOOK_PATH = '/bot/webhook/'
+METRICS_PATH = '/bot/metrics/'
+POLLING_TIMEOUT = 30
+POLLING_LIMIT = 100
+
+_bot: Bot | None = None
+_dp: Dispatcher | None = None
+_pool: UpdateQueuePool | None = None
+_pool_loop: asyncio.AbstractEventLoop | None = None
+
+
+async def fresh_db_connection(handler, event, data):
+    """Uzoq yashaydigan jarayon: har bir update oldidan eskirgan DB ulanishini yopish"""
+    await sync_to_async(close_old_connections)()
+    return await handler(event, data)
+
+
+def create_dispatcher():
+    """Dispatcher: FSM holati DB da, courier_router ulangan"""
+    from .bot import courier_router
+    from .storage import DjangoStorage
+
+    dp = Dispatcher(storage=DjangoStorage())
+    dp.update.outer_middleware(fresh_db_connection)
+    dp.include_router(courier_router)
+    return dp
+
+
+def get_bot_and_dispatcher():
+    """Jarayon uchun yagona Bot va Dispatcher (router faqat bitta dispatcher'ga ulanadi)"""
+    global _bot, _dp
+
+    if _bot is None:
+        logger.info("🤖 Bot va dispatcher yaratilmoqda...")
+        _bot = Bot(token=BOT_TOKEN)
+        _bot.session.middleware(ApiLatencyMiddleware())
+        _dp = create_dispatcher()
+        install_query_hook()
+        logger.info("✅ Bot va dispatcher tayyor")
+
+    return _bot, _dp
+
+
+def get_update_pool():
+    """Joriy event loop uchun update navbati (worker'lar birinchi chaqiruvda ishga tushadi)"""
+    global _pool, _pool_loop
+
+    loop = asyncio.get_running_loop()
+    if _pool is None or _pool_loop is not loop:
+        _pool = UpdateQueuePool(process_update)
+        _pool_loop = loop
+    _pool.start()
+    return _pool
+
+
+async def process_update(update):
+    bot, dp = get_bot_and_dispatcher()
+    await dp.feed_update(bot, update)
+
+
+async def submit_update(update):
+    """Navbatga qo'yish (BOT_EMBEDDED rejimida web thread'dan chaqiriladi)"""
+    return get_update_pool().submit(update)
+
+
+def collect_metrics():
+    """Jarayondagi bot ko'rsatkichlari: update navbati, Telegram'ga yuborish, handler'lar va Bot API"""
+    from .sender import get_stats
+
+    return {
+        'updates': _pool.stats() if _pool is not None else None,
+        'sender': get_stats(),
+        **get_metrics(),
+    }
+
+
+async def poll_updates(bot, pool, allowed_updates, timeout=POLLING_TIMEOUT):
+    """getUpdates: offset bilan paketlab olish; navbat to'lsa keyingi so'rov kutadi"""
+    offset = None
+    backoff = 1
+    while True:
+        try:
+            updates = await bot.get_updates(
+                offset=offset,
+                limit=POLLING_LIMIT,
+                timeout=timeout,
+                allowed_updates=allowed_updates,
+                request_timeout=timeout + 10,
+            )
+        except Exception as e:
+            logger.error(f"❌ getUpdates xatosi: {e}, {backoff} s dan keyin qayta")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+            continue
+
+        backoff = 1
+        for update in updates:
+            await pool.put(update)
+            offset = update.update_id + 1
+
+
+def webhook_handler(bot, pool, secret_token=None):
+    """Update'ni tekshirib navbatga qo'yadi va darhol javob qaytaradi"""
+    from aiohttp import web
+    from aiogram.types import Update
+
+    async def handle(request):
+        if secret_token and request.headers.get('X-Telegram-Bot-Api-Secret-Token') != secret_token:
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={'bot': bot})
+        except ValueError:
+            return web.json_response({'ok': False, 'error': "Noto'g'ri update"}, status=400)
+
+        if not pool.submit(update):
+            # Telegram keyinroq qayta yuboradi
+            return web.json_response({'ok': False, 'error': "Navbat to'lgan"}, status=503)
+        return web.json_response({'ok': True})
+
+    return handle
+
+
+async def metrics_handler(request):
+    from aiohttp import web
+
+    token = settings.BOT_METRICS_TOKEN
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return web.Response(status=401)
+    return web.json_response(collect_metrics())
+
+
+def start_outbox(interval):
+    """Outbox drain'ni fon vazifasi sifatida ishga tushirish"""
+    from store.outbox import drain_forever
+
+    return asyncio.create_task(drain_forever(interval=interval), name='outbox-drain')
+
+
+async def run_bot(mode, host, port, path=WEBHOOK_PATH, url=None, secret_token=None, drain_interval=1.0):
+    """
+    Bot jarayoni: update'lar (polling yoki webhook) -> navbat, outbox drain va
+    ko'rsatkichlar (METRICS_PATH). SIGINT/SIGTERM'da navbatni tugatib to'xtaydi.
+    """
+    from aiohttp import web
+
+    bot, dp = get_bot_and_dispatcher()
+    pool = get_update_pool()
+    allowed_updates = dp.resolve_used_update_types()
+
+    app = web.Application()
+    app.router.add_get(METRICS_PATH, metrics_handler)
+    tasks = [start_outbox(drain_interval)]
+
+    if mode == 'webhook':
+        app.router.add_post(path, webhook_handler(bot, pool, secret_token))
+        if url:
+            await bot.set_webhook(url=url, secret_token=secret_token, allowed_updates=allowed_updates)
+            logger.info(f"🔗 Webhook o'rnatildi: {url}")
+    else:
+        # Webhook o'rnatilgan bo'lsa getUpdates ishlamaydi
+        await bot.delete_webhook(drop_pending_updates=False)
+        tasks.append(asyncio.create_task(poll_updates(bot, pool, allowed_updates), name='polling'))
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"🌐 {host}:{port} da tinglanmoqda ({mode})")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    try:
+        await stop.wait()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await pool.stop()
+        await runner.cleanup()
+        await bot.session.close()
@@ -0,0 +1,163 @@
+# bot/sender.py
+"""
+Telegram'ga parallel, lekin limitlarga mos yuborish.
+
+- umumiy limit: bot uchun soniyasiga ~30 ta xabar (GLOBAL_RATE, GLOBAL_BURST)
+- bitta chat: xabarlar orasida kamida PER_CHAT_INTERVAL soniya
+- bir vaqtdagi so'rovlar soni semaphore bilan cheklangan (CONCURRENCY)
+- TelegramRetryAfter: shu chat (va umumiy navbat) ko'rsatilgan vaqtga suriladi,
+  so'rov qayta yuboriladi
+
+Yuborish vaqti kuryerlar soni x RTT ga emas, limitga bog'liq bo'ladi.
+Har bir yuborishning kechikishi statistikaga yoziladi (get_stats()).
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+from aiogram.exceptions import TelegramRetryAfter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = getattr(settings, 'TELEGRAM_GLOBAL_RATE', 30)
+GLOBAL_BURST = getattr(settings, 'TELEGRAM_GLOBAL_BURST', 20)
+PER_CHAT_INTERVAL = getattr(settings, 'TELEGRAM_PER_CHAT_INTERVAL', 1.0)
+CONCURRENCY = getattr(settings, 'TELEGRAM_SEND_CONCURRENCY', 10)
+MAX_RETRIES = 3
+LATENCY_WINDOW = 1000
+
+
+class Pacer:
+    """
+    GCRA: har bir chaqiruv o'z navbat vaqtini oldindan band qiladi va
+    kerak bo'lsa kutadi - parallel chaqiruvlar lock'siz tartiblanadi.
+    """
+
+    __slots__ = ('interval', 'burst', 'tat')
+
+    def __init__(self, rate, burst=1):
+        self.interval = 1 / rate
+        self.burst = burst
+        self.tat = 0.0
+
+    def reserve(self, now):
+        """Kutish kerak bo'lgan vaqt (soniya)"""
+        tat = max(self.tat, now)
+        self.tat = tat + self.interval
+        return max(0.0, tat - now - (self.burst - 1) * self.interval)
+
+    def delay(self, now, seconds):
+        """RetryAfter: navbatni kamida seconds soniyaga surish"""
+        self.tat = max(self.tat, now + seconds)
+
+
+class RateLimitedSender:
+    """Bitta bot (va event loop) uchun yuboruvchi"""
+
+    def __init__(self, bot, global_rate=GLOBAL_RATE, global_burst=GLOBAL_BURST,
+                 per_chat_interval=PER_CHAT_INTERVAL, concurrency=CONCURRENCY, max_retries=MAX_RETRIES):
+        self.bot = bot
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self._global = Pacer(global_rate, global_burst)
+        self._chats = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    def _chat_pacer(self, chat_id, now):
+        pacer = self._chats.get(chat_id)
+        if pacer is None:
+            if len(self._chats) > 10000:
+                # Uzoq vaqt yozilmagan chatlar navbati kerak emas
+                self._chats = {key: value for key, value in self._chats.items() if value.tat > now}
+            pacer = self._chats[chat_id] = Pacer(1 / self.per_chat_interval)
+        return pacer
+
+    async def _wait_turn(self, chat_id):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        chat_wait = self._chat_pacer(chat_id, now).reserve(now)
+        if chat_wait:
+            await asyncio.sleep(chat_wait)
+            now = loop.time()
+        global_wait = self._global.reserve(now)
+        if global_wait:
+            await asyncio.sleep(global_wait)
+
+    async def call(self, chat_id, make_request):
+        """
+        make_request() - har urinishda yangi coroutine qaytaradi
+        (masalan lambda: bot.send_message(...)). Natija yoki oxirgi xato qaytadi.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self._wait_turn(chat_id)
+            async with self._semaphore:
+                started = time.perf_counter()
+                try:
+                    result = await make_request()
+                except TelegramRetryAfter as e:
+                    self.retried += 1
+                    now = asyncio.get_running_loop().time()
+                    self._chat_pacer(chat_id, now).delay(now, e.retry_after)
+                    self._global.delay(now, min(e.retry_after, 1))
+                    logger.warning(f"⏳ Telegram {chat_id}: {e.retry_after} s kutish ({attempt + 1}-urinish)")
+                    if attempt == self.max_retries:
+                        self.failed += 1
+                        raise
+                    continue
+                except Exception:
+                    self.failed += 1
+                    raise
+                finally:
+                    self._latencies.append(time.perf_counter() - started)
+            self.sent += 1
+            return result
+
+    async def send_message(self, chat_id, text, **kwargs):
+        return await self.call(chat_id, lambda: self.bot.send_message(chat_id=chat_id, text=text, **kwargs))
+
+    async def fan_out(self, chat_ids, text, **kwargs):
+        """Bir xil xabarni ko'p chatga; natijalar (yoki xatolar) chat_ids tartibida"""
+        return await asyncio.gather(
+            *(self.send_message(chat_id, text, **kwargs) for chat_id in chat_ids),
+            return_exceptions=True
+        )
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+        if latencies:
+            p50 = latencies[len(latencies) // 2]
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            latency_max = latencies[-1]
+        else:
+            p50 = p95 = latency_max = 0.0
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried,
+            'latency_p50_ms': round(p50 * 1000, 1),
+            'latency_p95_ms': round(p95 * 1000, 1),
+            'latency_max_ms': round(latency_max * 1000, 1),
+        }
+
+
+_senders = {}
+
+
+def get_sender(bot):
+    """Bot va joriy event loop uchun yagona yuboruvchi (semaphore loop'ga bog'langan)"""
+    key = (id(bot), id(asyncio.get_running_loop()))
+    sender = _senders.get(key)
+    if sender is None or sender.bot is not bot:
+        sender = _senders[key] = RateLimitedSender(bot)
+    return sender
+
+
+def get_stats():
+    """Barcha yuboruvchilarning statistikasi"""
+    return [sender.stats() for sender in _senders.values()]
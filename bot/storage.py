@@ -0,0 +1,107 @@
+# bot/storage.py
+"""
+aiogram FSM storage - holat va ma'lumot DB da (store.BotState).
+
+MemoryStorage har bir gunicorn worker'da alohida edi: ro'yxatdan o'tish
+qadamlari boshqa worker'ga tushsa holat yo'qolardi. Bu yerda holat umumiy
+bazada saqlanadi, restartdan keyin ham qoladi.
+
+Bitta update ichida aiogram holat va ma'lumotni bir necha marta o'qiydi -
+shuning uchun qisqa (CACHE_TTL soniya) read-through kesh bor; yozish keshni
+ham yangilaydi. STATE_TTL dan eski holatlar o'qilganda bo'sh hisoblanadi
+va `python manage.py purge_bot_states` bilan tozalanadi.
+"""
+import time
+from datetime import timedelta
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage
+from django.conf import settings
+from django.utils import timezone
+
+CACHE_TTL = getattr(settings, 'BOT_STATE_CACHE_TTL', 1.0)
+STATE_TTL = timedelta(seconds=getattr(settings, 'BOT_STATE_TTL', 24 * 60 * 60))
+CACHE_SIZE = 1000
+
+
+def make_key(key):
+    """StorageKey -> qator kaliti"""
+    parts = [key.bot_id, key.chat_id, key.user_id, key.thread_id or '', key.business_connection_id or '', key.destiny]
+    return ':'.join(str(part) for part in parts)
+
+
+class DjangoStorage(BaseStorage):
+    def __init__(self, cache_ttl=CACHE_TTL, state_ttl=STATE_TTL):
+        self.cache_ttl = cache_ttl
+        self.state_ttl = state_ttl
+        self._cache = {}
+
+    async def _load(self, key):
+        """(state, data) - keshdan yoki bitta SELECT bilan"""
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached is not None and now - cached[2] < self.cache_ttl:
+            return cached[0], cached[1]
+
+        from store.models import BotState
+
+        row = await BotState.objects.filter(key=key).values_list('state', 'data', 'updated_at').afirst()
+        if row is None:
+            state, data = None, {}
+        elif row[2] < timezone.now() - self.state_ttl:
+            # Tashlab ketilgan sessiya
+            await BotState.objects.filter(key=key, updated_at=row[2]).adelete()
+            state, data = None, {}
+        else:
+            state, data = row[0], row[1] or {}
+
+        self._remember(key, state, data, now)
+        return state, data
+
+    async def _save(self, key, state, data):
+        from store.models import BotState
+
+        if state is None and not data:
+            await BotState.objects.filter(key=key).adelete()
+        else:
+            await BotState.objects.aupdate_or_create(key=key, defaults={'state': state, 'data': data})
+        self._remember(key, state, data, time.monotonic())
+
+    def _remember(self, key, state, data, now):
+        if len(self._cache) >= CACHE_SIZE:
+            self._cache = {
+                cache_key: value for cache_key, value in self._cache.items()
+                if now - value[2] < self.cache_ttl
+            }
+        self._cache[key] = (state, data, now)
+
+    async def set_state(self, key, state=None):
+        key = make_key(key)
+        if isinstance(state, State):
+            state = state.state
+        _, data = await self._load(key)
+        await self._save(key, state, data)
+
+    async def get_state(self, key):
+        state, _ = await self._load(make_key(key))
+        return state
+
+    async def set_data(self, key, data):
+        key = make_key(key)
+        state, _ = await self._load(key)
+        await self._save(key, state, dict(data))
+
+    async def get_data(self, key):
+        _, data = await self._load(make_key(key))
+        return dict(data)
+
+    async def close(self):
+        self._cache.clear()
+
+
+def purge_expired(ttl=STATE_TTL):
+    """Eskirgan holatlarni o'chirish"""
+    from store.models import BotState
+
+    deleted, _ = BotState.objects.filter(updated_at__lt=timezone.now() - ttl).delete()
+    return deleted
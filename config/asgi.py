@@ -5,6 +5,12 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Web jarayoni (Procfile) shu orqali ishlaydi - async endpoint'lar (masalan
+/store/api/order/create/async/) event loop'da, sync view'lar har bir so'rov
+uchun alohida thread'da:
+
+    gunicorn config.asgi -k uvicorn.workers.UvicornWorker
 """
 
 import os
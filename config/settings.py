@@ -192,6 +192,67 @@ DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
 FILE_UPLOAD_PERMISSIONS = 0o644
 FILE_UPLOAD_DIRECTORY_PERMISSIONS = 0o755
 
+# Outbox (buyurtma hodisalari) sozlamalari
+# Navbatni runbot jarayoni yuboradi; BOT_EMBEDDED rejimida web worker tranzaksiyadan
+# keyin o'zi ham yuborishga urinadi, qolganlarini `python manage.py process_outbox` qayta uradi
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 10
+OUTBOX_LEASE_SECONDS = 60
+OUTBOX_DRAIN_ON_COMMIT = os.getenv('OUTBOX_DRAIN_ON_COMMIT', 'true').lower() == 'true'
+
+# Idempotency-Key yozuvlari saqlanish muddati (soniya);
+# eskilari `python manage.py purge_idempotency_keys` bilan tozalanadi
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+# Checkout cheklovlari: savatdagi qatorlar soni va bitta qatordagi miqdor (kg)
+CHECKOUT_MAX_ITEMS = 50
+CHECKOUT_MAX_QUANTITY = 1000
+
+# Kuryer boti alohida jarayonda ishlaydi (`python manage.py runbot`): update'lar va outbox
+# navbati o'sha yerda. BOT_EMBEDDED=true - eski rejim, bot web worker ichidagi background loop'da
+BOT_EMBEDDED = os.getenv('BOT_EMBEDDED', 'false').lower() == 'true'
+# runbot --mode webhook: Telegram X-Telegram-Bot-Api-Secret-Token sarlavhasi (ixtiyoriy)
+BOT_WEBHOOK_SECRET = os.getenv('BOT_WEBHOOK_SECRET', '')
+# Update'lar chat bo'yicha shuncha navbatga bo'linadi (bitta chat - ketma-ket, chatlar - parallel);
+# bitta navbat to'lsa webhook 503 qaytaradi va Telegram keyinroq qayta yuboradi
+BOT_UPDATE_SHARDS = 8
+BOT_UPDATE_QUEUE_SIZE = 100
+# runbot'ning /bot/metrics/ manzili uchun (Authorization: Bearer <token>); bo'sh - ochiq
+BOT_METRICS_TOKEN = os.getenv('BOT_METRICS_TOKEN', '')
+
+# Bot FSM holati (bot/storage.py): shuncha vaqt yangilanmagan holat eskirgan hisoblanadi
+# (`python manage.py purge_bot_states` bilan tozalanadi); o'qish keshi - soniya
+BOT_STATE_TTL = 24 * 60 * 60
+BOT_STATE_CACHE_TTL = 1.0
+
+# Telegram'ga yuborish (bot/sender.py): bot bo'yicha umumiy limit (xabar/soniya),
+# bitta chatga xabarlar orasidagi minimal vaqt va bir vaqtdagi so'rovlar soni
+TELEGRAM_GLOBAL_RATE = 30
+TELEGRAM_GLOBAL_BURST = 20
+TELEGRAM_PER_CHAT_INTERVAL = 1.0
+TELEGRAM_SEND_CONCURRENCY = 10
+
+# Narx jadvali (store/pricing.py) katalog versiyasini shuncha soniyada bir marta tekshiradi
+PRICE_INDEX_CHECK_INTERVAL = 1.0
+# Viloyat -> kuryer indeksi (bot/couriers.py) uchun xuddi shunday
+COURIER_INDEX_CHECK_INTERVAL = 1.0
+# Bot handler'lari uchun telegram_id -> kuryer keshi (soniya); indeks maydonlari boshqa
+# jarayonda o'zgarsa kesh versiya orqali yuqoridagi interval ichida tozalanadi
+COURIER_CONTEXT_TTL = 30
+
+# Token bucket: burst ta so'rov birdaniga, keyin soniyasiga rate ta (mijoz IP / Telegram user bo'yicha).
+# RATE_LIMIT_SHARED=true bo'lsa limit barcha worker'lar uchun umumiy cache orqali ham tekshiriladi
+# (CACHES['default'] Redis yoki Memcached bo'lishi kerak - LocMemCache jarayonlararo ishlamaydi)
+RATE_LIMITS = {
+    'checkout': {'rate': 0.2, 'burst': 5},
+    'webhook': {'rate': 5, 'burst': 30},
+}
+RATE_LIMIT_SHARED = os.getenv('RATE_LIMIT_SHARED', 'false').lower() == 'true'
+RATE_LIMIT_CACHE = 'default'
+# Mijoz IP si X-Forwarded-For ning o'ngdan shu raqamli yozuvi (har bir proxy o'ngga qo'shadi).
+# Heroku router - 1; 0 bo'lsa faqat REMOTE_ADDR (chap tomondagi qiymatni mijoz o'zi yozadi)
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv('RATE_LIMIT_TRUSTED_PROXIES', 1))
+
 # Gunicorn timeout sozlamalari (environment variable orqali)
 # Production'da: export GUNICORN_TIMEOUT=300
 # Yoki Procfile'da: web: gunicorn config.wsgi --timeout 300
@@ -301,6 +362,11 @@ UNFOLD = {
                         "link": reverse_lazy("admin:store_order_changelist"),
                         "icon": "shopping_cart",
                     },
+                    {
+                        "title": "Buyurtmalarni import qilish",
+                        "link": reverse_lazy("admin:store_order_import"),
+                        "icon": "upload_file",
+                    },
                     {
                         "title": "Savollarga javoblar",
                         "link": reverse_lazy("admin:home_aboutusquestions_changelist"),
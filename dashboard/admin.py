@@ -4,14 +4,14 @@ from django.contrib import admin
 from django.urls import path
 from django.shortcuts import render
 from django.utils import timezone
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, Max, Q
 from datetime import timedelta, datetime
 import json
 
 
 def dashboard_view(request):
     """Custom dashboard view"""
-    from store.models import Order, Product
+    from store.models import Order, OrderItem, Product
     from django.contrib.auth import get_user_model
     
     User = get_user_model()
@@ -93,29 +93,22 @@ def dashboard_view(request):
     # Low stock products
     low_stock = Product.objects.filter(stock__lt=15).order_by('stock')[:5]
 
-    # Top products by revenue
-    top_products = []
-    try:
-        top_items = Order.objects.values('product__name')\
-            .annotate(
-                total_sold=Sum('quantity'),
-                total_revenue=Sum('price')
-            )\
-            .order_by('-total_revenue')[:10]
-        
-        for item in top_items:
-            top_products.append({
-                'products__name': item['product__name'],
-                'total_sold': item['total_sold'],
-                'total_revenue': float(item['total_revenue'] or 0)
-            })
-    except:
-        for product in Product.objects.all()[:10]:
-            top_products.append({
-                'products__name': product.name,
-                'total_sold': 0,
-                'total_revenue': 0.0
-            })
+    # Top products by revenue (buyurtma qatorlari bo'yicha bitta agregat)
+    top_products = [
+        {
+            'products__name': item['products__name'],
+            'total_sold': item['total_sold'],
+            'total_revenue': float(item['total_revenue'] or 0)
+        }
+        for item in OrderItem.objects.filter(product__isnull=False)
+        .values('product_id')
+        .annotate(
+            products__name=Max('product_name'),
+            total_sold=Sum('quantity'),
+            total_revenue=Sum('line_total')
+        )
+        .order_by('-total_revenue')[:10]
+    ]
 
     # Region choices for filter (faqat viloyatlar)
     region_list = (
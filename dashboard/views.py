@@ -1,10 +1,10 @@
 
 from django.shortcuts import render
 from django.http import JsonResponse
-from store.models import Order
+from store.models import Order, OrderItem
 from store.models import Product
 from django.contrib.auth.models import User
-from django.db.models import Count, Sum, Q, F
+from django.db.models import Count, Sum, Max, Q, F
 from django.db.models.functions import TruncMonth, ExtractHour, ExtractWeekDay
 from datetime import datetime, timedelta
 import json
@@ -36,8 +36,9 @@ def dashboard(request):
 
     # Mahsulotlar statistikasi
     product_stats = (
-        Order.objects.values("products__name")
-        .annotate(count=Count("products"))
+        OrderItem.objects.filter(order__in=orders, product__isnull=False)
+        .values("product_id")
+        .annotate(products__name=Max("product_name"), count=Count("id"), quantity=Sum("quantity"))
         .order_by("-count")[:10]
     )
 
@@ -93,15 +94,13 @@ def dashboard_api(request):
     )
     
     # Top products
-    top_products = (
-        Product.objects.annotate(
-            sold=Count('order', distinct=True),
-            revenue=Sum('order__total_price', distinct=True),
-        )
-        .filter(sold__gt=0)
+    top_products = [
+        {'id': item['product_id'], 'name': item['name'], 'sold': item['sold'], 'revenue': item['revenue']}
+        for item in OrderItem.objects.filter(product__isnull=False)
+        .values('product_id')
+        .annotate(name=Max('product_name'), sold=Sum('quantity'), revenue=Sum('line_total'))
         .order_by('-sold')[:10]
-        .values('id', 'name', 'sold', 'revenue')
-    )
+    ]
 
     
     # Status distribution
@@ -128,7 +127,7 @@ def dashboard_api(request):
     
     return JsonResponse({
         'daily_sales': list(daily_sales),
-        'top_products': list(top_products),
+        'top_products': top_products,
         'status_stats': list(status_stats),
         'payment_stats': list(payment_stats),
         'new_customers': list(new_customers),
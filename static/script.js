@@ -200,6 +200,7 @@ function initCartSystem() {
                 cartModal.classList.add('active');
                 document.body.style.overflow = 'hidden';
             }
+            refreshQuote();
         });
     }
 
@@ -298,6 +299,63 @@ function initCartSystem() {
         }
     });
 
+    // Savatdagi narxlarni serverdagi joriy narxlar bilan yangilash (bitta so'rov)
+    let quoteRequest = null;
+
+    async function refreshQuote() {
+        if (quoteRequest || !Array.isArray(cart) || cart.length === 0) return;
+
+        const payload = {
+            items: cart.map(item => ({
+                id: item.id,
+                quantity: parseFloat(item.quantity || 0),
+                name: item.name
+            }))
+        };
+
+        try {
+            quoteRequest = fetch('/store/api/cart/quote/', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': getCookie('csrftoken')
+                },
+                body: JSON.stringify(payload)
+            });
+            const response = await quoteRequest;
+            const result = await response.json();
+            if (!response.ok || !result.success) return;
+
+            const quoted = new Map(result.data.items.map(line => [String(line.id), line]));
+            const unavailable = new Set(result.data.unavailable.map(line => String(line.id)));
+            let changed = false;
+
+            cart = cart.filter(item => {
+                if (unavailable.has(item.id)) {
+                    showNotification(`${item.name} hozir sotuvda yo'q - savatdan olib tashlandi`, 'warning');
+                    changed = true;
+                    return false;
+                }
+                const line = quoted.get(item.id);
+                if (line && (line.price !== parseFloat(item.price) || line.name !== item.name)) {
+                    item.price = line.price;
+                    item.name = line.name;
+                    changed = true;
+                }
+                return true;
+            });
+
+            if (changed) {
+                saveCart();
+                renderCart();
+            }
+        } catch (e) {
+            console.error('Cart quote error:', e);
+        } finally {
+            quoteRequest = null;
+        }
+    }
+
     function getCart() {
         try {
             return JSON.parse(localStorage.getItem(CART_KEY)) || [];
@@ -437,6 +495,9 @@ function initCartSystem() {
     }
 
     // Checkout
+    // Bitta buyurtma urinishi uchun kalit: qayta yuborilsa server birinchi javobni qaytaradi
+    let checkoutKey = null;
+
     if (orderForm) {
         orderForm.addEventListener('submit', async (e) => {
             e.preventDefault();
@@ -446,6 +507,8 @@ function initCartSystem() {
                 return;
             }
 
+            if (checkoutBtn && checkoutBtn.disabled) return;
+
             if (!orderForm.checkValidity()) {
                 orderForm.reportValidity();
                 return;
@@ -467,17 +530,23 @@ function initCartSystem() {
                 }))
             };
 
+            const payloadKey = JSON.stringify(orderData);
+            if (!checkoutKey || checkoutKey.payload !== payloadKey) {
+                checkoutKey = { value: generateIdempotencyKey(), payload: payloadKey };
+            }
+
             const btn = checkoutBtn;
             const originalHTML = btn.innerHTML;
             btn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Yuborilmoqda...';
             btn.disabled = true;
 
             try {
-                const response = await fetch('/store/api/order/create/', {
+                const response = await fetch('/store/api/order/create/async/', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json',
-                        'X-CSRFToken': getCookie('csrftoken')
+                        'X-CSRFToken': getCookie('csrftoken'),
+                        'Idempotency-Key': checkoutKey.value
                     },
                     body: JSON.stringify(orderData)
                 });
@@ -486,6 +555,7 @@ function initCartSystem() {
 
                 if (response.ok && result.success) {
                     showNotification(`✅ Buyurtma qabul qilindi! ID: #${result.data?.order_id || 'OK'}`, 'success');
+                    checkoutKey = null;
                     cart = [];
                     saveCart();
                     renderCart();
@@ -634,6 +704,13 @@ function getCookie(name) {
     return cookieValue;
 }
 
+function generateIdempotencyKey() {
+    if (window.crypto && typeof window.crypto.randomUUID === 'function') {
+        return window.crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}-${Math.random().toString(36).slice(2)}`;
+}
+
 function escapeHtml(text) {
     const div = document.createElement('div');
     div.textContent = text;
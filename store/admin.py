@@ -1,10 +1,16 @@
 # store/admin.py
-from django.contrib import admin
+import csv
+import io
+from django import forms
+from django.contrib import admin, messages
+from django.shortcuts import render, redirect
+from django.urls import path
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from decimal import Decimal
-from .models import Category, Product, Order, Courier, CourierToken
-from unfold.admin import ModelAdmin as UnfoldModelAdmin
+from .models import Category, Product, Order, OrderItem, OutboxEvent, Courier, CourierToken
+from unfold.admin import ModelAdmin as UnfoldModelAdmin, TabularInline
+from .versions import CATALOG, COURIERS, bump_version
 
 # ==================== CATEGORY ADMIN ====================
 @admin.register(Category)
@@ -46,7 +52,7 @@ class CategoryAdmin(UnfoldModelAdmin):
 @admin.register(Product)
 class ProductAdmin(UnfoldModelAdmin):
     # Remove 'display_image' from list_display_links since it's not a real field
-    list_display = ('display_image', 'name', 'category', 'display_price', 'old_price', 'display_stock', 'display_discount', 'get_is_active_display')
+    list_display = ('display_image', 'name', 'category', 'display_price', 'old_price', 'display_promo_price', 'display_discount', 'display_stock', 'get_is_active_display')
     list_display_links = ('name',)  # Changed from ('display_image', 'name')
     list_editable = ()
     list_filter = ('category', 'is_active', 'created_at')
@@ -63,7 +69,7 @@ class ProductAdmin(UnfoldModelAdmin):
             'fields': ('category', 'name', 'description')
         }),
         ('Narx va miqdor', {
-            'fields': ('price', 'stock', 'old_price')
+            'fields': ('price', 'promo_price', 'old_price', 'stock')
         }),
         ('Media', {
             'fields': ('image',)
@@ -107,15 +113,19 @@ class ProductAdmin(UnfoldModelAdmin):
     display_price.short_description = 'Narxi'
     display_price.admin_order_field = 'price'
     
-    def display_stock(self, obj):
-        if obj.stock:
-            stock_int = int(obj.stock)
-            price_int = int(obj.price)
-            if price_int > stock_int:
-                return format_html('{}', stock_int)
-            return format_html('{}', stock_int)
+    def display_promo_price(self, obj):
+        if obj.promo_price:
+            return format_html('{}', int(obj.promo_price))
         return format_html('<span style="color:#999;">{}</span>', '-')
-    display_stock.short_description = 'Aksiya narxi'
+    display_promo_price.short_description = 'Aksiya narxi'
+    display_promo_price.admin_order_field = 'promo_price'
+    
+    def display_stock(self, obj):
+        if obj.stock is None:
+            return format_html('<span style="color:#999;">{}</span>', '-')
+        color = 'red' if obj.stock <= 0 else 'inherit'
+        return format_html('<span style="color:{};">{} kg</span>', color, obj.stock.normalize())
+    display_stock.short_description = 'Qoldiq'
     display_stock.admin_order_field = 'stock'
     
     def display_discount(self, obj):
@@ -142,18 +152,36 @@ class ProductAdmin(UnfoldModelAdmin):
     get_created_at_display.short_description = 'Yaratilgan sana'
     
     def save_model(self, request, obj, form, change):
-        if not obj.stock:
-            obj.stock = obj.price
+        if not obj.promo_price:
+            obj.promo_price = obj.price
         super().save_model(request, obj, form, change)
 
 # ==================== CUSTOM ADMIN ACTIONS ====================
 @admin.action(description="Tanlanganlarni faollashtirish")
 def make_active(_, request, queryset):
     queryset.update(is_active=True)
+    bump_version(CATALOG)
 
 @admin.action(description="Tanlanganlarni faolsizlashtirish")
 def make_inactive(_, request, queryset):
     queryset.update(is_active=False)
+    bump_version(CATALOG)
+
+
+class OrderItemInline(TabularInline):
+    model = OrderItem
+    extra = 0
+    fields = ('product', 'product_name', 'quantity', 'unit_price', 'line_total')
+    readonly_fields = ('product', 'product_name', 'quantity', 'unit_price', 'line_total')
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class OrderImportForm(forms.Form):
+    file = forms.FileField(label='Fayl (CSV yoki JSONL)')
+    notify = forms.BooleanField(label='Kuryerlarga xabar yuborish', required=False, initial=True)
 
 
 @admin.register(Order)
@@ -163,6 +191,7 @@ class OrderAdmin(UnfoldModelAdmin):
     search_fields = ('order_id', 'full_name', 'phone', 'address')
     readonly_fields = ('order_id', 'created_at')
     list_editable = ('status',)
+    inlines = [OrderItemInline]
     actions = ['mark_as_completed', 'mark_as_processing', 'export_orders']
     
     fieldsets = (
@@ -208,6 +237,27 @@ class OrderAdmin(UnfoldModelAdmin):
         return obj.created_at.strftime("%b %d, %Y %H:%M")
     created_at_display.short_description = 'Date'
     
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        # Yangi buyurtma ID si admin tranzaksiyasidan oldin (order_ids.py)
+        if object_id is None and request.method == 'POST':
+            request.new_order_id = Order.generate_order_id()
+        return super().changeform_view(request, object_id, form_url, extra_context)
+    
+    def save_model(self, request, obj, form, change):
+        """Status yoki kuryer qo'lda o'zgarsa (jumladan ro'yxatdan) - kuryer hisoblagichlari shu tranzaksiyada"""
+        previous = Order.objects.filter(pk=obj.pk).values('status', 'courier_id').first() if change else None
+        if not change and not obj.order_id:
+            obj.order_id = getattr(request, 'new_order_id', '')
+        super().save_model(request, obj, form, change)
+        
+        # Boshqa kuryerga o'tkazilgan buyurtma yangi kuryer uchun endi biriktirilgan
+        old_status = None
+        if previous is not None and previous['courier_id'] == obj.courier_id:
+            old_status = previous['status']
+        if Courier.count_order_status(obj.courier_id, old_status, obj.status):
+            # runbot'dagi kuryer konteksti (profil hisoblagichlari) boshqa jarayonda - versiya orqali
+            bump_version(COURIERS)
+    
     def mark_as_completed(self, request, queryset):
         updated = queryset.update(status='completed')
         self.message_user(request, f'{updated} orders marked as completed.')
@@ -219,6 +269,56 @@ class OrderAdmin(UnfoldModelAdmin):
     def export_orders(self, request, queryset):
         pass
     
+    def get_urls(self):
+        custom_urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='store_order_import'),
+        ]
+        return custom_urls + super().get_urls()
+    
+    def import_view(self, request):
+        """Buyurtmalarni fayldan import qilish (oqim bo'yicha, chunk'lab)"""
+        from .importers import detect_format, import_orders
+        from .views import schedule_outbox_drain
+        
+        if not self.has_add_permission(request):
+            return redirect('admin:store_order_changelist')
+        
+        form = OrderImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            try:
+                result = import_orders(
+                    stream,
+                    fmt=detect_format(upload.name),
+                    notify=form.cleaned_data['notify'],
+                )
+            except (UnicodeDecodeError, csv.Error) as e:
+                # Xatodan oldingi chunk'lar yozilgan va xabarlari navbatga chiqarilgan
+                if form.cleaned_data['notify']:
+                    schedule_outbox_drain()
+                messages.error(request, f"Fayl o'qilmadi: {e}")
+                return redirect('admin:store_order_changelist')
+            if form.cleaned_data['notify'] and result.imported:
+                schedule_outbox_drain()
+            
+            for line_no, error in result.errors:
+                messages.warning(request, f"{line_no}-qator: {error}")
+            messages.success(
+                request,
+                f"{result.imported}/{result.rows} ta buyurtma import qilindi "
+                f"({result.rows_per_second:.0f} qator/s)"
+            )
+            return redirect('admin:store_order_changelist')
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Buyurtmalarni import qilish',
+            'form': form,
+            'opts': self.model._meta,
+        }
+        return render(request, 'admin/store/order/import.html', context)
+    
     mark_as_completed.short_description = "Mark selected orders as completed"
     mark_as_processing.short_description = "Mark selected orders as processing"
     export_orders.short_description = "Export selected orders"
@@ -268,5 +368,24 @@ class CourierTokenAdmin(UnfoldModelAdmin):
     def has_add_permission(self, request):
         return False
 
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(UnfoldModelAdmin):
+    list_display = ['id', 'event_type', 'order', 'status', 'attempts', 'available_at', 'created_at', 'delivered_at']
+    list_filter = ['status', 'event_type']
+    search_fields = ['order__order_id']
+    readonly_fields = ['event_type', 'order', 'payload', 'attempts', 'claim_token', 'last_error', 'created_at', 'delivered_at']
+    actions = ['retry_events']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @admin.action(description="Qayta yuborish navbatiga qo'yish")
+    def retry_events(self, request, queryset):
+        from django.utils import timezone
+        updated = queryset.exclude(status='delivered').update(
+            status='pending', available_at=timezone.now(), claim_token=''
+        )
+        self.message_user(request, f"{updated} ta hodisa navbatga qo'yildi.")
+
 # Admin actionlarni qo'shamiz
 CategoryAdmin.actions = [make_active, make_inactive]
\ No newline at end of file
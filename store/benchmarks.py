@@ -0,0 +1,78 @@
+# store/benchmarks.py
+"""
+Mikrobenchmark'lar: `python manage.py benchmark <nom>`.
+Har biri (tavsif, funksiya) qaytaradi - funksiya bitta iteratsiyani bajaradi.
+"""
+import json
+
+
+def sample_checkout_payload(items=10):
+    """Odatiy checkout so'rovi (items ta mahsulot)"""
+    return {
+        'name': 'Ali Valiyev',
+        'phone': '+998 90 123 45 67',
+        'region': 'Toshkent',
+        'district': 'Chilonzor',
+        'address': 'Chilonzor 1-mavze, 5-uy',
+        'payment': 'cash',
+        'notes': '',
+        'items': [
+            {'id': i + 1, 'quantity': 1.5, 'name': f'Mahsulot {i}'}
+            for i in range(items)
+        ],
+    }
+
+
+def bench_checkout_schema(items=10):
+    """Checkout sxema tekshiruvi (JSON parse'siz)"""
+    from .checkout import validate_order_data
+
+    payload = sample_checkout_payload(items)
+    return f'validate_order_data, {items} ta mahsulot', lambda: validate_order_data(payload)
+
+
+def bench_checkout_parse(items=10):
+    """JSON parse + sxema tekshiruvi - view'dagi to'liq yo'l (DB gacha)"""
+    from .checkout import parse_order_payload
+
+    body = json.dumps(sample_checkout_payload(items)).encode()
+    return f'parse_order_payload, {items} ta mahsulot', lambda: parse_order_payload(body)
+
+
+def _sample_product_ids(items):
+    from .models import Product
+
+    product_ids = list(Product.objects.filter(is_active=True).values_list('id', flat=True)[:items])
+    if not product_ids:
+        raise ValueError('Bazada faol mahsulot yo\'q')
+    return product_ids
+
+
+def bench_price_orm(items=10):
+    """Avvalgi yo'l: har so'rovda in_bulk + get_effective_price()"""
+    from .models import Product
+
+    product_ids = _sample_product_ids(items)
+
+    def run():
+        products = Product.objects.filter(is_active=True).in_bulk(product_ids)
+        return [(product.get_effective_price(), product.get_price_action_percent()) for product in products.values()]
+
+    return f'ORM in_bulk, {len(product_ids)} ta mahsulot', run
+
+
+def bench_price_index(items=10):
+    """Narx jadvali: xotiradan o'qish (versiya tekshiruvi oralig'ida)"""
+    from .pricing import get_price_index
+
+    product_ids = _sample_product_ids(items)
+    get_price_index()
+    return f'PriceIndex.get_many, {len(product_ids)} ta mahsulot', lambda: get_price_index().get_many(product_ids)
+
+
+BENCHMARKS = {
+    'checkout_schema': bench_checkout_schema,
+    'checkout_parse': bench_checkout_parse,
+    'price_orm': bench_price_orm,
+    'price_index': bench_price_index,
+}
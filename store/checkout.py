@@ -0,0 +1,266 @@
+# store/checkout.py
+"""Buyurtma qabul qilish mantiqi - sync va async view'lar uchun umumiy"""
+import json
+import re
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+
+from .models import Order, OrderItem, Product
+from .schemas import DecimalNumber, Integer, List, Object, Schema, String
+
+
+MAX_CART_ITEMS = getattr(settings, 'CHECKOUT_MAX_ITEMS', 50)
+MAX_QUANTITY = Decimal(str(getattr(settings, 'CHECKOUT_MAX_QUANTITY', 1000)))
+
+PAYMENT_MAPPING = {
+    'cash': 'naqd',
+    'card': 'karta',
+    'click': 'click',
+    'payme': 'click',
+}
+
+# +998 90 123 45 67, 998901234567, (90) 123-45-67 ...
+PHONE_PATTERN = r'^\+?(?:[\s\-()]*\d){9,15}[\s\-()]*$'
+
+CART_ITEM = Object({
+    'id': Integer(min_value=1),
+    'quantity': DecimalNumber(min_value=Decimal('0'), exclusive_min=True, max_value=MAX_QUANTITY),
+    'name': String(max_length=200, required=False, default=''),
+})
+
+CHECKOUT_SCHEMA = Schema({
+    'name': String(max_length=120),
+    'phone': String(max_length=30, pattern=PHONE_PATTERN, message='Telefon raqam noto\'g\'ri'),
+    'region': String(max_length=120),
+    'district': String(max_length=120),
+    'address': String(max_length=255),
+    'payment': String(choices=PAYMENT_MAPPING),
+    'notes': String(max_length=1000, required=False, default=''),
+    'items': List(CART_ITEM, min_items=1, max_items=MAX_CART_ITEMS),
+})
+
+QUOTE_SCHEMA = Schema({
+    'items': List(CART_ITEM, max_items=MAX_CART_ITEMS, required=False, default=()),
+})
+
+
+class CheckoutError(Exception):
+    """Mijozga qaytariladigan xatolik (xabar + HTTP status, ixtiyoriy maydon xatolari)"""
+
+    def __init__(self, message, status=400, errors=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.errors = errors
+
+    def as_payload(self):
+        payload = {'success': False, 'message': self.message}
+        if self.errors:
+            payload['errors'] = self.errors
+        return payload
+
+
+def parse_order_payload(body, schema=CHECKOUT_SCHEMA):
+    """
+    So'rov tanasini tekshirish (DB ga murojaatsiz).
+    Qaytaradi: (data, lines) - lines: [(product_id, quantity, name), ...]
+    """
+    try:
+        data = json.loads(body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise CheckoutError('Noto\'g\'ri JSON format')
+    
+    return validate_order_data(data, schema)
+
+
+def validate_order_data(data, schema=CHECKOUT_SCHEMA):
+    """
+    Buyurtma ma'lumotlarini (dict) sxema bo'yicha tekshirish.
+    Qaytaradi: (tozalangan data, lines) - lines: [(product_id, quantity, name), ...]
+    """
+    cleaned, errors = schema.validate(data)
+    if cleaned is None:
+        raise CheckoutError('Noto\'g\'ri JSON format')
+    if errors:
+        field, message = next(iter(errors.items()))
+        raise CheckoutError(f'{field}: {message}', errors=errors)
+    
+    lines = [(item['id'], item['quantity'], item['name']) for item in cleaned['items']]
+    return cleaned, lines
+
+
+def build_order_items(lines, prices):
+    """
+    Narxlarni hisoblash (aniq Decimal) va qatorlarni tayyorlash.
+    prices - narx jadvali (pricing.PriceIndex): .get(product_id) -> PriceEntry
+    Qaytaradi: (total_price, {product_id: OrderItem})
+    """
+    total_price = Decimal('0')
+    order_items = {}
+    for product_id, quantity, name in lines:
+        entry = prices.get(product_id)
+        if entry is None:
+            raise CheckoutError(f'Mahsulot topilmadi: {name}', status=404)
+        
+        unit_price = entry.effective_price
+        total_price += unit_price * quantity
+        
+        # Bir xil mahsulot bir necha marta kelsa - bitta qatorga qo'shiladi
+        order_item = order_items.get(product_id)
+        if order_item is None:
+            order_items[product_id] = OrderItem(
+                product_id=product_id,
+                product_name=entry.name,
+                quantity=quantity,
+                unit_price=unit_price,
+            )
+        else:
+            order_item.quantity += quantity
+    
+    for order_item in order_items.values():
+        order_item.line_total = (order_item.unit_price * order_item.quantity).quantize(
+            Decimal('0.01'), rounding=ROUND_HALF_UP
+        )
+    
+    return total_price.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP), order_items
+
+
+def quote_cart(lines, prices):
+    """
+    Savatni joriy narxlar bilan hisoblash (buyurtma yaratmasdan).
+    Topilmagan / faol bo'lmagan mahsulotlar 'unavailable' ro'yxatiga tushadi.
+    """
+    total_price = Decimal('0')
+    items = []
+    unavailable = []
+    for product_id, quantity, name in lines:
+        entry = prices.get(product_id)
+        if entry is None:
+            unavailable.append({'id': product_id, 'name': name})
+            continue
+        
+        amount = entry.effective_price * quantity
+        total_price += amount
+        line_total = amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        items.append({
+            'id': product_id,
+            'name': entry.name,
+            'quantity': float(quantity),
+            'price': float(entry.effective_price),
+            'original_price': float(entry.price),
+            'discount': entry.discount,
+            'line_total': float(line_total),
+        })
+    
+    return {
+        'items': items,
+        'unavailable': unavailable,
+        # Checkout bilan bir xil: yig'indi yaxlitlanadi, qatorlar alohida emas
+        'total': float(total_price.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)),
+    }
+
+
+def reserve_stock(quantities):
+    """
+    Ombordagi qoldiqni bitta shartli UPDATE bilan kamaytirish:
+        UPDATE ... SET stock = stock - n WHERE id IN (...) AND stock >= n
+    O'qib-yozish (SELECT FOR UPDATE) yo'q - parallel checkout'lar bir-birini kutmaydi.
+    UPDATE faqat qoldig'i kuzatiladigan qatorlarga - stock bo'sh (NULL) mahsulotlar
+    oddiy SELECT bilan ajratiladi va yozilmaydi (row lock ham, yangi versiya ham yo'q).
+    quantities: {product_id: Decimal}
+    """
+    tracked = {
+        product_id: quantities[product_id] for product_id in
+        Product.objects.filter(pk__in=quantities, stock__isnull=False).values_list('id', flat=True)
+    } if quantities else {}
+    if not tracked:
+        return
+    
+    needed = Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in tracked.items()],
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    updated = (
+        Product.objects
+        .filter(pk__in=tracked, stock__gte=needed)
+        .update(stock=F('stock') - needed)
+    )
+    
+    if updated != len(tracked):
+        # Faqat xato holatida - qaysi mahsulot yetmaganini aniqlash
+        short = [
+            name for product_id, name, stock in
+            Product.objects.filter(pk__in=quantities).values_list('id', 'name', 'stock')
+            if stock is not None and stock < quantities[product_id]
+        ]
+        raise CheckoutError(
+            f'Omborda yetarli emas: {", ".join(short) or "mahsulot"}',
+            status=409
+        )
+
+
+def order_fields(data, total_price):
+    """Order modeli maydonlari (tekshirilgan ma'lumotlardan)"""
+    # Telefon raqamni tozalash: faqat raqamlar (PHONE_PATTERN bo'yicha 9-15 ta)
+    phone = re.sub(r'\D', '', data['phone'])
+    
+    return {
+        'full_name': data['name'],
+        'phone': phone,
+        'region': data['region'],
+        'district': data['district'],
+        'address': data['address'],
+        'payment_method': PAYMENT_MAPPING.get(data['payment'], 'naqd'),
+        'comments': data['notes'],
+        'total_price': total_price,
+        'status': 'pending',
+    }
+
+
+def save_order(data, total_price, order_items, on_saved=None):
+    """
+    Buyurtma, qatorlar va mahsulot bog'lanishlarini bitta tranzaksiyada yozish.
+    on_saved(order) - shu tranzaksiya ichida qo'shimcha yozuv uchun (masalan idempotency)
+    """
+    # ID tranzaksiyadan oldin: rollback (409, idempotency) blok hisoblagichini qaytarmasin
+    order_id = Order.generate_order_id()
+    
+    with transaction.atomic():
+        order = Order.objects.create(order_id=order_id, **order_fields(data, total_price))
+        
+        for order_item in order_items.values():
+            order_item.order = order
+        OrderItem.objects.bulk_create(order_items.values())
+        
+        OrderProduct = Order.products.through
+        OrderProduct.objects.bulk_create([
+            OrderProduct(order_id=order.pk, product_id=product_id)
+            for product_id in order_items
+        ])
+        
+        if on_saved is not None:
+            on_saved(order)
+        
+        # Qoldiq oxirida kamaytiriladi - qator lock'lari commit'gacha qisqa ushlanadi
+        reserve_stock({
+            product_id: order_item.quantity
+            for product_id, order_item in order_items.items()
+        })
+    
+    return order
+
+
+def order_created_payload(order, items_count):
+    """Muvaffaqiyatli javob tanasi"""
+    return {
+        'success': True,
+        'message': 'Buyurtma muvaffaqiyatli qabul qilindi!',
+        'data': {
+            'order_id': order.order_id,
+            'total': float(order.total_price),
+            'items_count': items_count
+        }
+    }
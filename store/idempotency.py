@@ -0,0 +1,102 @@
+# store/idempotency.py
+"""
+Idempotency-Key: bir xil checkout so'rovi qayta kelsa (double-tap, brauzer
+retry) birinchi javob qaytariladi - Product/Order jadvallariga tegilmaydi
+va kuryerlarga qayta xabar ketmaydi.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils import timezone
+
+from .checkout import CheckoutError
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 100
+TTL = timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+
+def get_idempotency_key(request):
+    """Sarlavhadan kalitni olish (bo'lmasa None)"""
+    key = request.headers.get(HEADER, '').strip()
+    if not key:
+        return None
+    if len(key) > MAX_KEY_LENGTH:
+        raise CheckoutError(f'{HEADER} juda uzun (maks. {MAX_KEY_LENGTH})')
+    return key
+
+
+def request_fingerprint(body):
+    """So'rov tanasining xeshi - bir kalit boshqa so'rov uchun ishlatilmasligi uchun"""
+    return hashlib.sha256(body).hexdigest()
+
+
+def _check_record(record, fingerprint):
+    """Saqlangan yozuv so'rovga mosligini tekshirish"""
+    if record.request_hash != fingerprint:
+        raise CheckoutError(f'{HEADER} boshqa so\'rov uchun ishlatilgan', status=422)
+    return record
+
+
+def find_response(key, fingerprint):
+    """Oldingi javobni bitta indekslangan so'rov bilan topish"""
+    record = IdempotencyKey.objects.filter(key=key).first()
+    if record is None:
+        return None
+    if record.expires_at <= timezone.now():
+        # Muddati o'tgan, hali tozalanmagan yozuv - kalit qayta ishlatiladi
+        record.delete()
+        return None
+    return _check_record(record, fingerprint)
+
+
+async def afind_response(key, fingerprint):
+    """find_response - async versiya"""
+    record = await IdempotencyKey.objects.filter(key=key).afirst()
+    if record is None:
+        return None
+    if record.expires_at <= timezone.now():
+        await record.adelete()
+        return None
+    return _check_record(record, fingerprint)
+
+
+def store_response(key, fingerprint, order, body, status_code=200):
+    """Javobni saqlash - buyurtma tranzaksiyasi ichida chaqiriladi"""
+    return IdempotencyKey.objects.create(
+        key=key,
+        request_hash=fingerprint,
+        status_code=status_code,
+        response_body=body,
+        order=order,
+        expires_at=timezone.now() + TTL,
+    )
+
+
+def replay_response(record):
+    """Saqlangan javobni qaytarish"""
+    response = JsonResponse(record.response_body, status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def is_replay(response):
+    """Saqlangan javob qaytarilganmi (rate limit uchun - bunday so'rov limitga kirmaydi)"""
+    return response.get('Idempotent-Replayed') == 'true'
+
+
+def purge_expired(batch_size=1000):
+    """Muddati o'tgan kalitlarni paketlab o'chirish; o'chirilganlar sonini qaytaradi"""
+    total = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects
+            .filter(expires_at__lte=timezone.now())
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        total += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,207 @@
+# store/importers.py
+"""
+Telefon/ulgurji buyurtmalarni fayldan import qilish.
+
+Fayl oqim sifatida qatorma-qator o'qiladi (CSV yoki JSONL), har bir qator -
+bitta buyurtma. Narxlar bitta so'rov bilan oldindan yuklanadi, buyurtmalar
+chunk'lab bulk_create qilinadi (signal ishlamaydi), kuryer xabarlari esa
+import oxirida bitta paket bo'lib navbatga chiqariladi.
+
+CSV ustunlari: name, phone, region, district, address, payment, notes, items
+    items: "product_id:miqdor;product_id:miqdor"  (masalan "12:1.5;7:2")
+JSONL: har bir qator /store/api/order/create/ so'rov tanasi bilan bir xil.
+"""
+import csv
+import json
+import time
+import uuid
+
+from django.db import DatabaseError, transaction
+
+from .checkout import CheckoutError, build_order_items, order_fields, reserve_stock, validate_order_data
+from .models import Order, OrderItem, OutboxEvent, Product
+from .order_ids import next_order_ids
+from .outbox import build_order_created_event, release_held
+from .pricing import get_price_index
+
+FORMATS = ('csv', 'jsonl')
+DEFAULT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportResult:
+    """Import natijasi va statistikasi"""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    def add_error(self, line_no, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_no, message))
+
+    @property
+    def rows_per_second(self):
+        if not self.elapsed:
+            return 0.0
+        return self.rows / self.elapsed
+
+
+def detect_format(filename):
+    """Fayl kengaytmasidan formatni aniqlash"""
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def parse_items_cell(cell):
+    """CSV 'items' ustuni: "12:1.5;7:2" -> [{'id': '12', 'quantity': '1.5'}, ...]"""
+    items = []
+    for part in (cell or '').split(';'):
+        part = part.strip()
+        if not part:
+            continue
+        product_id, _, quantity = part.partition(':')
+        product_id = product_id.strip()
+        items.append({'id': product_id, 'quantity': quantity.strip() or '1', 'name': f'#{product_id}'})
+    return items
+
+
+def iter_rows(stream, fmt):
+    """(qator raqami, dict) juftliklarini oqim bo'yicha qaytaradi"""
+    if fmt == 'jsonl':
+        for line_no, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError:
+                yield line_no, None
+        return
+
+    reader = csv.DictReader(stream)
+    for row in reader:
+        row['items'] = parse_items_cell(row.get('items'))
+        yield reader.line_num, row
+
+
+def load_stock():
+    """Qoldig'i kuzatiladigan mahsulotlar: {product_id: stock} - bitta so'rov"""
+    return dict(Product.objects.filter(stock__isnull=False).values_list('id', 'stock'))
+
+
+def _take_stock(remaining, order_items):
+    """
+    Oldindan yuklangan qoldiqdan qatorni xotirada ayirish - yetmasa qator rad etiladi.
+    DB dagi haqiqiy kamaytirish chunk yozilganda bitta UPDATE bilan bajariladi.
+    """
+    short = [
+        order_item.product_name for product_id, order_item in order_items.items()
+        if remaining.get(product_id) is not None and remaining[product_id] < order_item.quantity
+    ]
+    if short:
+        raise CheckoutError(f'Omborda yetarli emas: {", ".join(short)}', status=409)
+
+    for product_id, order_item in order_items.items():
+        if remaining.get(product_id) is not None:
+            remaining[product_id] -= order_item.quantity
+
+
+def _write_chunk(chunk, held_token):
+    """Bir chunk buyurtmani bitta tranzaksiyada yozish"""
+    OrderProduct = Order.products.through
+    quantities = {}
+    # ID'lar tranzaksiyadan oldin - chunk rad etilsa blok hisoblagichi qaytmaydi
+    order_ids = next_order_ids(len(chunk))
+
+    with transaction.atomic():
+        orders = Order.objects.bulk_create([
+            Order(order_id=order_id, **fields)
+            for order_id, (_, fields, _) in zip(order_ids, chunk)
+        ])
+
+        items = []
+        links = []
+        for order, (_, _, order_items) in zip(orders, chunk):
+            for product_id, order_item in order_items.items():
+                order_item.order = order
+                items.append(order_item)
+                links.append(OrderProduct(order_id=order.pk, product_id=product_id))
+                quantities[product_id] = quantities.get(product_id, 0) + order_item.quantity
+
+        OrderItem.objects.bulk_create(items)
+        OrderProduct.objects.bulk_create(links)
+
+        if held_token:
+            OutboxEvent.objects.bulk_create([
+                build_order_created_event(order, held_token) for order in orders
+            ])
+
+        reserve_stock(quantities)
+
+    return len(orders)
+
+
+def _flush_chunk(chunk, held_token, result):
+    """
+    Chunk'ni yozish; parallel checkout qoldiqni tugatib qo'ysa yoki DB xatosi
+    bo'lsa faqat shu chunk rad etiladi (tranzaksiyasi rollback) - import davom etadi
+    """
+    try:
+        result.imported += _write_chunk(chunk, held_token)
+    except CheckoutError as e:
+        for line_no, _, _ in chunk:
+            result.add_error(line_no, e.message)
+    except DatabaseError as e:
+        for line_no, _, _ in chunk:
+            result.add_error(line_no, f'Bazaga yozib bo\'lmadi: {e}')
+
+
+def import_orders(stream, fmt='csv', chunk_size=DEFAULT_CHUNK_SIZE, notify=True):
+    """
+    Oqimdan buyurtmalarni import qilish. Xotira sarfi chunk_size bilan
+    chegaralangan - fayl hajmiga bog'liq emas.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Noma'lum format: {fmt}")
+
+    result = ImportResult()
+    started = time.monotonic()
+    prices = get_price_index()
+    remaining = load_stock()
+    held_token = uuid.uuid4().hex if notify else None
+
+    chunk = []
+    try:
+        for line_no, data in iter_rows(stream, fmt):
+            result.rows += 1
+            if data is None:
+                result.add_error(line_no, 'Noto\'g\'ri JSON format')
+                continue
+
+            try:
+                data, lines = validate_order_data(data)
+                total_price, order_items = build_order_items(lines, prices)
+                _take_stock(remaining, order_items)
+            except CheckoutError as e:
+                result.add_error(line_no, e.message)
+                continue
+
+            chunk.append((line_no, order_fields(data, total_price), order_items))
+            if len(chunk) >= chunk_size:
+                _flush_chunk(chunk, held_token, result)
+                chunk = []
+
+        if chunk:
+            _flush_chunk(chunk, held_token, result)
+    finally:
+        # Kuryer xabarlari - bitta paket bo'lib navbatga (import yarmida to'xtasa ham
+        # yozilgan chunk'lar hodisalari 'held' da qolib ketmasin)
+        if held_token:
+            release_held(held_token)
+
+    result.elapsed = time.monotonic() - started
+    return result
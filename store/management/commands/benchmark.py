@@ -0,0 +1,48 @@
+# store/management/commands/benchmark.py
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Mikrobenchmark\'larni ishga tushirish (store/benchmarks.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names',
+            nargs='*',
+            help='Benchmark nomlari (standart: hammasi)'
+        )
+        parser.add_argument(
+            '--items',
+            type=int,
+            default=10,
+            help='Savatdagi mahsulotlar soni'
+        )
+        parser.add_argument(
+            '--number',
+            type=int,
+            default=10000,
+            help='Bitta o\'lchovdagi iteratsiyalar soni'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='O\'lchovlar soni (eng yaxshisi olinadi)'
+        )
+
+    def handle(self, *args, **options):
+        from store.benchmarks import BENCHMARKS
+
+        names = options['names'] or list(BENCHMARKS)
+        unknown = [name for name in names if name not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f"Noma'lum benchmark: {', '.join(unknown)}. Mavjud: {', '.join(BENCHMARKS)}")
+
+        number = options['number']
+        for name in names:
+            label, func = BENCHMARKS[name](options['items'])
+            best = min(timeit.repeat(func, number=number, repeat=options['repeat']))
+            per_call = best / number * 1e6
+            self.stdout.write(f'{name:<20} {per_call:9.2f} µs/so\'rov  ({label})')
@@ -0,0 +1,66 @@
+# store/management/commands/bot_metrics.py
+import json
+import os
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Ishlayotgan bot (runbot) handler\'lari va Bot API ko\'rsatkichlari: p50/p95/p99'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default=f"http://127.0.0.1:{os.getenv('PORT', 8081)}/bot/metrics/",
+            help='runbot ko\'rsatkichlar manzili (standart: http://127.0.0.1:$PORT/bot/metrics/)'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Xom JSON chiqarish'
+        )
+
+    def handle(self, *args, **options):
+        request = urllib.request.Request(options['url'])
+        if settings.BOT_METRICS_TOKEN:
+            request.add_header('Authorization', f'Bearer {settings.BOT_METRICS_TOKEN}')
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                metrics = json.load(response)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Ko\'rsatkichlarni olib bo\'lmadi ({options["url"]}): {e}')
+
+        if options['json']:
+            self.stdout.write(json.dumps(metrics, indent=2, ensure_ascii=False))
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Handler\'lar (ms: p50 / p95 / p99)'))
+        columns = ('handler', 'soni', 'xato', 'vaqt', 'DB', "so'rov", 'Bot API')
+        self.stdout.write('{:<40} {:>6} {:>5}  {:>20}  {:>20}  {:>12}  {:>20}'.format(*columns))
+        for key, stats in metrics.get('handlers', {}).items():
+            self.stdout.write(
+                f"{key:<40} {stats['calls']:>6} {stats['errors']:>5}  "
+                f"{self.format(stats['wall_ms']):>20}  {self.format(stats['db_ms']):>20}  "
+                f"{self.format(stats['queries']):>12}  {self.format(stats['api_ms']):>20}"
+            )
+
+        self.stdout.write('')
+        self.stdout.write(self.style.MIGRATE_HEADING('Bot API (ms: p50 / p95 / p99)'))
+        for method, stats in metrics.get('api', {}).items():
+            self.stdout.write(
+                f"{method:<40} {stats['calls']:>6} {stats['errors']:>5}  {self.format(stats['latency_ms']):>20}"
+            )
+
+        updates = metrics.get('updates')
+        if updates:
+            self.stdout.write('')
+            self.stdout.write(
+                f"Navbat: {updates['depth']} ta, kechikish p50/p95: "
+                f"{updates['lag_p50_ms']}/{updates['lag_p95_ms']} ms, rad etilgan: {updates['rejected']}"
+            )
+
+    @staticmethod
+    def format(summary):
+        return f"{summary['p50']:g} / {summary['p95']:g} / {summary['p99']:g}"
@@ -0,0 +1,61 @@
+# store/management/commands/import_orders.py
+import sys
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Telefon/ulgurji buyurtmalarni CSV yoki JSONL fayldan import qilish'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            type=str,
+            help='Fayl yo\'li (stdin uchun "-")'
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='Fayl formati (standart: kengaytmadan aniqlanadi)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Bitta tranzaksiyadagi buyurtmalar soni'
+        )
+        parser.add_argument(
+            '--no-notify',
+            action='store_true',
+            help='Kuryerlarga xabar yubormaslik'
+        )
+
+    def handle(self, *args, **options):
+        from store.importers import detect_format, import_orders
+
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path == '-' else detect_format(path))
+
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        except OSError as e:
+            raise CommandError(f'Faylni ochib bo\'lmadi: {e}')
+
+        try:
+            result = import_orders(
+                stream,
+                fmt=fmt,
+                chunk_size=options['chunk_size'],
+                notify=not options['no_notify'],
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for line_no, message in result.errors:
+            self.stdout.write(self.style.WARNING(f'  {line_no}-qator: {message}'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {result.imported}/{result.rows} ta buyurtma import qilindi '
+            f'({result.failed} ta xato) - {result.elapsed:.2f} s, '
+            f'{result.rows_per_second:.0f} qator/s'
+        ))
@@ -0,0 +1,47 @@
+# store/management/commands/process_outbox.py
+import asyncio
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Outbox hodisalarini (yangi buyurtma xabarlari) paketlab yuborish'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Bitta paketdagi hodisalar soni (standart: OUTBOX_BATCH_SIZE)'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Navbat bo\'sh bo\'lganda kutish (soniya)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Navbatni bir marta bo\'shatib chiqish'
+        )
+
+    def handle(self, *args, **options):
+        asyncio.run(self.async_handle(options))
+
+    async def async_handle(self, options):
+        from store.outbox import BATCH_SIZE, drain_once, drain_forever
+
+        batch_size = options['batch_size'] or BATCH_SIZE
+
+        if options['once']:
+            total = 0
+            while True:
+                processed = await drain_once(batch_size)
+                total += processed
+                if processed < batch_size:
+                    break
+            self.stdout.write(self.style.SUCCESS(f'✅ {total} ta hodisa qayta ishlandi'))
+            return
+
+        self.stdout.write(f'🔄 Outbox drain ishga tushdi (batch={batch_size})')
+        await drain_forever(batch_size, options['interval'])
@@ -0,0 +1,12 @@
+# store/management/commands/purge_bot_states.py
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Eskirgan (tashlab ketilgan) bot FSM holatlarini o\'chirish'
+
+    def handle(self, *args, **options):
+        from bot.storage import purge_expired
+
+        deleted = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'✅ {deleted} ta holat o\'chirildi'))
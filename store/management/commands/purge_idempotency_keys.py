@@ -0,0 +1,20 @@
+# store/management/commands/purge_idempotency_keys.py
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Muddati o\'tgan Idempotency-Key yozuvlarini paketlab o\'chirish'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Bitta DELETE dagi yozuvlar soni'
+        )
+
+    def handle(self, *args, **options):
+        from store.idempotency import purge_expired
+
+        deleted = purge_expired(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {deleted} ta kalit o\'chirildi'))
@@ -0,0 +1,56 @@
+# store/management/commands/recompute_courier_counters.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+
+class Command(BaseCommand):
+    help = 'Kuryer hisoblagichlarini (jami/yetkazilgan/bekor qilingan) buyurtmalardan qayta hisoblash'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Bitta bulk_update dagi kuryerlar soni'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Faqat farqlarni ko\'rsatish, yozmaslik'
+        )
+
+    def handle(self, *args, **options):
+        from store.models import Courier
+        from store.versions import COURIERS, bump_version
+
+        fields = ['total_orders', 'completed_orders', 'cancelled_orders']
+        # Bitta agregat so'rov: har bir kuryer uchun haqiqiy qiymatlar
+        couriers = Courier.objects.only('id', *fields).annotate(
+            actual_total=Count('orders', filter=Q(orders__status__in=Courier.COUNTED_STATUSES)),
+            actual_completed=Count('orders', filter=Q(orders__status='delivered')),
+            actual_cancelled=Count('orders', filter=Q(orders__status='cancelled')),
+        )
+
+        drifted = []
+        for courier in couriers.iterator(chunk_size=options['batch_size']):
+            actual = (courier.actual_total, courier.actual_completed, courier.actual_cancelled)
+            if actual == (courier.total_orders, courier.completed_orders, courier.cancelled_orders):
+                continue
+            self.stdout.write(
+                f'{courier.pk}: {courier.total_orders}/{courier.completed_orders}/{courier.cancelled_orders}'
+                f' -> {actual[0]}/{actual[1]}/{actual[2]}'
+            )
+            courier.total_orders, courier.completed_orders, courier.cancelled_orders = actual
+            drifted.append(courier)
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(drifted)} ta kuryer hisoblagichi farq qiladi (yozilmadi)')
+            return
+
+        with transaction.atomic():
+            Courier.objects.bulk_update(drifted, fields, batch_size=options['batch_size'])
+            if drifted:
+                # bulk_update signal yubormaydi - runbot'dagi kuryer keshi versiya orqali tozalanadi
+                transaction.on_commit(lambda: bump_version(COURIERS))
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(drifted)} ta kuryer hisoblagichi tuzatildi'))
@@ -0,0 +1,69 @@
+# store/management/commands/runbot.py
+import asyncio
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Kuryer botini alohida jarayonda ishga tushirish (polling yoki webhook) + outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode',
+            choices=['polling', 'webhook'],
+            default='polling',
+            help='Update\'larni olish usuli (standart: polling)'
+        )
+        parser.add_argument(
+            '--host',
+            default='0.0.0.0',
+            help='HTTP server manzili (webhook va ko\'rsatkichlar)'
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=int(os.getenv('PORT', 8081)),
+            help='HTTP server porti (standart: $PORT yoki 8081)'
+        )
+        parser.add_argument(
+            '--path',
+            default=None,
+            help='Webhook yo\'li (standart: /bot/webhook/)'
+        )
+        parser.add_argument(
+            '--url',
+            default=None,
+            help='Telegram\'ga o\'rnatiladigan to\'liq webhook URL (berilmasa o\'zgartirilmaydi)'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Outbox navbati bo\'sh bo\'lganda kutish (soniya)'
+        )
+
+    def handle(self, *args, **options):
+        from bot.runtime import WEBHOOK_PATH, METRICS_PATH, run_bot
+
+        path = options['path'] or WEBHOOK_PATH
+        if options['mode'] == 'polling':
+            self.stdout.write('🔄 Bot polling rejimida ishga tushdi')
+        else:
+            self.stdout.write(f"🌐 Bot webhook rejimida ishga tushdi (:{options['port']}{path})")
+        self.stdout.write(f"📊 Ko'rsatkichlar: :{options['port']}{METRICS_PATH}")
+
+        try:
+            asyncio.run(run_bot(
+                options['mode'],
+                options['host'],
+                options['port'],
+                path=path,
+                url=options['url'],
+                secret_token=settings.BOT_WEBHOOK_SECRET or None,
+                drain_interval=options['interval'],
+            ))
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS('✅ Bot to\'xtatildi'))
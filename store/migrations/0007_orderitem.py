@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:37
+
+from decimal import Decimal, ROUND_HALF_UP
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_order_items(apps, schema_editor):
+    """
+    Mavjud buyurtmalar uchun M2M bog'lanishlardan qatorlar yaratish.
+    Eski buyurtmalarda miqdor saqlanmagan: bitta mahsulotli buyurtmada
+    miqdor umumiy summadan tiklanadi, aks holda 1 deb olinadi.
+    """
+    Order = apps.get_model('store', 'Order')
+    OrderItem = apps.get_model('store', 'OrderItem')
+    OrderProduct = Order.products.through
+
+    product_counts = dict(
+        OrderProduct.objects.values('order_id')
+        .annotate(n=Count('id'))
+        .values_list('order_id', 'n')
+    )
+
+    links = (
+        OrderProduct.objects
+        .select_related('order', 'product')
+        .order_by('order_id', 'product_id')
+    )
+
+    batch = []
+    for link in links.iterator(chunk_size=2000):
+        product = link.product
+        unit_price = product.price
+        quantity = Decimal('1')
+        if product_counts.get(link.order_id) == 1 and unit_price:
+            quantity = (link.order.total_price / unit_price).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+        batch.append(OrderItem(
+            order_id=link.order_id,
+            product_id=product.pk,
+            product_name=product.name,
+            quantity=quantity,
+            unit_price=unit_price,
+            line_total=(unit_price * quantity).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
+        ))
+        if len(batch) >= 2000:
+            OrderItem.objects.bulk_create(batch)
+            batch = []
+
+    if batch:
+        OrderItem.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_product_old_price_alter_category_description_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_name', models.CharField(max_length=200, verbose_name='Mahsulot nomi')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Miqdor')),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Birlik narxi')),
+                ('line_total', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Qator summasi')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='store.order', verbose_name='Buyurtma')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_items', to='store.product', verbose_name='Mahsulot')),
+            ],
+            options={
+                'verbose_name': 'Buyurtma qatori',
+                'verbose_name_plural': 'Buyurtma qatorlari',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['product', 'quantity', 'line_total'], name='store_item_product_sales_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_order_items, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_orderitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('order_created', 'Yangi buyurtma')], max_length=50, verbose_name='Hodisa turi')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name="Ma'lumot")),
+                ('status', models.CharField(choices=[('pending', 'Kutilmoqda'), ('processing', 'Yuborilmoqda'), ('delivered', 'Yetkazilgan'), ('failed', 'Xatolik')], default='pending', max_length=20, verbose_name='Holat')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Urinishlar')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Navbatdagi urinish')),
+                ('claim_token', models.CharField(blank=True, db_index=True, max_length=32)),
+                ('last_error', models.TextField(blank=True, verbose_name='Oxirgi xato')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan')),
+                ('delivered_at', models.DateTimeField(blank=True, null=True, verbose_name='Yetkazilgan')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbox_events', to='store.order', verbose_name='Buyurtma')),
+            ],
+            options={
+                'verbose_name': 'Outbox hodisasi',
+                'verbose_name_plural': 'Outbox hodisalari',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='store_outbox_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_outboxevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True, verbose_name='Kalit')),
+                ('request_hash', models.CharField(max_length=64, verbose_name="So'rov xeshi")),
+                ('status_code', models.PositiveSmallIntegerField(default=200, verbose_name='HTTP status')),
+                ('response_body', models.JSONField(default=dict, verbose_name='Javob')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Amal qilish muddati')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='store.order', verbose_name='Buyurtma')),
+            ],
+            options={
+                'verbose_name': 'Idempotency kaliti',
+                'verbose_name_plural': 'Idempotency kalitlari',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outboxevent',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Kutilmoqda'), ('held', 'Ushlab turilgan'), ('processing', 'Yuborilmoqda'), ('delivered', 'Yetkazilgan'), ('failed', 'Xatolik')], default='pending', max_length=20, verbose_name='Holat'),
+        ),
+    ]
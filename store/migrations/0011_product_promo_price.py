@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:45
+
+from django.db import migrations, models
+
+
+def move_promo_price_out_of_stock(apps, schema_editor):
+    """
+    'stock' ustuni shu paytgacha aksiya narxi sifatida ishlatilgan.
+    Qiymatlar promo_price ga ko'chiriladi, stock esa bo'shatiladi
+    (ombor qoldig'i hisobga olinmaydi - admin keyin to'ldiradi).
+    """
+    Product = apps.get_model('store', 'Product')
+    Product.objects.filter(stock__isnull=False).update(promo_price=models.F('stock'))
+    Product.objects.update(stock=None)
+
+
+def restore_promo_price_into_stock(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    Product.objects.update(stock=None)
+    Product.objects.filter(promo_price__isnull=False).update(stock=models.F('promo_price'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_outboxevent_held_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='promo_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Aksiya narxi'),
+        ),
+        migrations.RunPython(move_promo_price_out_of_stock, restore_promo_price_into_stock),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Alohida migratsiya: ma'lumot ko'chirilgandan keyin ustun turi o'zgartiriladi"""
+
+    dependencies = [
+        ('store', '0011_product_promo_price'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='stock',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text="Bo'sh qoldirilsa - qoldiq hisobga olinmaydi", max_digits=10, null=True, verbose_name='Ombordagi miqdor (kg)'),
+        ),
+    ]
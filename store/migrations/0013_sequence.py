@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:49
+
+from django.db import migrations, models
+
+
+def create_order_id_sequence(apps, schema_editor):
+    """PostgreSQL: buyurtma ID bloklari uchun tranzaksiyadan mustaqil sequence"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE SEQUENCE IF NOT EXISTS store_order_id_block START 1')
+
+
+def drop_order_id_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP SEQUENCE IF EXISTS store_order_id_block')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_alter_product_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Nomi')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Qiymat')),
+            ],
+            options={
+                'verbose_name': 'Hisoblagich',
+                'verbose_name_plural': 'Hisoblagichlar',
+            },
+        ),
+        migrations.RunPython(create_order_id_sequence, drop_order_id_sequence),
+    ]
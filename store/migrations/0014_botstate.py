@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BotState',
+            fields=[
+                ('key', models.CharField(max_length=200, primary_key=True, serialize=False, verbose_name='Kalit')),
+                ('state', models.CharField(blank=True, max_length=200, null=True, verbose_name='Holat')),
+                ('data', models.JSONField(blank=True, default=dict, verbose_name="Ma'lumot")),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='Yangilangan')),
+            ],
+            options={
+                'verbose_name': 'Bot holati',
+                'verbose_name_plural': 'Bot holatlari',
+            },
+        ),
+    ]
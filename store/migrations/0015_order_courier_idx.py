@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_botstate'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['courier', 'status', 'created_at'], name='store_order_courier_idx'),
+        ),
+    ]
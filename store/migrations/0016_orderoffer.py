@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0015_order_courier_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderOffer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chat_id', models.BigIntegerField(verbose_name='Chat ID')),
+                ('message_id', models.BigIntegerField(verbose_name='Xabar ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Yuborilgan')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offers', to='store.order', verbose_name='Buyurtma')),
+            ],
+            options={
+                'verbose_name': 'Buyurtma taklifi',
+                'verbose_name_plural': 'Buyurtma takliflari',
+            },
+        ),
+    ]
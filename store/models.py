@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 import secrets
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 # ==================== BASE MODEL ====================
 class BaseModel(models.Model):
@@ -36,7 +38,12 @@ class Product(BaseModel):
     description = models.TextField(verbose_name='Tavsif', blank=True, null=True)
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Narxi')
     old_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, verbose_name='Eski narxi (Agar bo\'lsa)')
-    stock = models.IntegerField(blank=True, null=True, verbose_name='Ombordagi miqdor')
+    promo_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, verbose_name='Aksiya narxi')
+    stock = models.DecimalField(
+        max_digits=10, decimal_places=2, blank=True, null=True,
+        verbose_name='Ombordagi miqdor (kg)',
+        help_text='Bo\'sh qoldirilsa - qoldiq hisobga olinmaydi'
+    )
     image = models.ImageField(upload_to='store/products/', blank=True, null=True, verbose_name='Rasm')
     
     class Meta:
@@ -50,6 +57,11 @@ class Product(BaseModel):
             return round(discount, 2)
         return 0
 
+    def get_effective_price(self):
+        """Sotuv narxi (aksiya narxini e'tiborga olgan holda), Decimal"""
+        if self.promo_price and self.get_price_action_percent() > 0:
+            return self.promo_price
+        return self.price
 
     def __str__(self):
         return self.name
@@ -124,6 +136,34 @@ class Courier(models.Model):
             return 0
         return round((self.completed_orders / self.total_orders) * 100, 1)
 
+    # total_orders: qabul qilingan yoki undan keyingi statusdagi buyurtmalar
+    COUNTED_STATUSES = ('accepted', 'delivering', 'delivered', 'cancelled')
+    # Buyurtma shu statusga o'tganda qo'shimcha oshadigan hisoblagich
+    STATUS_COUNTERS = {
+        'delivered': 'completed_orders',
+        'cancelled': 'cancelled_orders',
+    }
+    
+    @classmethod
+    def count_order_status(cls, courier_id, old_status, new_status):
+        """
+        Buyurtma old_status -> new_status o'tdi (old_status=None - kuryerga endi
+        biriktirildi): hisoblagichlarni F() bilan oshirish - chaqiruvchi
+        tranzaksiyasida, bitta UPDATE, signal ishlamaydi. Orqaga qaytishlar
+        kamaytirilmaydi - recompute_courier_counters tuzatadi.
+        """
+        if courier_id is None or old_status == new_status:
+            return 0
+        
+        fields = []
+        if new_status in cls.COUNTED_STATUSES and old_status not in cls.COUNTED_STATUSES:
+            fields.append('total_orders')
+        if new_status in cls.STATUS_COUNTERS:
+            fields.append(cls.STATUS_COUNTERS[new_status])
+        if not fields:
+            return 0
+        return cls.objects.filter(pk=courier_id).update(**{field: F(field) + 1 for field in fields})
+
 
 # ==================== COURIER TOKEN ====================
 class CourierToken(models.Model):
@@ -216,17 +256,180 @@ class Order(models.Model):
     delivering_at = models.DateTimeField('Yo\'lga chiqdi', null=True, blank=True)
     delivered_at = models.DateTimeField('Yetkazilgan', null=True, blank=True)
     cancelled_at = models.DateTimeField('Bekor qilingan', null=True, blank=True)
+    # Xabar matni keshi kaliti (bot/notifications.py) - har bir save() da yangilanadi
+    updated_at = models.DateTimeField('Yangilangan', auto_now=True)
     
     class Meta:
         verbose_name = "Buyurtma"
         verbose_name_plural = "Buyurtmalar"
         ordering = ["-created_at"]
+        indexes = [
+            # Kuryer buyurtmalari: faol buyurtmalar (status) va statistika (created_at)
+            models.Index(fields=['courier', 'status', 'created_at'], name='store_order_courier_idx'),
+        ]
+
+    @staticmethod
+    def generate_order_id():
+        """Yangi buyurtma ID (bulk_create uchun ham - save() chaqirilmaydi)"""
+        from .order_ids import next_order_id
+        return next_order_id()
 
     def save(self, *args, **kwargs):
+        # Zaxira yo'l: ID shu yerda olinsa chaqiruvchi tranzaksiyasi ichida bo'ladi -
+        # PostgreSQL sequence'da xavfsiz, boshqa bazalarda rollback blokni qaytaradi.
+        # Checkout, import va admin ID'ni tranzaksiyadan oldin beradi (order_ids.py)
         if not self.order_id:
-            import uuid
-            self.order_id = str(uuid.uuid4()).replace('-', '').upper()[:8]
+            self.order_id = self.generate_order_id()
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"#{self.order_id} - {self.full_name}"
\ No newline at end of file
+        return f"#{self.order_id} - {self.full_name}"
+
+# ==================== ORDER ITEM ====================
+class OrderItem(models.Model):
+    """Buyurtma qatori - miqdor va narx buyurtma paytidagi holatda saqlanadi"""
+    
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items', verbose_name="Buyurtma")
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='order_items',
+        verbose_name="Mahsulot"
+    )
+    product_name = models.CharField(max_length=200, verbose_name="Mahsulot nomi")
+    quantity = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Miqdor")
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Birlik narxi")
+    line_total = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Qator summasi")
+    
+    class Meta:
+        verbose_name = "Buyurtma qatori"
+        verbose_name_plural = "Buyurtma qatorlari"
+        ordering = ['id']
+        indexes = [
+            # Mahsulot bo'yicha daromad/sotilgan miqdor agregatlari uchun
+            models.Index(fields=['product', 'quantity', 'line_total'], name='store_item_product_sales_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_name} x {self.quantity}"
+
+
+# ==================== OUTBOX EVENT ====================
+class OutboxEvent(models.Model):
+    """Tranzaksion outbox - buyurtma hodisalari buyurtma bilan bitta tranzaksiyada yoziladi"""
+    
+    EVENT_TYPES = [
+        ('order_created', 'Yangi buyurtma'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Kutilmoqda'),
+        ('held', 'Ushlab turilgan'),          # Import yakunlanishini kutmoqda
+        ('processing', 'Yuborilmoqda'),
+        ('delivered', 'Yetkazilgan'),
+        ('failed', 'Xatolik'),
+    ]
+    
+    event_type = models.CharField('Hodisa turi', max_length=50, choices=EVENT_TYPES)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='outbox_events', verbose_name="Buyurtma")
+    payload = models.JSONField('Ma\'lumot', default=dict, blank=True)
+    status = models.CharField('Holat', max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField('Urinishlar', default=0)
+    # pending: keyingi urinish vaqti, processing: band qilish (lease) muddati
+    available_at = models.DateTimeField('Navbatdagi urinish', default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True, db_index=True)
+    last_error = models.TextField('Oxirgi xato', blank=True)
+    created_at = models.DateTimeField('Yaratilgan', auto_now_add=True)
+    delivered_at = models.DateTimeField('Yetkazilgan', null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Outbox hodisasi"
+        verbose_name_plural = "Outbox hodisalari"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='store_outbox_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_event_type_display()} #{self.order_id} ({self.get_status_display()})"
+
+
+# ==================== IDEMPOTENCY KEY ====================
+class IdempotencyKey(models.Model):
+    """Takroriy checkout so'rovlaridan himoya - birinchi javob saqlanadi va qaytariladi"""
+    
+    key = models.CharField('Kalit', max_length=100, unique=True)
+    request_hash = models.CharField('So\'rov xeshi', max_length=64)
+    status_code = models.PositiveSmallIntegerField('HTTP status', default=200)
+    response_body = models.JSONField('Javob', default=dict)
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Buyurtma")
+    created_at = models.DateTimeField('Yaratilgan', auto_now_add=True)
+    expires_at = models.DateTimeField('Amal qilish muddati', db_index=True)
+    
+    class Meta:
+        verbose_name = "Idempotency kaliti"
+        verbose_name_plural = "Idempotency kalitlari"
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return self.key
+
+# ==================== SEQUENCE ====================
+class SequenceManager(models.Manager):
+    def next_value(self, name):
+        """Hisoblagichni bittaga oshirib yangi qiymatni qaytarish (chaqiruvchi tranzaksiyasida)"""
+        with transaction.atomic():
+            if not self.filter(name=name).update(value=F('value') + 1):
+                self.get_or_create(name=name)
+                self.filter(name=name).update(value=F('value') + 1)
+            return self.filter(name=name).values_list('value', flat=True).get()
+
+
+class Sequence(models.Model):
+    """Nomlangan hisoblagich - PostgreSQL sequence bo'lmagan bazalar uchun"""
+    
+    name = models.CharField('Nomi', max_length=50, primary_key=True)
+    value = models.BigIntegerField('Qiymat', default=0)
+    
+    objects = SequenceManager()
+    
+    class Meta:
+        verbose_name = "Hisoblagich"
+        verbose_name_plural = "Hisoblagichlar"
+    
+    def __str__(self):
+        return f"{self.name}={self.value}"
+
+# ==================== BOT STATE ====================
+class BotState(models.Model):
+    """Telegram bot FSM holati - barcha worker'lar uchun umumiy, restartdan keyin ham saqlanadi"""
+    
+    key = models.CharField('Kalit', max_length=200, primary_key=True)
+    state = models.CharField('Holat', max_length=200, blank=True, null=True)
+    data = models.JSONField('Ma\'lumot', default=dict, blank=True)
+    updated_at = models.DateTimeField('Yangilangan', auto_now=True, db_index=True)
+    
+    class Meta:
+        verbose_name = "Bot holati"
+        verbose_name_plural = "Bot holatlari"
+    
+    def __str__(self):
+        return f"{self.key}: {self.state or '-'}"
+
+# ==================== ORDER OFFER ====================
+class OrderOffer(models.Model):
+    """Kuryerga yuborilgan yangi buyurtma xabari - qabul qilingach boshqa kuryerlarnikidan tugma olib tashlanadi"""
+    
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='offers', verbose_name="Buyurtma")
+    chat_id = models.BigIntegerField('Chat ID')
+    message_id = models.BigIntegerField('Xabar ID')
+    created_at = models.DateTimeField('Yuborilgan', auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Buyurtma taklifi"
+        verbose_name_plural = "Buyurtma takliflari"
+    
+    def __str__(self):
+        return f"#{self.order_id} -> {self.chat_id}"
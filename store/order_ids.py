@@ -0,0 +1,91 @@
+# store/order_ids.py
+"""
+To'qnashmaydigan qisqa buyurtma ID'lari.
+
+Har bir jarayon bazadan BLOCK_SIZE ta raqamli blok band qiladi va ID'larni
+xotiradan beradi - BLOCK_SIZE ta buyurtmaga bitta so'rov, ID insert'dan
+oldin ma'lum. PostgreSQL'da blok raqami sequence'dan olinadi (nextval
+tranzaksiyadan tashqarida ishlaydi - rollback blokni qaytarmaydi), boshqa
+bazalarda Sequence jadvalidan (dev/test uchun). Sequence jadvali chaqiruvchi
+tranzaksiyasi bilan birga rollback bo'ladi, shuning uchun checkout va import
+ID'larni transaction.atomic() dan oldin oladi - aks holda bekor qilingan
+buyurtmadan keyin blok boshqa jarayonga qayta berilardi.
+
+Raqam Crockford base32 bilan 7 belgiga kodlanadi: eski 8 belgili hex
+ID'lar bilan to'qnashmaydi, '_' yo'q - accept_<id> callback formatiga mos.
+"""
+import os
+import threading
+
+from django.db import connection
+
+from .models import Sequence
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+ID_LENGTH = 7
+# O'zgartirilsa eski bloklar bilan kesishadi - sequence'ni ham surish kerak
+BLOCK_SIZE = 100
+SEQUENCE_NAME = 'store_order_id_block'
+
+
+def encode(number):
+    """Butun sonni Crockford base32 ko'rinishiga o'tkazish"""
+    chars = []
+    while number:
+        number, remainder = divmod(number, 32)
+        chars.append(ALPHABET[remainder])
+    return ''.join(reversed(chars)).rjust(ID_LENGTH, '0')
+
+
+def allocate_block():
+    """Keyingi blok raqamini band qilish"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(%s)', [SEQUENCE_NAME])
+            return cursor.fetchone()[0]
+    return Sequence.objects.next_value(SEQUENCE_NAME)
+
+
+class BlockAllocator:
+    """Jarayon ichidagi blok: ID'lar lock ostida ketma-ket beriladi"""
+
+    def __init__(self, block_size=BLOCK_SIZE):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._pid = None
+        self._next = 0
+        self._end = 0
+
+    def next_number(self):
+        with self._lock:
+            # fork'dan keyin ota jarayon bloki bolalarga bo'linib ketmasin
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._next = self._end = 0
+
+            if self._next >= self._end:
+                self._next = allocate_block() * self.block_size
+                self._end = self._next + self.block_size
+
+            number = self._next
+            self._next += 1
+            return number
+
+    def next_id(self):
+        return encode(self.next_number())
+
+    def next_ids(self, count):
+        return [self.next_id() for _ in range(count)]
+
+
+allocator = BlockAllocator()
+
+
+def next_order_id():
+    """Yangi buyurtma ID"""
+    return allocator.next_id()
+
+
+def next_order_ids(count):
+    """count ta buyurtma ID (import chunk'i uchun - tranzaksiyadan oldin)"""
+    return allocator.next_ids(count)
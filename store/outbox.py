@@ -0,0 +1,179 @@
+# store/outbox.py
+"""
+Tranzaksion outbox: buyurtma hodisalarini Telegram'ga yetkazish.
+
+Hodisa buyurtma bilan bitta tranzaksiyada yoziladi (signals.py),
+keyin drain loop (runbot / process_outbox buyrug'i yoki BOT_EMBEDDED
+rejimida web worker'dagi background loop) ularni paketlab oladi, yuboradi va natijani belgilaydi.
+Muvaffaqiyatsiz hodisalar exponential backoff bilan qayta uriniladi.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'OUTBOX_BATCH_SIZE', 50)
+MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 10)
+LEASE_SECONDS = getattr(settings, 'OUTBOX_LEASE_SECONDS', 60)
+MAX_BACKOFF_SECONDS = 15 * 60
+
+
+def enqueue_order_created(order):
+    """Yangi buyurtma hodisasini yozish (chaqiruvchining tranzaksiyasi ichida)"""
+    return OutboxEvent.objects.create(
+        event_type='order_created',
+        order=order,
+        payload={'order_id': order.order_id},
+    )
+
+
+def build_order_created_event(order, held_token=None):
+    """
+    bulk_create uchun hodisa obyekti (signal ishlamaydigan import yo'li).
+    held_token berilsa hodisa release_held() chaqirilguncha yuborilmaydi.
+    """
+    return OutboxEvent(
+        event_type='order_created',
+        order=order,
+        payload={'order_id': order.order_id},
+        status='held' if held_token else 'pending',
+        claim_token=held_token or '',
+    )
+
+
+def release_held(held_token):
+    """Ushlab turilgan hodisalarni bitta UPDATE bilan navbatga chiqarish"""
+    return OutboxEvent.objects.filter(status='held', claim_token=held_token).update(
+        status='pending',
+        claim_token='',
+        available_at=timezone.now(),
+    )
+
+
+def claim_batch(batch_size=BATCH_SIZE):
+    """
+    Navbatdagi hodisalarni band qilish.
+    Boshqa jarayonlar bir vaqtda drain qilsa ham har bir hodisa faqat
+    bitta claim_token'ga tegadi; lease muddati o'tgan 'processing'
+    hodisalar (masalan worker o'chib qolganda) qayta olinadi.
+    """
+    close_old_connections()
+    now = timezone.now()
+    token = uuid.uuid4().hex
+
+    with transaction.atomic():
+        due = (
+            OutboxEvent.objects
+            .select_for_update(skip_locked=True)
+            .filter(status__in=['pending', 'processing'], available_at__lte=now)
+            .order_by('available_at')
+        )
+        ids = list(due.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+
+        OutboxEvent.objects.filter(
+            id__in=ids,
+            status__in=['pending', 'processing'],
+            available_at__lte=now,
+        ).update(
+            status='processing',
+            claim_token=token,
+            available_at=now + timedelta(seconds=LEASE_SECONDS),
+            attempts=F('attempts') + 1,
+        )
+
+    # Buyurtma va uning qatorlari xabar matni uchun oldindan - paket uchun 2 ta so'rov
+    return list(
+        OutboxEvent.objects
+        .filter(claim_token=token)
+        .select_related('order')
+        .prefetch_related('order__items')
+    )
+
+
+def mark_delivered(event_ids):
+    """Yetkazilgan hodisalarni bitta UPDATE bilan belgilash"""
+    if not event_ids:
+        return 0
+    return OutboxEvent.objects.filter(id__in=event_ids).update(
+        status='delivered',
+        delivered_at=timezone.now(),
+        claim_token='',
+        last_error='',
+    )
+
+
+def mark_failed(event, error):
+    """Xato: backoff bilan qayta navbatga qo'yish yoki 'failed' deb belgilash"""
+    if event.attempts >= MAX_ATTEMPTS:
+        status = 'failed'
+        available_at = timezone.now()
+    else:
+        status = 'pending'
+        delay = min(2 ** event.attempts, MAX_BACKOFF_SECONDS)
+        available_at = timezone.now() + timedelta(seconds=delay)
+
+    OutboxEvent.objects.filter(id=event.id, claim_token=event.claim_token).update(
+        status=status,
+        available_at=available_at,
+        claim_token='',
+        last_error=str(error)[:1000],
+    )
+    return status
+
+
+async def publish_event(event):
+    """Bitta hodisani yuborish"""
+    if event.event_type == 'order_created':
+        from bot.bot import notify_couriers_about_order
+        await notify_couriers_about_order(event.order)
+    else:
+        raise ValueError(f"Noma'lum hodisa turi: {event.event_type}")
+
+
+async def drain_once(batch_size=BATCH_SIZE):
+    """Bitta paketni band qilish, parallel yuborish va natijalarni yozish"""
+    events = await sync_to_async(claim_batch)(batch_size)
+    if not events:
+        return 0
+
+    results = await asyncio.gather(
+        *(publish_event(event) for event in events),
+        return_exceptions=True
+    )
+
+    delivered = []
+    for event, result in zip(events, results):
+        if isinstance(result, BaseException):
+            status = await sync_to_async(mark_failed)(event, result)
+            logger.error(f"❌ Outbox #{event.id} ({event.event_type}) xato, holat: {status}: {result}")
+        else:
+            delivered.append(event.id)
+
+    await sync_to_async(mark_delivered)(delivered)
+    logger.info(f"📨 Outbox: {len(delivered)}/{len(events)} ta hodisa yetkazildi")
+    return len(events)
+
+
+async def drain_forever(batch_size=BATCH_SIZE, interval=1.0):
+    """To'xtovsiz drain: navbat bo'sh bo'lsa interval kutiladi"""
+    while True:
+        try:
+            processed = await drain_once(batch_size)
+        except Exception as e:
+            logger.error(f"❌ Outbox drain xatosi: {e}", exc_info=True)
+            processed = 0
+
+        if processed < batch_size:
+            await asyncio.sleep(interval)
@@ -0,0 +1,116 @@
+# store/pricing.py
+"""
+Jarayon ichidagi narx jadvali: faol mahsulotlarning narxi, sotuv narxi va
+chegirmasi ixcham massivlarda (tiyinlarda, id bo'yicha tartiblangan).
+Katalog versiyasi o'zgargandagina qayta quriladi (versions.py) - narx
+so'rash bisect + massivdan o'qish, DB ga murojaatsiz.
+"""
+from array import array
+from bisect import bisect_left
+from decimal import Decimal
+from typing import NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import Product
+from .versions import CATALOG, VersionedSnapshot
+
+CHECK_INTERVAL = getattr(settings, 'PRICE_INDEX_CHECK_INTERVAL', 1.0)
+
+
+class PriceEntry(NamedTuple):
+    id: int
+    name: str
+    price: Decimal
+    effective_price: Decimal
+    discount: float
+
+
+def _cents(amount):
+    return int(amount * 100)
+
+
+def _amount(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+class PriceIndex:
+    """Mahsulot ID -> narx; mapping kabi .get(product_id) qo'llab-quvvatlanadi"""
+
+    __slots__ = ('ids', 'price_cents', 'effective_cents', 'discount_bp', 'names')
+
+    def __init__(self, products):
+        """products - id bo'yicha tartiblangan Product obyektlari"""
+        self.ids = array('q')
+        self.price_cents = array('q')
+        self.effective_cents = array('q')
+        self.discount_bp = array('l')
+        names = []
+        for product in products:
+            self.ids.append(product.id)
+            self.price_cents.append(_cents(product.price))
+            self.effective_cents.append(_cents(product.get_effective_price()))
+            # get_product_price shu paytgacha chegirmani faqat aksiya narxi bo'lsa ko'rsatgan
+            discount = product.get_price_action_percent() if product.promo_price else 0
+            self.discount_bp.append(int(discount * 100))
+            names.append(product.name)
+        self.names = tuple(names)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, product_id):
+        return self._position(product_id) is not None
+
+    def _position(self, product_id):
+        i = bisect_left(self.ids, product_id)
+        if i < len(self.ids) and self.ids[i] == product_id:
+            return i
+        return None
+
+    def get(self, product_id, default=None):
+        i = self._position(product_id)
+        if i is None:
+            return default
+        return PriceEntry(
+            id=product_id,
+            name=self.names[i],
+            price=_amount(self.price_cents[i]),
+            effective_price=_amount(self.effective_cents[i]),
+            discount=self.discount_bp[i] / 100,
+        )
+
+    def get_many(self, product_ids):
+        """{product_id: PriceEntry} - topilmaganlari qaytmaydi"""
+        entries = {}
+        for product_id in product_ids:
+            entry = self.get(product_id)
+            if entry is not None:
+                entries[product_id] = entry
+        return entries
+
+
+def build_price_index():
+    products = (
+        Product.objects
+        .filter(is_active=True)
+        .only('id', 'name', 'price', 'old_price', 'promo_price')
+        .order_by('id')
+    )
+    return PriceIndex(products.iterator(chunk_size=2000))
+
+
+price_snapshot = VersionedSnapshot(CATALOG, build_price_index, check_interval=CHECK_INTERVAL)
+
+
+def get_price_index():
+    """Joriy narx jadvali (kerak bo'lsa versiya tekshiriladi / qayta quriladi)"""
+    return price_snapshot.get()
+
+
+async def aget_price_index():
+    """Async view'lar uchun: jadval yangi bo'lsa thread hop'siz qaytariladi"""
+    if price_snapshot.is_fresh():
+        return price_snapshot.data
+    return await sync_to_async(price_snapshot.get)()
@@ -0,0 +1,253 @@
+# store/ratelimit.py
+"""
+Token bucket bilan so'rovlarni cheklash (checkout API va bot webhook).
+
+Har bir jarayonda mijoz (IP yoki Telegram user) uchun bucket xotirada
+saqlanadi - rad etish DB ga ham, view'ga ham tegmaydi. RATE_LIMIT_SHARED
+yoqilsa, lokal tekshiruvdan o'tgan so'rovlar umumiy cache (Redis/Memcached)
+dagi oyna hisoblagichi bilan ham tekshiriladi - limit barcha gunicorn
+worker'lari uchun birga ishlaydi.
+"""
+import functools
+import json
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+
+DEFAULT_LIMITS = {
+    # burst ta so'rov birdaniga, keyin soniyasiga rate ta
+    'checkout': {'rate': 0.2, 'burst': 5},
+    'webhook': {'rate': 5, 'burst': 30},
+}
+LIMITS = {**DEFAULT_LIMITS, **getattr(settings, 'RATE_LIMITS', {})}
+SHARED = getattr(settings, 'RATE_LIMIT_SHARED', False)
+CACHE_ALIAS = getattr(settings, 'RATE_LIMIT_CACHE', 'default')
+TRUSTED_PROXIES = getattr(settings, 'RATE_LIMIT_TRUSTED_PROXIES', 1)
+
+# Shuncha kalitdan oshsa to'lib bo'lgan bucket'lar tozalanadi
+MAX_BUCKETS = 10000
+
+TOO_MANY_REQUESTS = json.dumps({
+    'success': False,
+    'message': 'Juda ko\'p so\'rov. Birozdan keyin qayta urinib ko\'ring.',
+}).encode()
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens, updated):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    """Jarayon ichidagi bucket'lar + ixtiyoriy umumiy cache hisoblagichi"""
+
+    def __init__(self, limits, shared=False, cache_alias='default'):
+        self.limits = limits
+        self.shared = shared
+        self.cache_alias = cache_alias
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: {'allowed': 0, 'rejected': 0, 'rejected_shared': 0})
+
+    def check_local(self, scope, key):
+        """Lokal bucket: (ruxsat, retry_after soniya)"""
+        limit = self.limits[scope]
+        rate, burst = limit['rate'], limit['burst']
+        now = time.monotonic()
+
+        with self._lock:
+            bucket = self._buckets.get((scope, key))
+            if bucket is None:
+                if len(self._buckets) >= MAX_BUCKETS:
+                    self._prune(now)
+                bucket = self._buckets[(scope, key)] = TokenBucket(burst, now)
+            else:
+                bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated) * rate)
+                bucket.updated = now
+
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return True, 0
+
+            self._counters[scope]['rejected'] += 1
+            return False, (1 - bucket.tokens) / rate
+
+    def check_shared(self, scope, key):
+        """
+        Umumiy cache'dagi oyna hisoblagichi: burst / rate soniyada ko'pi bilan burst ta.
+        add + incr Redis/Memcached'da atomar.
+        """
+        limit = self.limits[scope]
+        window = max(1, int(limit['burst'] / limit['rate']))
+        now = time.time()
+        cache_key = f'rl:{scope}:{key}:{int(now // window)}'
+
+        cache = caches[self.cache_alias]
+        cache.add(cache_key, 0, timeout=window * 2)
+        try:
+            count = cache.incr(cache_key)
+        except ValueError:
+            # Kalit shu orada o'chib ketgan - cheklamaymiz
+            return True, 0
+
+        if count <= limit['burst']:
+            return True, 0
+
+        with self._lock:
+            self._counters[scope]['rejected_shared'] += 1
+        return False, window - now % window
+
+    def check(self, scope, key):
+        allowed, retry_after = self.check_local(scope, key)
+        if allowed and self.shared:
+            allowed, retry_after = self.check_shared(scope, key)
+        if allowed:
+            self._count_allowed(scope)
+        return allowed, retry_after
+
+    async def acheck(self, scope, key):
+        """check() ning async varianti - cache murojaati thread'da"""
+        allowed, retry_after = self.check_local(scope, key)
+        if allowed and self.shared:
+            allowed, retry_after = await sync_to_async(self.check_shared)(scope, key)
+        if allowed:
+            self._count_allowed(scope)
+        return allowed, retry_after
+
+    def refund(self, scope, key):
+        """check() olgan tokenni qaytarish (masalan idempotent takror - ish bajarilmadi)"""
+        limit = self.limits[scope]
+        with self._lock:
+            bucket = self._buckets.get((scope, key))
+            if bucket is not None:
+                bucket.tokens = min(limit['burst'], bucket.tokens + 1)
+            self._counters[scope]['allowed'] -= 1
+
+        if self.shared:
+            window = max(1, int(limit['burst'] / limit['rate']))
+            try:
+                caches[self.cache_alias].decr(f'rl:{scope}:{key}:{int(time.time() // window)}')
+            except ValueError:
+                pass
+
+    def _count_allowed(self, scope):
+        with self._lock:
+            self._counters[scope]['allowed'] += 1
+
+    def _prune(self, now):
+        """To'lib bo'lgan (uzoq vaqt ishlatilmagan) bucket'larni o'chirish"""
+        for (scope, key), bucket in list(self._buckets.items()):
+            limit = self.limits[scope]
+            if bucket.tokens + (now - bucket.updated) * limit['rate'] >= limit['burst']:
+                del self._buckets[(scope, key)]
+
+    def get_counters(self):
+        with self._lock:
+            counters = {scope: dict(values) for scope, values in self._counters.items()}
+            counters['buckets'] = len(self._buckets)
+        return counters
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+            self._counters.clear()
+
+
+limiter = RateLimiter(LIMITS, shared=SHARED, cache_alias=CACHE_ALIAS)
+
+
+def get_counters():
+    """Ruxsat/rad etilgan so'rovlar soni (scope bo'yicha)"""
+    return limiter.get_counters()
+
+
+def client_ip(request, trusted_proxies=None):
+    """
+    Mijoz IP manzili. X-Forwarded-For ning chap qismini mijoz o'zi yozadi -
+    ishonchli proxy'lar (TRUSTED_PROXIES) qo'shgan o'ngdagi yozuv olinadi.
+    """
+    if trusted_proxies is None:
+        trusted_proxies = TRUSTED_PROXIES
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if trusted_proxies and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',')]
+        return hops[-min(trusted_proxies, len(hops))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def telegram_user(request):
+    """Update yuborgan Telegram foydalanuvchi ID'si (topilmasa IP)"""
+    try:
+        update = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return client_ip(request)
+
+    if isinstance(update, dict):
+        for value in update.values():
+            if isinstance(value, dict) and isinstance(value.get('from'), dict):
+                return f"tg:{value['from'].get('id')}"
+    return client_ip(request)
+
+
+def too_many_requests(retry_after):
+    """Arzon 429 javob - tayyor tana, qo'shimcha ish yo'q"""
+    response = HttpResponse(TOO_MANY_REQUESTS, status=429, content_type='application/json')
+    response['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return response
+
+
+def drop_update(retry_after):
+    """
+    Webhook uchun: Telegram 2xx bo'lmagan javobda update'ni qayta yuboradi
+    va navbatdagilarini ushlab turadi - shuning uchun rad etilgan update
+    200 bilan qabul qilinib tashlab yuboriladi.
+    """
+    return JsonResponse({'ok': True, 'dropped': True})
+
+
+def rate_limit(scope, key=client_ip, on_reject=too_many_requests, free=None):
+    """
+    View dekoratori (sync va async view'lar uchun).
+    free(response) True bo'lsa token qaytariladi - bunday javob limitga kirmaydi.
+    """
+    if scope not in LIMITS:
+        raise ValueError(f"Noma'lum rate limit: {scope}")
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                client = key(request)
+                allowed, retry_after = await limiter.acheck(scope, client)
+                if not allowed:
+                    return on_reject(retry_after)
+                response = await view(request, *args, **kwargs)
+                if free is not None and free(response):
+                    if limiter.shared:
+                        await sync_to_async(limiter.refund)(scope, client)
+                    else:
+                        limiter.refund(scope, client)
+                return response
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            client = key(request)
+            allowed, retry_after = limiter.check(scope, client)
+            if not allowed:
+                return on_reject(retry_after)
+            response = view(request, *args, **kwargs)
+            if free is not None and free(response):
+                limiter.refund(scope, client)
+            return response
+        return wrapper
+
+    return decorator
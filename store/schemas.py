@@ -0,0 +1,218 @@
+# store/schemas.py
+"""
+So'rov sxemalari: maydonlar deklarativ yoziladi va modul yuklanganda bir
+marta validator funksiyalariga kompilyatsiya qilinadi (regex'lar, chegaralar,
+maydonlar ro'yxati oldindan tayyor). Tekshiruv DB ga murojaat qilmaydi va
+barcha xatolarni maydon yo'li bilan qaytaradi: {'items.0.quantity': '...'}.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+
+
+class FieldError(Exception):
+    """Bitta maydon xatosi"""
+
+
+class Field:
+    """Sxema maydoni - compile() tekshiruvchi funksiya qaytaradi"""
+
+    def __init__(self, required=True, default=None):
+        self.required = required
+        self.default = default
+
+    def compile(self):
+        raise NotImplementedError
+
+
+class String(Field):
+    def __init__(self, max_length=None, pattern=None, choices=None, message=None, **kwargs):
+        super().__init__(**kwargs)
+        self.max_length = max_length
+        self.pattern = pattern
+        self.choices = choices
+        self.message = message
+
+    def compile(self):
+        max_length = self.max_length
+        match = re.compile(self.pattern).match if self.pattern else None
+        choices = frozenset(self.choices) if self.choices else None
+        message = self.message or 'Noto\'g\'ri qiymat'
+
+        def check(value):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = str(value)
+            if not isinstance(value, str):
+                raise FieldError('Matn bo\'lishi kerak')
+            value = value.strip()
+            if max_length is not None and len(value) > max_length:
+                raise FieldError(f'Ko\'pi bilan {max_length} belgi')
+            if match is not None and not match(value):
+                raise FieldError(message)
+            if choices is not None and value not in choices:
+                raise FieldError(f'Ruxsat etilgan qiymatlar: {", ".join(sorted(choices))}')
+            return value
+
+        return check
+
+
+class Integer(Field):
+    def __init__(self, min_value=None, max_value=None, **kwargs):
+        super().__init__(**kwargs)
+        self.min_value = min_value
+        self.max_value = max_value
+
+    def compile(self):
+        min_value, max_value = self.min_value, self.max_value
+
+        def check(value):
+            # 1.9 kesilib boshqa mahsulotga aylanmasin; Infinity/NaN ham shu yerda
+            if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+                raise FieldError('Butun son bo\'lishi kerak')
+            try:
+                value = int(value)
+            except (TypeError, ValueError, OverflowError):
+                raise FieldError('Butun son bo\'lishi kerak')
+            if min_value is not None and value < min_value:
+                raise FieldError(f'Kamida {min_value}')
+            if max_value is not None and value > max_value:
+                raise FieldError(f'Ko\'pi bilan {max_value}')
+            return value
+
+        return check
+
+
+class DecimalNumber(Field):
+    """Aniq son (Decimal): float xatolarisiz, kasr xonalari cheklangan"""
+
+    def __init__(self, min_value=None, max_value=None, decimal_places=2, exclusive_min=False, **kwargs):
+        super().__init__(**kwargs)
+        self.min_value = min_value
+        self.max_value = max_value
+        self.decimal_places = decimal_places
+        self.exclusive_min = exclusive_min
+
+    def compile(self):
+        min_value, max_value = self.min_value, self.max_value
+        exclusive_min = self.exclusive_min
+        min_exponent = -self.decimal_places
+
+        def check(value):
+            if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                raise FieldError('Son bo\'lishi kerak')
+            try:
+                value = Decimal(str(value).strip())
+            except InvalidOperation:
+                raise FieldError('Son bo\'lishi kerak')
+            if not value.is_finite():
+                raise FieldError('Son bo\'lishi kerak')
+            if value.as_tuple().exponent < min_exponent:
+                raise FieldError(f'Ko\'pi bilan {-min_exponent} xonali kasr')
+            if min_value is not None:
+                if value < min_value or (exclusive_min and value == min_value):
+                    raise FieldError(f'{min_value} dan katta bo\'lishi kerak')
+            if max_value is not None and value > max_value:
+                raise FieldError(f'Ko\'pi bilan {max_value}')
+            return value
+
+        return check
+
+
+class Object(Field):
+    """Ichki maydonlar: har biri alohida tekshiriladi, xatolar yig'iladi"""
+
+    def __init__(self, fields, **kwargs):
+        super().__init__(**kwargs)
+        self.fields = fields
+
+    def compile(self):
+        compiled = []
+        for name, field in self.fields.items():
+            validate = field.compile()
+            compiled.append((name, validate, isinstance(validate, _Nested), field.required, field.default))
+        compiled = tuple(compiled)
+
+        def check(value, path='', errors=None):
+            if not isinstance(value, dict):
+                raise FieldError('Obyekt bo\'lishi kerak')
+
+            cleaned = {}
+            for name, validate, nested, required, default in compiled:
+                raw = value.get(name)
+                if raw is None or raw == '' or raw == []:
+                    if required:
+                        errors[path + name] = 'Majburiy maydon'
+                    else:
+                        cleaned[name] = default
+                    continue
+                try:
+                    if nested:
+                        cleaned[name] = validate(raw, f'{path}{name}.', errors)
+                    else:
+                        cleaned[name] = validate(raw)
+                except FieldError as e:
+                    errors[path + name] = str(e)
+            return cleaned
+
+        return _Nested(check)
+
+
+class List(Field):
+    def __init__(self, item, min_items=0, max_items=None, **kwargs):
+        super().__init__(**kwargs)
+        self.item = item
+        self.min_items = min_items
+        self.max_items = max_items
+
+    def compile(self):
+        validate_item = self.item.compile()
+        nested = isinstance(validate_item, _Nested)
+        min_items, max_items = self.min_items, self.max_items
+
+        def check(value, path='', errors=None):
+            if not isinstance(value, list):
+                raise FieldError('Ro\'yxat bo\'lishi kerak')
+            if len(value) < min_items:
+                raise FieldError(f'Kamida {min_items} ta element')
+            if max_items is not None and len(value) > max_items:
+                raise FieldError(f'Ko\'pi bilan {max_items} ta element')
+
+            cleaned = []
+            for index, raw in enumerate(value):
+                try:
+                    if nested:
+                        cleaned.append(validate_item(raw, f'{path}{index}.', errors))
+                    else:
+                        cleaned.append(validate_item(raw))
+                except FieldError as e:
+                    errors[f'{path}{index}'] = str(e)
+            return cleaned
+
+        return _Nested(check)
+
+
+class _Nested:
+    """Ichki xatolarni umumiy lug'atga yozadigan validator"""
+
+    __slots__ = ('check',)
+
+    def __init__(self, check):
+        self.check = check
+
+    def __call__(self, value, path, errors):
+        return self.check(value, path, errors)
+
+
+class Schema:
+    """Kompilyatsiya qilingan sxema: validate(data) -> (cleaned, errors)"""
+
+    def __init__(self, fields):
+        self._check = Object(fields).compile()
+
+    def validate(self, data):
+        errors = {}
+        try:
+            cleaned = self._check(data, '', errors)
+        except FieldError as e:
+            return None, {'': str(e)}
+        return cleaned, errors
+
@@ -1,7 +1,11 @@
 # store/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Order
+from django.db import transaction
+from django.conf import settings
+from .models import Category, Courier, Order, Product
+from .outbox import enqueue_order_created
+from .versions import CATALOG, COURIERS, bump_version
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,9 +26,36 @@ def new_order_notify(sender, instance, created, **kwargs):
     try:
         logger.info(f"📦 Yangi buyurtma yaratildi: #{instance.order_id}")
         
-        # Views'dan sync wrapper funksiyani chaqirish
-        from store.views import send_courier_notification_sync
-        send_courier_notification_sync(instance)
+        # Hodisa buyurtma bilan bitta tranzaksiyada yoziladi (outbox).
+        # Yuborish tranzaksiya yakunlangach drain loop tomonidan bajariladi
+        enqueue_order_created(instance)
+        
+        if getattr(settings, 'OUTBOX_DRAIN_ON_COMMIT', True):
+            from store.views import schedule_outbox_drain
+            transaction.on_commit(schedule_outbox_drain)
         
     except Exception as e:
-        logger.error(f"❌ Signal handler error: {e}", exc_info=True)
\ No newline at end of file
+        logger.error(f"❌ Signal handler error: {e}", exc_info=True)
+        raise
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def catalog_changed(sender, **kwargs):
+    """Katalog o'zgardi - worker'lardagi narx jadvali qayta quriladi"""
+    bump_version(CATALOG)
+
+
+@receiver([post_save, post_delete], sender=Courier)
+def couriers_changed(sender, instance, update_fields=None, **kwargs):
+    """Kuryer o'zgardi - worker'lardagi viloyat -> kuryer indeksi qayta quriladi"""
+    from bot.couriers import INDEXED_FIELDS, courier_cache
+    
+    # Shu jarayondagi handler keshi - har qanday o'zgarishda (commit'dan keyin)
+    telegram_id = instance.telegram_id
+    if telegram_id is not None:
+        transaction.on_commit(lambda: courier_cache.invalidate(telegram_id))
+    
+    if update_fields is not None and not INDEXED_FIELDS.intersection(update_fields):
+        return
+    bump_version(COURIERS)
@@ -1,3 +1,952 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import time
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.methods import SendMessage
+from aiogram.types import Update, User
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import BotState, Category, Courier, IdempotencyKey, Order, OrderItem, OrderOffer, OutboxEvent, Product, Sequence
+from . import order_ids, outbox, ratelimit, views
+from .admin import OrderAdmin
+from .idempotency import purge_expired
+from .importers import import_orders
+from .pricing import get_price_index, price_snapshot
+from .versions import COURIERS, get_version
+from bot import instrumentation
+from bot.bot import (
+    accept_order, notify_couriers_about_order, get_active_orders, get_courier_stats, record_offers, retract_offers, update_order_status,
+)
+from bot.couriers import courier_cache, courier_snapshot, get_active_couriers
+from bot.middlewares import CourierContextMiddleware
+from bot.notifications import get_order_payload, payload_cache, render_active_orders
+from bot.queues import UpdateQueuePool
+from bot.sender import RateLimitedSender
+from bot.storage import DjangoStorage
+
+
+class CreateOrderTests(TestCase):
+    """Buyurtma yaratish API testlari"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Baliq')
+        cls.products = [
+            Product.objects.create(category=cls.category, name=f'Mahsulot {i}', price=Decimal('10000.10'))
+            for i in range(20)
+        ]
+
+    def setUp(self):
+        ratelimit.limiter.reset()
+        price_snapshot.reset()
+
+    def payload(self, products, quantity='1.5'):
+        return {
+            'name': 'Ali Valiyev',
+            'phone': '+998 90 123 45 67',
+            'region': 'Toshkent',
+            'district': 'Shahar',
+            'address': 'Chilonzor 1',
+            'payment': 'cash',
+            'items': [
+                {'id': str(product.id), 'quantity': quantity, 'name': product.name}
+                for product in products
+            ],
+        }
+
+    def post(self, payload, **headers):
+        return self.client.post(
+            reverse('create_order'),
+            data=json.dumps(payload),
+            content_type='application/json',
+            headers=headers,
+        )
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        # ID bloki va narx jadvali oldindan tayyor bo'lsin - o'lchovga tushmasin
+        order_ids.allocator.next_id()
+        get_price_index()
+
+        with CaptureQueriesContext(connection) as single:
+            response = self.post(self.payload(self.products[:1]))
+        self.assertEqual(response.status_code, 200)
+
+        with CaptureQueriesContext(connection) as full:
+            response = self.post(self.payload(self.products))
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(len(single), len(full))
+        # SAVEPOINT + INSERT order + INSERT outbox + bulk INSERT qatorlar
+        # + bulk INSERT M2M + SELECT kuzatiladigan qoldiq + RELEASE
+        self.assertEqual(len(full), 7)
+
+    def test_total_is_exact_decimal(self):
+        response = self.post(self.payload(self.products[:3], quantity='0.1'))
+        data = response.json()['data']
+
+        order = Order.objects.get(order_id=data['order_id'])
+        self.assertEqual(order.total_price, Decimal('3000.03'))
+        self.assertEqual(order.products.count(), 3)
+
+    def test_line_items_snapshot_quantity_and_price(self):
+        product = self.products[0]
+        payload = self.payload([product], quantity='1.5')
+        payload['items'].append({'id': product.id, 'quantity': 0.5, 'name': product.name})
+
+        response = self.post(payload)
+        order = Order.objects.get(order_id=response.json()['data']['order_id'])
+
+        item = order.items.get()
+        self.assertEqual(item.product, product)
+        self.assertEqual(item.quantity, Decimal('2.00'))
+        self.assertEqual(item.unit_price, Decimal('10000.10'))
+        self.assertEqual(item.line_total, order.total_price)
+
+    def test_unknown_product_creates_nothing(self):
+        payload = self.payload(self.products[:2])
+        payload['items'].append({'id': '999999', 'quantity': 1, 'name': 'Yo\'q'})
+
+        response = self.post(payload)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Order.objects.exists())
+
+    def test_price_index_follows_catalog_version(self):
+        product = self.products[0]
+        url = reverse('get_product_price', args=[product.id])
+        self.client.get(url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.json()['data']['price'], 10000.10)
+
+        product.price = Decimal('9000')
+        product.old_price = Decimal('12000')
+        product.promo_price = Decimal('8500')
+        product.save()
+        price_snapshot.expire()  # TestCase ichida on_commit ishlamaydi
+
+        data = self.client.get(url).json()['data']
+        self.assertEqual((data['price'], data['original_price'], data['discount']), (8500.0, 9000.0, 25.0))
+
+        product.is_active = False
+        product.save()
+        price_snapshot.expire()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_cart_quote_prices_whole_cart_from_index(self):
+        payload = {'items': [
+            {'id': self.products[0].id, 'quantity': '1.5'},
+            {'id': self.products[1].id, 'quantity': 2},
+            {'id': 999999, 'quantity': 1, 'name': 'Eski mahsulot'},
+        ]}
+        get_price_index()
+
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('cart_quote'), data=json.dumps(payload), content_type='application/json')
+
+        data = response.json()['data']
+        self.assertEqual([line['line_total'] for line in data['items']], [15000.15, 20000.2])
+        self.assertEqual(data['total'], 35000.35)
+        self.assertEqual(data['unavailable'], [{'id': 999999, 'name': 'Eski mahsulot'}])
+
+    def test_invalid_payload_is_rejected_before_db_access(self):
+        payload = self.payload(self.products[:2])
+        payload['phone'] = '12ab'
+        payload['payment'] = 'bitcoin'
+        payload['items'][0]['quantity'] = '-1'
+        payload['items'][1]['quantity'] = '0.125'
+        del payload['address']
+
+        with self.assertNumQueries(0):
+            response = self.post(payload)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            set(response.json()['errors']),
+            {'phone', 'payment', 'address', 'items.0.quantity', 'items.1.quantity'}
+        )
+
+    def test_non_integral_product_id_is_rejected(self):
+        for product_id in (float('inf'), 1.9):
+            payload = self.payload(self.products[:1])
+            payload['items'][0]['id'] = product_id
+
+            response = self.post(payload)
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(set(response.json()['errors']), {'items.0.id'})
+        self.assertFalse(Order.objects.exists())
+
+    def test_phone_is_stored_as_digits_only(self):
+        payload = self.payload(self.products[:1])
+        payload['phone'] = '((((((((90))))))))\t123-45-67'
+
+        response = self.post(payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.get().phone, '901234567')
+
+    def test_cart_size_is_limited(self):
+        payload = self.payload(self.products[:1])
+        payload['items'] *= 51
+
+        response = self.post(payload)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.json()['errors'])
+        self.assertFalse(Order.objects.exists())
+
+    def test_stock_is_decremented(self):
+        product = self.products[0]
+        Product.objects.filter(pk=product.pk).update(stock=Decimal('5'))
+
+        response = self.post(self.payload([product], quantity='1.5'))
+
+        self.assertEqual(response.status_code, 200)
+        product.refresh_from_db()
+        self.assertEqual(product.stock, Decimal('3.50'))
+        # Qoldig'i kuzatilmaydigan mahsulot o'zgarmaydi
+        self.assertIsNone(Product.objects.get(pk=self.products[1].pk).stock)
+
+    def test_untracked_products_are_not_written(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post(self.payload(self.products[:2]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in ctx if q['sql'].startswith('UPDATE "store_product"')])
+
+    def test_insufficient_stock_creates_nothing(self):
+        tracked, untracked = self.products[:2]
+        Product.objects.filter(pk=tracked.pk).update(stock=Decimal('1'))
+
+        response = self.post(self.payload([untracked, tracked], quantity='1.5'))
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OutboxEvent.objects.exists())
+        tracked.refresh_from_db()
+        self.assertEqual(tracked.stock, Decimal('1.00'))
+
+    async def test_async_endpoint_creates_order(self):
+        response = await self.async_client.post(
+            reverse('create_order_async'),
+            data=json.dumps(self.payload(self.products[:2], quantity='2')),
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+        order = await Order.objects.aget(order_id=data['order_id'])
+        self.assertEqual(order.total_price, Decimal('40000.40'))
+        self.assertEqual(await order.items.acount(), 2)
+
+    def test_idempotent_retry_replays_first_response(self):
+        payload = self.payload(self.products[:2])
+        first = self.post(payload, **{'Idempotency-Key': 'checkout-1'})
+
+        # Faqat kalit qidiruvi - Product/Order ga tegilmaydi
+        with self.assertNumQueries(1):
+            second = self.post(payload, **{'Idempotency-Key': 'checkout-1'})
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+
+    def test_replays_do_not_use_up_checkout_tokens(self):
+        payload = self.payload(self.products[:1])
+        burst = ratelimit.LIMITS['checkout']['burst']
+
+        responses = [self.post(payload, **{'Idempotency-Key': 'retry'}) for _ in range(burst + 2)]
+
+        self.assertEqual({response.status_code for response in responses}, {200})
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_idempotency_key_reused_for_other_payload(self):
+        self.post(self.payload(self.products[:1]), **{'Idempotency-Key': 'checkout-2'})
+        response = self.post(self.payload(self.products[:2]), **{'Idempotency-Key': 'checkout-2'})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_purge_removes_only_expired_keys(self):
+        self.post(self.payload(self.products[:1]), **{'Idempotency-Key': 'old'})
+        self.post(self.payload(self.products[:1], quantity='2'), **{'Idempotency-Key': 'fresh'})
+        IdempotencyKey.objects.filter(key='old').update(expires_at=timezone.now())
+
+        self.assertEqual(purge_expired(batch_size=1), 1)
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['fresh'])
+
+
+class RateLimitTests(TestCase):
+    """Token bucket cheklovi testlari"""
+
+    def setUp(self):
+        ratelimit.limiter.reset()
+
+    def post_order(self, ip):
+        return self.client.post(
+            reverse('create_order'), data='{}', content_type='application/json', REMOTE_ADDR=ip
+        )
+
+    def test_spoofed_forwarded_for_does_not_reset_bucket(self):
+        burst = ratelimit.LIMITS['checkout']['burst']
+        statuses = [
+            self.client.post(
+                reverse('create_order'), data='{}', content_type='application/json',
+                HTTP_X_FORWARDED_FOR=f'1.2.3.{i}, 10.0.0.1',
+            ).status_code
+            for i in range(burst + 1)
+        ]
+        self.assertEqual(statuses, [400] * burst + [429])
+
+    def test_wrong_method_does_not_use_up_tokens(self):
+        burst = ratelimit.LIMITS['checkout']['burst']
+        for _ in range(burst):
+            self.assertEqual(self.client.get(reverse('create_order'), REMOTE_ADDR='10.0.0.3').status_code, 405)
+
+        self.assertEqual(self.post_order('10.0.0.3').status_code, 400)
+
+    def test_burst_then_cheap_429(self):
+        burst = ratelimit.LIMITS['checkout']['burst']
+        statuses = [self.post_order('10.0.0.1').status_code for _ in range(burst)]
+        self.assertEqual(statuses, [400] * burst)
+
+        with self.assertNumQueries(0):
+            response = self.post_order('10.0.0.1')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        # Boshqa mijozga ta'sir qilmaydi
+        self.assertEqual(self.post_order('10.0.0.2').status_code, 400)
+        self.assertEqual(ratelimit.get_counters()['checkout'], {
+            'allowed': burst + 1, 'rejected': 1, 'rejected_shared': 0,
+        })
+
+    @override_settings(BOT_EMBEDDED=True)
+    def test_webhook_drops_flood_per_telegram_user(self):
+        limiter = ratelimit.RateLimiter({'webhook': {'rate': 1, 'burst': 2}})
+        update = json.dumps({'update_id': 1, 'callback_query': {
+            'id': '1', 'chat_instance': '1', 'from': {'id': 42, 'is_bot': False, 'first_name': 'Ali'},
+        }})
+
+        with mock.patch.object(ratelimit, 'limiter', limiter), \
+                mock.patch('store.views.get_background_loop') as get_loop, \
+                self.assertLogs('store.views', level='ERROR'):
+            get_loop.side_effect = RuntimeError('loop yo\'q')
+            responses = [
+                self.client.post(reverse('telegram_webhook'), data=update, content_type='application/json')
+                for _ in range(3)
+            ]
+
+        self.assertEqual([r.status_code for r in responses], [500, 500, 200])
+        self.assertEqual(responses[2].json(), {'ok': True, 'dropped': True})
+        self.assertEqual(limiter.get_counters()['webhook']['rejected'], 1)
+
+    def test_web_tier_does_not_run_bot_unless_embedded(self):
+        update = json.dumps({'update_id': 1, 'message': {'from': {'id': 42}}})
+
+        with mock.patch('store.views.get_background_loop') as get_loop:
+            response = self.client.post(reverse('telegram_webhook'), data=update, content_type='application/json')
+            views.schedule_outbox_drain()
+
+        self.assertEqual(response.status_code, 404)
+        get_loop.assert_not_called()
+
+
+class OrderIdTests(TestCase):
+    """Blokli buyurtma ID generatori testlari"""
+
+    def test_ids_are_unique_and_fit_callback_data(self):
+        allocator = order_ids.BlockAllocator(block_size=10)
+        Sequence.objects.get_or_create(name=order_ids.SEQUENCE_NAME)
+
+        with CaptureQueriesContext(connection) as ctx:
+            ids = [allocator.next_id() for _ in range(25)]
+
+        self.assertEqual(len(set(ids)), 25)
+        self.assertTrue(all(len(order_id) == order_ids.ID_LENGTH and '_' not in order_id for order_id in ids))
+        # Har 10 ta ID ga bitta blok (SAVEPOINT + UPDATE + SELECT + RELEASE)
+        self.assertEqual(len(ctx), 3 * 4)
+
+    def test_allocators_never_share_a_block(self):
+        first = order_ids.BlockAllocator(block_size=5)
+        second = order_ids.BlockAllocator(block_size=5)
+
+        ids = [allocator.next_id() for _ in range(7) for allocator in (first, second)]
+
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_rolled_back_checkout_does_not_release_its_block(self):
+        product = Product.objects.create(
+            category=Category.objects.create(name='Baliq'), name='Laqqa', price=Decimal('1000'), stock=Decimal('1')
+        )
+        Sequence.objects.get_or_create(name=order_ids.SEQUENCE_NAME)
+        first = order_ids.BlockAllocator(block_size=5)
+
+        with mock.patch.object(order_ids, 'allocator', first):
+            response = self.client.post(reverse('create_order'), data=json.dumps({
+                'name': 'Ali', 'phone': '998901234567', 'region': 'T', 'district': 'T', 'address': 'T',
+                'payment': 'cash', 'items': [{'id': product.id, 'quantity': '2'}],
+            }), content_type='application/json')
+            self.assertEqual(response.status_code, 409)
+            taken = first.next_id()
+
+        second = order_ids.BlockAllocator(block_size=5)
+        self.assertNotIn(taken, second.next_ids(5))
+
+    def test_admin_allocates_id_before_its_transaction(self):
+        product = Product.objects.create(category=Category.objects.create(name='Baliq'), name='Laqqa', price=Decimal('1000'))
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'x'))
+        depth = len(connection.atomic_blocks)
+        depths = []
+        generate = Order.generate_order_id
+
+        def allocate():
+            depths.append(len(connection.atomic_blocks))
+            return generate()
+
+        with mock.patch.object(Order, 'generate_order_id', side_effect=allocate):
+            response = self.client.post(reverse('admin:store_order_add'), {
+                'status': 'pending', 'total_price': '1000', 'full_name': 'Ali', 'phone': '998901234567',
+                'payment_method': 'naqd', 'products': [product.id],
+                'items-TOTAL_FORMS': '0', 'items-INITIAL_FORMS': '0',
+            })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(depths, [depth])
+        self.assertTrue(Order.objects.exists())
+
+
+class OutboxTests(TestCase):
+    """Outbox hodisalari testlari"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.order = Order.objects.create(
+            full_name='Ali', phone='998901234567', payment_method='naqd', total_price=Decimal('1000')
+        )
+
+    def test_order_creation_writes_event_in_same_transaction(self):
+        event = OutboxEvent.objects.get(order=self.order)
+        self.assertEqual(event.event_type, 'order_created')
+        self.assertEqual(event.status, 'pending')
+
+    def test_drain_marks_delivered(self):
+        with mock.patch.object(outbox, 'publish_event', mock.AsyncMock()) as publish:
+            processed = async_to_sync(outbox.drain_once)()
+
+        self.assertEqual(processed, 1)
+        publish.assert_awaited_once()
+        event = OutboxEvent.objects.get(order=self.order)
+        self.assertEqual(event.status, 'delivered')
+        self.assertEqual(event.attempts, 1)
+
+    def test_failed_publish_is_retried_later(self):
+        failing = mock.AsyncMock(side_effect=RuntimeError('telegram down'))
+        with mock.patch.object(outbox, 'publish_event', failing):
+            async_to_sync(outbox.drain_once)()
+
+        event = OutboxEvent.objects.get(order=self.order)
+        self.assertEqual(event.status, 'pending')
+        self.assertGreater(event.available_at, timezone.now())
+        self.assertIn('telegram down', event.last_error)
+        # Backoff muddati o'tmaguncha qayta olinmaydi
+        self.assertEqual(outbox.claim_batch(), [])
+
+    def test_edited_order_is_rendered_again(self):
+        payload = get_order_payload('new', self.order)
+
+        self.order.address = 'Yangi manzil'
+        self.order.save()
+
+        edited = get_order_payload('new', self.order)
+        self.assertIsNot(edited, payload)
+        self.assertIn('Yangi manzil', edited.text)
+
+    def test_order_no_longer_pending_is_not_offered(self):
+        Order.objects.filter(pk=self.order.pk).update(status='cancelled')
+        bot = FakeBot(latency=0)
+
+        with mock.patch('bot.runtime.get_bot_and_dispatcher', return_value=(bot, None)):
+            async_to_sync(notify_couriers_about_order)(self.order)
+
+        self.assertEqual(bot.sent, [])
+
+    def test_follow_up_failure_after_fan_out_is_not_retried(self):
+        bot = FakeBot(latency=0)
+        bot.send_message = mock.AsyncMock(return_value=SimpleNamespace(chat=SimpleNamespace(id=1), message_id=10))
+        courier = SimpleNamespace(telegram_id=1, first_name='Ali')
+
+        with mock.patch('bot.runtime.get_bot_and_dispatcher', return_value=(bot, None)), \
+                mock.patch('bot.bot.get_active_couriers', return_value=[courier]), \
+                mock.patch('bot.bot.record_offers', mock.AsyncMock(side_effect=DatabaseError('db down'))), \
+                self.assertLogs('bot.bot', level='ERROR'):
+            async_to_sync(notify_couriers_about_order)(self.order)
+
+        bot.send_message.assert_awaited_once()
+
+    def test_notification_payload_is_rendered_once_without_queries(self):
+        OrderItem.objects.create(
+            order=self.order, product_name='Zog\'ora <katta>', quantity=Decimal('2'),
+            unit_price=Decimal('500'), line_total=Decimal('1000'),
+        )
+        payload_cache.clear()
+        event, = outbox.claim_batch()
+
+        with self.assertNumQueries(0):
+            payload = get_order_payload('new', event.order)
+            again = get_order_payload('new', Order(
+                order_id=self.order.order_id, status='pending', updated_at=event.order.updated_at,
+            ))
+
+        self.assertIs(again, payload)
+        self.assertIn('Zog\'ora &lt;katta&gt; - 2.00 x 500.00', payload.text)
+        self.assertEqual(payload.reply_markup.inline_keyboard[0][0].callback_data, f'accept_{self.order.order_id}')
+
+
+class ImportOrdersTests(TestCase):
+    """Buyurtmalarni fayldan import qilish testlari"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Baliq')
+        cls.carp = Product.objects.create(category=category, name='Zog\'ora', price=Decimal('30000'))
+        cls.trout = Product.objects.create(category=category, name='Gulmoy', price=Decimal('85000'))
+
+    def setUp(self):
+        price_snapshot.reset()
+
+    def test_csv_import_in_chunks(self):
+        rows = ['name,phone,region,district,address,payment,notes,items']
+        for i in range(5):
+            rows.append(f'Mijoz {i},+998901234567,Toshkent,Chilonzor,Manzil {i},cash,,{self.carp.id}:2;{self.trout.id}:0.5')
+        rows.append('Xato,+998901234567,Toshkent,Chilonzor,Manzil,cash,,999999:1')
+
+        result = import_orders(io.StringIO('\n'.join(rows)), fmt='csv', chunk_size=2)
+
+        self.assertEqual((result.rows, result.imported, result.failed), (6, 5, 1))
+        self.assertEqual(result.errors[0][0], 7)
+        order = Order.objects.get(full_name='Mijoz 0')
+        self.assertEqual(order.total_price, Decimal('102500.00'))
+        self.assertEqual(order.items.count(), 2)
+        self.assertEqual(order.products.count(), 2)
+        # Xabarlar import oxirida bitta paket bo'lib navbatga chiqadi
+        self.assertEqual(OutboxEvent.objects.filter(status='pending').count(), 5)
+        self.assertFalse(OutboxEvent.objects.filter(status='held').exists())
+
+    def test_jsonl_import_without_notifications(self):
+        row = {
+            'name': 'Restoran', 'phone': '998901234567', 'region': 'Samarqand', 'district': 'Markaz',
+            'address': 'Registon 1', 'payment': 'card', 'items': [{'id': self.carp.id, 'quantity': 10}],
+        }
+        stream = io.StringIO(json.dumps(row) + '\n\nnot json\n')
+
+        result = import_orders(stream, fmt='jsonl', notify=False)
+
+        self.assertEqual((result.imported, result.failed), (1, 1))
+        self.assertEqual(Order.objects.get().payment_method, 'karta')
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_rows_beyond_stock_are_rejected(self):
+        Product.objects.filter(pk=self.trout.pk).update(stock=Decimal('3'))
+        rows = ['name,phone,region,district,address,payment,notes,items']
+        for i in range(3):
+            rows.append(f'Mijoz {i},+998901234567,Toshkent,Chilonzor,Manzil {i},cash,,{self.trout.id}:1.5')
+
+        result = import_orders(io.StringIO('\n'.join(rows)), fmt='csv', notify=False)
+
+        self.assertEqual((result.imported, result.failed), (2, 1))
+        self.assertEqual(result.errors[0][0], 4)
+        self.trout.refresh_from_db()
+        self.assertEqual(self.trout.stock, Decimal('0.00'))
+
+    def test_failed_chunk_does_not_hold_back_earlier_notifications(self):
+        rows = ['name,phone,region,district,address,payment,notes,items']
+        for i in range(2):
+            rows.append(f'Mijoz {i},+998901234567,Toshkent,Chilonzor,Manzil {i},cash,,{self.carp.id}:1')
+
+        with mock.patch('store.importers.reserve_stock', side_effect=[None, DatabaseError('disk full')]):
+            result = import_orders(io.StringIO('\n'.join(rows)), fmt='csv', chunk_size=1)
+
+        self.assertEqual((result.imported, result.failed), (1, 1))
+        self.assertIn('disk full', result.errors[0][1])
+        self.assertEqual(list(OutboxEvent.objects.values_list('status', flat=True)), ['pending'])
+
+
+class FakeBot:
+    """Telegram o'rniga: har bir so'rov latency soniya davom etadi"""
+
+    def __init__(self, latency=0.05, retry_after=None):
+        self.latency = latency
+        self.retry_after = dict(retry_after or {})
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(self.latency)
+        if self.retry_after.pop(chat_id, None):
+            raise TelegramRetryAfter(SendMessage(chat_id=chat_id, text=text), 'Flood control', retry_after=1)
+        self.sent.append((chat_id, time.monotonic()))
+        return chat_id
+
+    async def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.sent.append((chat_id, message_id))
+        return True
+
+
+class CourierIndexTests(TestCase):
+    """Viloyat -> faol kuryer indeksi testlari"""
+
+    def setUp(self):
+        courier_snapshot.reset()
+        courier_cache.clear()
+
+    def make_courier(self, telegram_id, region='tashkent', status='active'):
+        return Courier.objects.create(
+            first_name=f'Kuryer {telegram_id}', last_name='X', phone=str(telegram_id),
+            telegram_id=telegram_id, region=region, status=status,
+        )
+
+    def test_dispatch_reads_index_without_queries(self):
+        self.make_courier(1)
+        self.make_courier(2, status='pending')
+        self.make_courier(3, region='samarkand')
+        get_active_couriers('tashkent')
+
+        with self.assertNumQueries(0):
+            couriers = get_active_couriers('tashkent')
+
+        self.assertEqual([courier.telegram_id for courier in couriers], [1])
+
+    def test_courier_changes_bump_the_version(self):
+        courier = self.make_courier(1, status='pending')
+        self.assertEqual(get_active_couriers('tashkent'), ())
+
+        courier.status = 'active'
+        courier.save()
+        courier_snapshot.expire()  # TestCase ichida on_commit ishlamaydi
+        self.assertEqual(len(get_active_couriers('tashkent')), 1)
+
+        # Statistika maydonlari indeksga ta'sir qilmaydi - versiya oshmaydi
+        version = get_version(COURIERS)
+        courier.total_orders = 5
+        courier.save(update_fields=['total_orders'])
+        self.assertEqual(get_version(COURIERS), version)
+
+        courier.delete()
+        courier_snapshot.expire()
+        self.assertEqual(get_active_couriers('tashkent'), ())
+
+    def test_courier_context_is_cached_until_saved(self):
+        courier = self.make_courier(1)
+        middleware = CourierContextMiddleware()
+
+        async def handler(event, data):
+            return data['courier']
+
+        def resolve(telegram_id):
+            user = User(id=telegram_id, is_bot=False, first_name='Ali')
+            return async_to_sync(middleware)(handler, None, {'event_from_user': user})
+
+        self.assertEqual(resolve(1).phone, '1')
+        self.assertIsNone(resolve(2))
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve(1).id, courier.id)
+            self.assertIsNone(resolve(2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            courier.phone = '99'
+            courier.save(update_fields=['phone'])
+        self.assertEqual(resolve(1).phone, '99')
+
+
+class CourierScreensTests(TestCase):
+    """Kuryer bot ekranlari - har biri bitta so'rov"""
+
+    def test_stats_in_one_query(self):
+        courier = Courier.objects.create(first_name='Ali', last_name='X', phone='1', telegram_id=1, region='tashkent')
+        now = timezone.now()
+        for status, days_ago in [('delivered', 0), ('delivered', 3), ('accepted', 0), ('delivered', 30)]:
+            order = Order.objects.create(
+                courier=courier, total_price=1, full_name='Mijoz', phone='1', payment_method='naqd', status=status,
+                delivered_at=now - timedelta(days=days_ago) if status == 'delivered' else None,
+            )
+            Order.objects.filter(id=order.id).update(created_at=now - timedelta(days=days_ago))
+
+        with self.assertNumQueries(1):
+            stats = async_to_sync(get_courier_stats)(courier)
+
+        self.assertEqual(stats, {'today': 2, 'week': 3, 'today_delivered': 1})
+
+    def test_active_orders_page_in_one_query(self):
+        courier = Courier.objects.create(first_name='Ali', last_name='X', phone='1', telegram_id=1, region='tashkent')
+        for status in ['accepted', 'delivering'] * 3 + ['delivered', 'pending']:
+            Order.objects.create(courier=courier, total_price=1, full_name='Mijoz', phone='1', payment_method='naqd', status=status)
+
+        with self.assertNumQueries(1):
+            orders, page, has_next = async_to_sync(get_active_orders)(courier)
+        self.assertEqual((len(orders), page, has_next), (5, 0, True))
+
+        orders, page, has_next = async_to_sync(get_active_orders)(courier, 1)
+        self.assertEqual((len(orders), page, has_next), (1, 1, False))
+
+        payload = render_active_orders(orders, page, has_next)
+        self.assertIn('Buyurtma #' + orders[0].order_id, payload.text)
+        buttons = payload.reply_markup.inline_keyboard
+        self.assertEqual(buttons[-1][0].callback_data, 'my_orders_0')
+        self.assertTrue(buttons[0][0].callback_data.startswith(f'status_{orders[0].order_id}_'))
+        self.assertTrue(buttons[0][0].callback_data.endswith('_1'))
+
+
+class AcceptOrderTests(TestCase):
+    """Buyurtmani qabul qilish - bitta shartli UPDATE"""
+
+    def test_only_first_courier_wins(self):
+        first, second = [
+            Courier.objects.create(first_name=f'K{i}', last_name='X', phone=str(i), telegram_id=i, region='tashkent')
+            for i in (1, 2)
+        ]
+        order = Order.objects.create(total_price=1, full_name='Mijoz', phone='1', payment_method='naqd')
+
+        accepted, error = async_to_sync(accept_order)(order.order_id, first)
+        self.assertIsNone(error)
+        self.assertEqual((accepted.status, accepted.courier_id), ('accepted', first.id))
+
+        with self.assertNumQueries(1):
+            accepted, error = async_to_sync(accept_order)(order.order_id, second)
+        self.assertIsNone(accepted)
+        self.assertEqual(error, 'Bu buyurtma allaqachon qabul qilingan!')
+
+        order.refresh_from_db()
+        self.assertEqual(order.courier_id, first.id)
+        self.assertIsNotNone(order.accepted_at)
+
+    def test_offers_are_retracted_from_other_couriers(self):
+        order = Order.objects.create(total_price=1, full_name='Mijoz', phone='1', payment_method='naqd')
+        async_to_sync(record_offers)(order, [(1, 10), (2, 20), (3, 30)])
+        bot = FakeBot(latency=0)
+
+        retracted = async_to_sync(retract_offers)(bot, order, 1)
+
+        self.assertEqual(retracted, 2)
+        self.assertEqual(sorted(bot.sent), [(2, 20), (3, 30)])
+        self.assertFalse(OrderOffer.objects.exists())
+        # Ikkinchi marta chaqirilsa qayta tahrirlanmaydi
+        self.assertEqual(async_to_sync(retract_offers)(bot, order, 1), 0)
+
+
+class CourierCounterTests(TestCase):
+    """Kuryer hisoblagichlari status o'tishlarida F() bilan oshadi"""
+
+    def setUp(self):
+        self.courier = Courier.objects.create(first_name='Ali', last_name='X', phone='1', telegram_id=1, region='tashkent')
+
+    def test_transitions_bump_counters_once(self):
+        order = Order.objects.create(total_price=1, full_name='Mijoz', phone='1', payment_method='naqd')
+
+        async_to_sync(accept_order)(order.order_id, self.courier)
+        async_to_sync(update_order_status)(order.order_id, 'delivering')
+        async_to_sync(update_order_status)(order.order_id, 'delivered')
+        # Qayta bosilgan tugma - ikkinchi marta sanalmaydi
+        async_to_sync(update_order_status)(order.order_id, 'delivered')
+
+        self.courier.refresh_from_db()
+        self.assertEqual((self.courier.total_orders, self.courier.completed_orders), (1, 1))
+        order.refresh_from_db()
+        self.assertIsNotNone(order.delivered_at)
+
+    def test_admin_delivery_counts_assigned_order(self):
+        order = Order.objects.create(courier=self.courier, total_price=1, full_name='Mijoz', phone='1', payment_method='naqd')
+        before = get_version(COURIERS)
+
+        order.status = 'delivered'
+        OrderAdmin(Order, admin.site).save_model(None, order, None, change=True)
+
+        self.courier.refresh_from_db()
+        self.assertEqual((self.courier.total_orders, self.courier.completed_orders), (1, 1))
+        self.assertEqual(self.courier.success_rate, 100)
+        self.assertGreater(get_version(COURIERS), before)
+
+    def test_recompute_repairs_drift(self):
+        for status in ['pending', 'accepted', 'delivered', 'delivered', 'cancelled']:
+            Order.objects.create(courier=self.courier, total_price=1, full_name='Mijoz', phone='1', payment_method='naqd', status=status)
+        Courier.objects.filter(pk=self.courier.pk).update(total_orders=10, completed_orders=0)
+        before = get_version(COURIERS)
+
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('recompute_courier_counters', stdout=out)
+
+        self.courier.refresh_from_db()
+        self.assertEqual(
+            (self.courier.total_orders, self.courier.completed_orders, self.courier.cancelled_orders), (4, 2, 1)
+        )
+        self.assertIn('1 ta kuryer', out.getvalue())
+        self.assertGreater(get_version(COURIERS), before)
+
+
+class HandlerMetricsTests(TestCase):
+    """Handler ko'rsatkichlari: vaqt, sync_to_async ichidagi ORM so'rovlari, Bot API"""
+
+    def test_handler_queries_and_api_calls_are_recorded(self):
+        registry = instrumentation.Registry()
+
+        async def fake_api(bot, method):
+            return True
+
+        async def show_profile(event, data):
+            await sync_to_async(Courier.objects.count)()
+            await sync_to_async(lambda: list(Order.objects.all()))()
+            await instrumentation.ApiLatencyMiddleware()(fake_api, None, SendMessage(chat_id=1, text='x'))
+
+        data = {
+            'handler': SimpleNamespace(callback=show_profile),
+            'event_update': SimpleNamespace(event_type='message'),
+        }
+        with mock.patch.object(instrumentation, 'registry', registry), \
+                connection.execute_wrapper(instrumentation.record_query):
+            async_to_sync(instrumentation.HandlerMetricsMiddleware())(show_profile, None, data)
+            # Handler tashqarisidagi so'rov hisoblanmaydi
+            Courier.objects.count()
+
+        metrics = registry.snapshot()
+        stats = metrics['handlers']['message:show_profile']
+        self.assertEqual((stats['calls'], stats['errors']), (1, 0))
+        self.assertEqual(stats['queries']['p50'], 2)
+        self.assertEqual(stats['api_calls']['p50'], 1)
+        self.assertEqual(metrics['api']['SendMessage']['calls'], 1)
+
+
+class TelegramSenderTests(SimpleTestCase):
+    """Kuryerlarga parallel yuborish testlari"""
+
+    def fan_out(self, bot, chat_ids, **options):
+        async def run():
+            sender = RateLimitedSender(bot, **options)
+            started = time.monotonic()
+            results = await sender.fan_out(chat_ids, 'Yangi buyurtma')
+            return time.monotonic() - started, results, sender
+        return asyncio.run(run())
+
+    def test_fan_out_does_not_grow_with_courier_count(self):
+        bot = FakeBot(latency=0.05)
+
+        elapsed, results, sender = self.fan_out(bot, list(range(40)), global_rate=1000, global_burst=100, concurrency=40)
+
+        self.assertEqual(results, list(range(40)))
+        # Ketma-ket yuborilsa 40 x 50 ms = 2 s bo'lardi
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(sender.stats()['sent'], 40)
+
+    def test_global_rate_paces_sends(self):
+        bot = FakeBot(latency=0)
+
+        elapsed, _, _ = self.fan_out(bot, list(range(10)), global_rate=50, global_burst=1)
+
+        # 10 ta xabar soniyasiga 50 tadan: birinchisi darhol, qolgan 9 tasi 20 ms oraliqda
+        self.assertGreaterEqual(elapsed, 9 * 0.02 * 0.9)
+
+    def test_retry_after_is_honoured(self):
+        bot = FakeBot(latency=0, retry_after={7: True})
+
+        elapsed, results, sender = self.fan_out(bot, [7, 8])
+
+        self.assertEqual(results, [7, 8])
+        self.assertEqual(sender.stats()['retried'], 1)
+        self.assertGreaterEqual(elapsed, 1)
+
+
+class BotStorageTests(TestCase):
+    """Bot FSM holati DB da - boshqa worker (yangi storage) ham ko'radi"""
+
+    key = StorageKey(bot_id=1, chat_id=42, user_id=42)
+
+    def test_state_is_shared_between_storages(self):
+        async_to_sync(DjangoStorage().set_state)(self.key, 'Registration:waiting_phone')
+        async_to_sync(DjangoStorage().set_data)(self.key, {'token': 'abc', 'telegram_id': 42})
+
+        other = DjangoStorage()
+        self.assertEqual(async_to_sync(other.get_state)(self.key), 'Registration:waiting_phone')
+        self.assertEqual(async_to_sync(other.get_data)(self.key), {'token': 'abc', 'telegram_id': 42})
+
+    def test_expired_state_is_dropped(self):
+        async_to_sync(DjangoStorage().set_state)(self.key, 'Registration:waiting_phone')
+        BotState.objects.update(updated_at=timezone.now() - timedelta(days=2))
+
+        self.assertIsNone(async_to_sync(DjangoStorage().get_state)(self.key))
+        self.assertFalse(BotState.objects.exists())
+
+    def test_clear_deletes_row(self):
+        storage = DjangoStorage()
+        async_to_sync(storage.set_state)(self.key, 'Registration:waiting_phone')
+        async_to_sync(storage.set_data)(self.key, {'token': 'abc'})
+        async_to_sync(storage.set_state)(self.key, None)
+        async_to_sync(storage.set_data)(self.key, {})
+
+        self.assertFalse(BotState.objects.exists())
+
+
+def make_update(update_id, chat_id):
+    return Update.model_validate({'update_id': update_id, 'message': {
+        'message_id': update_id, 'date': 0, 'chat': {'id': chat_id, 'type': 'private'}, 'text': str(update_id),
+    }})
+
+
+class UpdateQueueTests(SimpleTestCase):
+    """Update navbati: bitta chat ichida tartib, chatlar orasida parallel"""
+
+    def test_same_chat_in_order_other_chats_in_parallel(self):
+        handled = []
+
+        async def scenario():
+            other_chat_started = asyncio.Event()
+
+            async def handle(update):
+                if update.update_id == 1:
+                    # Boshqa chat update'i parallel ishlamasa bu yerda qolib ketadi
+                    await asyncio.wait_for(other_chat_started.wait(), 1)
+                if update.message.chat.id == 2:
+                    other_chat_started.set()
+                handled.append(update.update_id)
+
+            pool = UpdateQueuePool(handle, shards=4)
+            pool.start()
+            for update in (make_update(1, 1), make_update(2, 1), make_update(3, 2), make_update(4, 1)):
+                self.assertTrue(pool.submit(update))
+            await pool.stop()
+            return pool.stats()
+
+        stats = asyncio.run(scenario())
+
+        self.assertEqual([i for i in handled if i != 3], [1, 2, 4])
+        self.assertLess(handled.index(3), handled.index(1))
+        self.assertEqual((stats['processed'], stats['failed'], stats['depth']), (4, 0, 0))
+
+    def test_full_shard_rejects(self):
+        async def scenario():
+            pool = UpdateQueuePool(lambda update: asyncio.sleep(0), shards=1, maxsize=1)
+            accepted = [pool.submit(make_update(i, 1)) for i in range(2)]
+            return accepted, pool.stats()
+
+        accepted, stats = asyncio.run(scenario())
+
+        self.assertEqual(accepted, [True, False])
+        self.assertEqual((stats['depth'], stats['rejected']), (1, 1))
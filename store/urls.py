@@ -5,8 +5,11 @@ from . import views
 urlpatterns = [
     path('shop/', views.shop_view, name='shop'),
     path('api/order/create/', views.create_order, name='create_order'),
+    path('api/order/create/async/', views.create_order_async, name='create_order_async'),
+    path('api/cart/quote/', views.cart_quote, name='cart_quote'),
     path('api/product/<int:product_id>/price/', views.get_product_price, name='get_product_price'),
     path("bot/webhook/", views.telegram_webhook, name="telegram_webhook"),
+    path('api/metrics/', views.metrics, name='metrics'),
     path('admin/couriers/', views.courier_list, name='courier_list'),
     path('admin/couriers/create-token/', views.courier_create_token, name='courier_create_token'),
     path('admin/couriers/<int:courier_id>/', views.courier_detail, name='courier_detail'),
@@ -0,0 +1,87 @@
+# store/versions.py
+"""
+Versiya hisoblagichlari va ularga bog'langan jarayon ichidagi snapshot'lar.
+
+Ma'lumot o'zgarganda (masalan Product/Category saqlanganda) hisoblagich
+oshiriladi - Sequence jadvalida, o'zgarish bilan bitta tranzaksiyada.
+Har bir worker snapshot'ni xotirada ushlaydi va versiyani check_interval
+soniyada bir marta tekshiradi: versiya o'zgarmagan bo'lsa o'qish faqat
+xotiradan, o'zgargan bo'lsa snapshot qayta quriladi.
+"""
+import threading
+import time
+
+from django.db import transaction
+
+from .models import Sequence
+
+CATALOG = 'catalog_version'
+COURIERS = 'courier_version'
+
+_snapshots = {}
+
+
+def bump_version(name):
+    """Versiyani oshirish; shu jarayondagi snapshot'lar commit'dan keyin darhol tekshiradi"""
+    version = Sequence.objects.next_value(name)
+    for snapshot in _snapshots.get(name, ()):
+        transaction.on_commit(snapshot.expire)
+    return version
+
+
+def get_version(name):
+    """Joriy versiya (hali oshirilmagan bo'lsa 0)"""
+    return Sequence.objects.filter(name=name).values_list('value', flat=True).first() or 0
+
+
+class VersionedSnapshot:
+    """build() natijasini versiya o'zgarguncha xotirada saqlash"""
+
+    def __init__(self, name, build, check_interval=1.0):
+        self.name = name
+        self.build = build
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = None
+        self._checked_at = 0.0
+        _snapshots.setdefault(name, []).append(self)
+
+    def is_fresh(self):
+        """Versiyani tekshirish vaqti kelmagan - data DB ga murojaatsiz qaytariladi"""
+        return self._data is not None and time.monotonic() - self._checked_at < self.check_interval
+
+    @property
+    def data(self):
+        return self._data
+
+    def get(self):
+        if self.is_fresh():
+            return self._data
+
+        with self._lock:
+            # Boshqa thread shu orada yangilagan bo'lishi mumkin
+            if self.is_fresh():
+                return self._data
+
+            version = get_version(self.name)
+            if version != self._version or self._data is None:
+                self._data = self.build()
+                self._version = version
+            self._checked_at = time.monotonic()
+            return self._data
+
+    @property
+    def version(self):
+        return self._version
+
+    def expire(self):
+        """Keyingi get() versiyani tekshirsin"""
+        self._checked_at = 0.0
+
+    def reset(self):
+        """Snapshot'ni butunlay tashlab yuborish (testlar uchun)"""
+        with self._lock:
+            self._version = None
+            self._data = None
+            self._checked_at = 0.0
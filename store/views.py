@@ -6,29 +6,30 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.utils import timezone
 from .models import Courier, CourierToken, Order, Category, Product
+from .outbox import drain_once
+from .idempotency import (
+    get_idempotency_key, request_fingerprint, find_response, afind_response,
+    store_response, replay_response, is_replay,
+)
+from .pricing import get_price_index, aget_price_index
+from .ratelimit import rate_limit, telegram_user, drop_update, get_counters
+from .checkout import (
+    CheckoutError, QUOTE_SCHEMA, parse_order_payload, build_order_items,
+    quote_cart, save_order, order_created_payload,
+)
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods, require_POST
 from django.http import HttpResponse
-from aiogram import Bot, Dispatcher
-from aiogram.types import Update
-from aiogram.fsm.storage.memory import MemoryStorage
+from django.conf import settings
 from asgiref.sync import sync_to_async
-import os
-from dotenv import load_dotenv
-from bot.bot import courier_router as router
 import asyncio
-from django.db import close_old_connections
+from django.db import IntegrityError
 import threading
 
-load_dotenv()
-
 logger = logging.getLogger(__name__)
 
-TELEGRAM_BOT_TOKEN = os.getenv("BOT_TOKEN", 'DefaultToken')
-
 # ========== GLOBAL INSTANCES ==========
-_bot: Bot | None = None
-_dp: Dispatcher | None = None
+# Faqat BOT_EMBEDDED=true bo'lsa ishlatiladi; odatda bot `manage.py runbot` jarayonida
 _background_loop: asyncio.AbstractEventLoop | None = None
 _background_thread: threading.Thread | None = None
 
@@ -64,113 +65,83 @@ def get_background_loop():
     return _background_loop
 
 
+def bot_embedded():
+    """Bot web worker ichida ishlaydimi (eski rejim)?"""
+    return getattr(settings, 'BOT_EMBEDDED', False)
+
+
 def get_bot_and_dispatcher():
-    """Bot va dispatcher'ni olish/yaratish"""
-    global _bot, _dp
-    
-    if _bot is None:
-        logger.info("🤖 Bot va dispatcher yaratilmoqda...")
-        _bot = Bot(token=TELEGRAM_BOT_TOKEN)
-        
-        storage = MemoryStorage()
-        _dp = Dispatcher(storage=storage)
-        _dp.include_router(router)
-        
-        logger.info("✅ Bot va dispatcher tayyor")
-    
-    return _bot, _dp
+    """Bot va dispatcher'ni olish/yaratish (bot.runtime'dagi yagona nusxa)"""
+    from bot.runtime import get_bot_and_dispatcher
+    return get_bot_and_dispatcher()
 
 
 @csrf_exempt
+@rate_limit('webhook', key=telegram_user, on_reject=drop_update)
 def telegram_webhook(request):
-    """Webhook handler - sync wrapper"""
+    """
+    Webhook handler (faqat BOT_EMBEDDED rejimida): update tekshiriladi,
+    background loop'dagi navbatga qo'yiladi va darhol 200 qaytariladi.
+    """
+    if not bot_embedded():
+        # Webhook runbot jarayoniga yo'naltirilishi kerak (runbot --mode webhook)
+        return JsonResponse({"ok": False, "error": "Bot alohida jarayonda ishlaydi"}, status=404)
+    
+    from aiogram.types import Update
+    from bot.runtime import submit_update
+    
+    try:
+        update = Update.model_validate_json(request.body)
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "Noto'g'ri update"}, status=400)
+    
     try:
-        body = request.body.decode("utf-8")
-        
-        # Background loop'da async funksiyani ishga tushirish
         loop = get_background_loop()
-        future = asyncio.run_coroutine_threadsafe(
-            process_webhook_async(body),
-            loop
-        )
-        
-        # Natijani kutish (timeout bilan)
-        try:
-            result = future.result(timeout=30)
-            return result
-        except asyncio.TimeoutError:
-            logger.error("⏱️ Webhook timeout")
-            return JsonResponse({"ok": False, "error": "timeout"}, status=504)
-        
+        accepted = asyncio.run_coroutine_threadsafe(submit_update(update), loop).result(timeout=5)
     except Exception as e:
         logger.error(f"❌ Webhook error: {e}", exc_info=True)
         return JsonResponse({"ok": False, "error": str(e)}, status=500)
+    
+    if not accepted:
+        # Navbat to'lgan - Telegram keyinroq qayta yuboradi
+        return JsonResponse({"ok": False, "error": "Navbat to'lgan"}, status=503)
+    return JsonResponse({"ok": True})
 
 
-async def process_webhook_async(body: str) -> JsonResponse:
-    """Async webhook processing"""
-    try:
-        # DB connection'ni tozalash
-        await sync_to_async(close_old_connections)()
-        
-        # Update'ni parse qilish
-        update = Update.model_validate_json(body)
-        logger.info(f"📨 Update {update.update_id} qabul qilindi")
-        
-        # Bot va dispatcher'ni olish
-        bot, dp = get_bot_and_dispatcher()
-        
-        # Update'ni dispatcher orqali qayta ishlash
-        await dp.feed_update(bot, update)
-        logger.info(f"✅ Update {update.update_id} qayta ishlandi")
-        
-        return JsonResponse({"ok": True})
-        
-    except Exception as e:
-        logger.error(f"❌ Webhook processing error: {e}", exc_info=True)
-        return JsonResponse({"ok": False, "error": str(e)}, status=500)
-    finally:
-        # DB connection'ni tozalash
-        await sync_to_async(close_old_connections)()
+@staff_member_required
+def metrics(request):
+    """Shu worker ko'rsatkichlari: rate limit va (BOT_EMBEDDED bo'lsa) bot navbati"""
+    data = {'rate_limit': get_counters()}
+    if bot_embedded():
+        from bot.runtime import collect_metrics
+        data['bot'] = collect_metrics()
+    return JsonResponse(data)
 
 
 # ============= NOTIFICATION FUNCTION =============
-def send_courier_notification_sync(order):
+def schedule_outbox_drain():
     """
-    Kuryerlarga xabar yuborish (sync wrapper)
-    Django signals/views'dan chaqiriladi
+    Outbox navbatini background loop'da yuborishni boshlash.
+    Tranzaksiya yakunlangach (on_commit) chaqiriladi - Telegram javobi kutilmaydi.
+    Bu yerda yuborilmay qolgan hodisalarni process_outbox buyrug'i qayta oladi.
+    Bot alohida jarayonda bo'lsa (runbot) navbatni o'sha jarayon o'zi oladi.
     """
+    if not bot_embedded():
+        return
+    
     try:
         loop = get_background_loop()
-        future = asyncio.run_coroutine_threadsafe(
-            _send_notification_async(order),
-            loop
-        )
-        
-        # Natijani kutish
-        try:
-            future.result(timeout=10)
-            logger.info(f"✅ Buyurtma #{order.order_id} uchun xabar yuborildi")
-        except asyncio.TimeoutError:
-            logger.error(f"⏱️ Xabar yuborish timeout - Order #{order.order_id}")
+        future = asyncio.run_coroutine_threadsafe(drain_once(), loop)
+        future.add_done_callback(_log_drain_result)
         
     except Exception as e:
         logger.error(f"❌ Notification error: {e}", exc_info=True)
 
 
-async def _send_notification_async(order):
-    """Async notification sender"""
-    try:
-        from bot.bot import notify_couriers_about_order
-        
-        # Bot'ni olish
-        bot, _ = get_bot_and_dispatcher()
-        
-        # Xabar yuborish
-        await notify_couriers_about_order(order)
-        
-    except Exception as e:
-        logger.error(f"❌ Async notification error: {e}", exc_info=True)
+def _log_drain_result(future):
+    """Background'dagi drain natijasini log qilish"""
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"❌ Outbox drain error: {future.exception()}")
 
     
 def shop_view(request):
@@ -189,136 +160,133 @@ def shop_view(request):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@rate_limit('checkout', free=is_replay)
 def create_order(request):
     """Buyurtma yaratish API"""
     try:
-        # JSON ma'lumotlarni olish
-        data = json.loads(request.body)
+        # Takroriy so'rov bo'lsa - saqlangan javob (Product/Order ga tegmasdan)
+        idempotency_key = get_idempotency_key(request)
+        if idempotency_key:
+            fingerprint = request_fingerprint(request.body)
+            record = find_response(idempotency_key, fingerprint)
+            if record:
+                return replay_response(record)
         
-        # Majburiy maydonlarni tekshirish
-        required_fields = ['name', 'phone', 'region', 'district', 'address', 'payment', 'items']
-        for field in required_fields:
-            if field not in data or not data[field]:
-                return JsonResponse({
-                    'success': False,
-                    'message': f'{field} maydoni to\'ldirilmagan'
-                }, status=400)
+        data, lines = parse_order_payload(request.body)
         
-        # Mahsulotlarni tekshirish
-        items = data.get('items', [])
-        if not items:
-            return JsonResponse({
-                'success': False,
-                'message': 'Savat bo\'sh'
-            }, status=400)
+        # Narxlar jarayon ichidagi jadvaldan (katalog o'zgarmagan bo'lsa DB ga murojaatsiz)
+        total_price, order_items = build_order_items(lines, get_price_index())
         
-        # Umumiy narxni hisoblash
-        total_price = 0
-        product_ids = []
+        def remember_response(order):
+            if idempotency_key:
+                store_response(idempotency_key, fingerprint, order, order_created_payload(order, len(lines)))
         
-        for item in items:
-            try:
-                product = Product.objects.get(id=item['id'], is_active=True)
-                quantity = float(item['quantity'])
-                
-                # Aksiya narxini tekshirish
-                if product.stock and product.get_price_action_percent() > 0:
-                    price = float(product.stock)
-                else:
-                    price = float(product.price)
-                
-                total_price += price * quantity
-                product_ids.append(product.id)
-                
-            except Product.DoesNotExist:
-                return JsonResponse({
-                    'success': False,
-                    'message': f'Mahsulot topilmadi: {item.get("name", "")}'
-                }, status=404)
+        try:
+            order = save_order(data, total_price, order_items, on_saved=remember_response)
+        except IntegrityError:
+            # Parallel takroriy so'rov kalitni birinchi bo'lib yozib ulgurdi
+            record = idempotency_key and find_response(idempotency_key, fingerprint)
+            if not record:
+                raise
+            return replay_response(record)
         
-        # Telefon raqamni tozalash
-        phone = data['phone'].replace(' ', '').replace('+', '').replace('-', '')
+        # Muvaffaqiyatli javob
+        return JsonResponse(order_created_payload(order, len(lines)))
         
-        # Payment method mapping
-        payment_mapping = {
-            'cash': 'naqd',
-            'card': 'karta',
-            'click': 'click',
-            'payme': 'click',
-        }
-        payment_method = payment_mapping.get(data['payment'], 'naqd')
+    except CheckoutError as e:
+        return JsonResponse(e.as_payload(), status=e.status)
+    
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Xatolik yuz berdi: {str(e)}'
+        }, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@rate_limit('checkout', free=is_replay)
+async def create_order_async(request):
+    """
+    Buyurtma yaratish API - async versiya (config/asgi.py orqali).
+    Worker thread band qilinmaydi; kuryerlarga xabar kutilmasdan yuboriladi.
+    """
+    try:
+        idempotency_key = get_idempotency_key(request)
+        if idempotency_key:
+            fingerprint = request_fingerprint(request.body)
+            record = await afind_response(idempotency_key, fingerprint)
+            if record:
+                return replay_response(record)
         
-        # Buyurtma yaratish
-        order = Order.objects.create(
-            full_name=data['name'],
-            phone=phone,
-            region=data['region'],
-            district=data['district'],
-            address=data['address'],
-            payment_method=payment_method,
-            comments=data.get('notes', ''),
-            total_price=total_price,
-            status='pending'
-        )
+        data, lines = parse_order_payload(request.body)
         
-        # Mahsulotlarni bog'lash
-        order.products.set(product_ids)
-        order.save()
+        total_price, order_items = build_order_items(lines, await aget_price_index())
         
-        # Muvaffaqiyatli javob
-        return JsonResponse({
-            'success': True,
-            'message': 'Buyurtma muvaffaqiyatli qabul qilindi!',
-            'data': {
-                'order_id': order.order_id,
-                'total': float(total_price),
-                'items_count': len(items)
-            }
-        })
+        def remember_response(order):
+            if idempotency_key:
+                store_response(idempotency_key, fingerprint, order, order_created_payload(order, len(lines)))
         
-    except json.JSONDecodeError:
-        return JsonResponse({
-            'success': False,
-            'message': 'Noto\'g\'ri JSON format'
-        }, status=400)
+        # Django tranzaksiyalari hali async emas - yozish bitta thread hop'da
+        try:
+            order = await sync_to_async(save_order)(data, total_price, order_items, on_saved=remember_response)
+        except IntegrityError:
+            record = idempotency_key and await afind_response(idempotency_key, fingerprint)
+            if not record:
+                raise
+            return replay_response(record)
+        
+        return JsonResponse(order_created_payload(order, len(lines)))
+        
+    except CheckoutError as e:
+        return JsonResponse(e.as_payload(), status=e.status)
     
     except Exception as e:
+        logger.error(f"❌ Async order error: {e}", exc_info=True)
         return JsonResponse({
             'success': False,
             'message': f'Xatolik yuz berdi: {str(e)}'
         }, status=500)
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def cart_quote(request):
+    """
+    Savatni joriy narxlar bilan hisoblash - savat oynasi ochilganda bitta so'rov.
+    Narxlar jarayon ichidagi jadvaldan (DB ga murojaatsiz).
+    """
+    try:
+        _, lines = parse_order_payload(request.body, QUOTE_SCHEMA)
+    except CheckoutError as e:
+        return JsonResponse(e.as_payload(), status=e.status)
+    
+    return JsonResponse({
+        'success': True,
+        'data': quote_cart(lines, get_price_index())
+    })
+
+
 @require_http_methods(["GET"])
 def get_product_price(request, product_id):
     """Mahsulot narxini olish (aksiya narxini e'tiborga olgan holda)"""
-    try:
-        product = Product.objects.get(id=product_id, is_active=True)
-        
-        # Aksiya narxini tekshirish
-        if product.stock and product.get_price_action_percent() > 0:
-            price = float(product.stock)
-            discount = product.get_price_action_percent()
-        else:
-            price = float(product.price)
-            discount = 0
-        
-        return JsonResponse({
-            'success': True,
-            'data': {
-                'id': product.id,
-                'name': product.name,
-                'price': price,
-                'original_price': float(product.price),
-                'discount': discount
-            }
-        })
-        
-    except Product.DoesNotExist:
+    entry = get_price_index().get(product_id)
+    if entry is None:
         return JsonResponse({
             'success': False,
             'message': 'Mahsulot topilmadi'
         }, status=404)
+    
+    return JsonResponse({
+        'success': True,
+        'data': {
+            'id': entry.id,
+            'name': entry.name,
+            'price': float(entry.effective_price),
+            'original_price': float(entry.price),
+            'discount': entry.discount
+        }
+    })
 
 
 # store/views.py
@@ -386,11 +354,12 @@ def courier_detail(request, courier_id):
     # Get orders statistics
     orders = Order.objects.filter(courier=courier)
     
+    # Jami/yetkazilgan/bekor qilingan - kuryer hisoblagichlaridan
     stats = {
-        'total_orders': orders.count(),
-        'completed': orders.filter(status='delivered').count(),
-        'in_progress': orders.filter(status__in=['confirmed', 'preparing', 'delivering']).count(),
-        'cancelled': orders.filter(status='cancelled').count(),
+        'total_orders': courier.total_orders,
+        'completed': courier.completed_orders,
+        'in_progress': orders.filter(status__in=['accepted', 'delivering']).count(),
+        'cancelled': courier.cancelled_orders,
         'total_earned': sum([order.total_price for order in orders.filter(status='delivered')]),
     }
     